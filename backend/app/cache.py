@@ -0,0 +1,126 @@
+import os
+import time
+import threading
+from fastapi import HTTPException
+from app.crud import fetch_apartment_features, fetch_network_graph, fetch_network_landmarks, fetch_seed_versions
+from app.utils.geometry import create_apartment_index
+from app.utils.network import attach_landmarks, deserialize_graph, find_apartment_nearest_nodes
+
+# Seconds between seed manifest checks, so a reseed is picked up without a restart
+MANIFEST_CHECK_SECONDS = float(os.getenv('MANIFEST_CHECK_SECONDS', '30'))
+DATA_VERSION_HEADER = "X-Data-Version"
+
+# Deserialized network graphs by city ID, shared across requests
+_city_graphs = {}
+_city_cache_lock = threading.Lock()
+# Bumped whenever cached city data is dropped, so data read before a reseed is not cached after it
+_city_cache_generation = 0
+
+# Seed data version of each city from the seed manifest
+_city_versions = {}
+_manifest_checked_at = None
+_manifest_lock = threading.Lock()
+_invalidation_callbacks = []
+
+def get_cached_city_data(cache, city_id, load):
+    """Return a city's cached value, loading it on first use."""
+    value = cache.get(city_id)
+    if value is None:
+        generation = _city_cache_generation
+        value = load()
+        with _city_cache_lock:
+            if generation == _city_cache_generation:
+                # Keep the value of whichever request finished first so derived indexes are shared
+                value = cache.setdefault(city_id, value)
+    return value
+
+def clear_city_cache(cache, city_id=None):
+    """Drop the cached value of one city, or of every city when no ID is given."""
+    global _city_cache_generation
+    with _city_cache_lock:
+        _city_cache_generation += 1
+        if city_id is None:
+            cache.clear()
+        else:
+            cache.pop(city_id, None)
+
+def load_city_graph(cur, city_id):
+    """Fetch and deserialize a city's network graph with its landmark table."""
+    G = deserialize_graph(fetch_network_graph(cur, city_id))
+    attach_landmarks(G, fetch_network_landmarks(cur, city_id))
+    return G
+
+def get_city_graph(cur, city_id):
+    """Return the network graph for a city, fetching and deserializing it only on first use."""
+    return get_cached_city_data(_city_graphs, city_id, lambda: load_city_graph(cur, city_id))
+
+def load_apartment_index(cur, city_id, G):
+    """Fetch a city's apartments into an array-backed index with each apartment's nearest node on the graph."""
+    apartment_index = create_apartment_index(fetch_apartment_features(cur, city_id))
+    apartment_index["nearest_nodes"] = find_apartment_nearest_nodes(apartment_index, G)
+    return apartment_index
+
+def get_city_apartment_index(cur, city_id, G):
+    """Return the apartment index for a city on its graph G, building it on first use."""
+    # Stored on the graph its nearest nodes refer to, so a reseed can never pair it with another graph
+    if '_apartment_index' not in G.graph:
+        apartment_index = load_apartment_index(cur, city_id, G)
+        with _city_cache_lock:
+            G.graph.setdefault('_apartment_index', apartment_index)
+    return G.graph['_apartment_index']
+
+def clear_city_graphs(city_id=None):
+    """Drop the cached graph (with its apartment index) of one city, or of every city when no ID is given."""
+    clear_city_cache(_city_graphs, city_id)
+
+def on_city_data_changed(callback):
+    """Register a callback run with the IDs of the cities whose seed data changed."""
+    _invalidation_callbacks.append(callback)
+    return callback
+
+def refresh_city_versions(cur):
+    """Re-read the seed manifest at most once per interval and drop cached data of the cities whose version changed."""
+    global _city_versions, _manifest_checked_at
+    now = time.monotonic()
+    with _manifest_lock:
+        if _manifest_checked_at is not None and now - _manifest_checked_at < MANIFEST_CHECK_SECONDS:
+            return
+        _manifest_checked_at = now
+
+    try:
+        versions = fetch_seed_versions(cur)
+    except HTTPException as e:
+        # Databases seeded before the manifest existed have no table; keep serving the cached data
+        cur.connection.rollback()
+        print(f"Seed manifest check failed: {e.detail}")
+        return
+
+    with _manifest_lock:
+        changed = {
+            city_id for city_id in versions.keys() | _city_versions.keys()
+            if versions.get(city_id) != _city_versions.get(city_id)
+        }
+        _city_versions = versions
+
+    if changed:
+        print(f"Seed data changed for cities {sorted(changed)}, reloading their cached data")
+        for city_id in changed:
+            clear_city_graphs(city_id)
+        for callback in _invalidation_callbacks:
+            callback(changed)
+
+def get_city_version(city_id):
+    """Return the seed data version of a city, or None when the manifest has no entry for it."""
+    return _city_versions.get(city_id)
+
+def data_version_headers(city_id):
+    """Return the response headers naming the seed data version a city's response was computed from."""
+    version = get_city_version(city_id)
+    return {DATA_VERSION_HEADER: version} if version else {}
+
+def reset_city_versions():
+    """Forget the known seed versions so the next request re-reads the manifest."""
+    global _city_versions, _manifest_checked_at
+    with _manifest_lock:
+        _city_versions = {}
+        _manifest_checked_at = None
@@ -1,43 +1,55 @@
 from fastapi import HTTPException 
 
+AMENITY_BATCH_SIZE = 1000
+# Precomputed per-apartment walking distance column of each amenity, filled by the seed pipeline
+DISTANCE_COLUMNS = {"park": "dist_park", "supermarket": "dist_supermarket", "cafe": "dist_cafe"}
+
 def fetch_favorites(cur, ids):
     """Fetch favorite amenities by their IDs."""
     try:
         # Convert ids to a tuple for the SQL IN clause
         ids_tuple = tuple(ids)
         
-        # Execute the query to fetch centroid GeoJSON and properties
+        # Execute the query to fetch the stored centroid GeoJSON and properties
         cur.execute("""
-            SELECT ST_AsGeoJSON(ST_Centroid(geom), 5) AS centroid, properties, city_id
+            SELECT centroid_geojson AS centroid, properties, city_id
             FROM amenities
-            WHERE (properties->>'id')::bigint IN %s
+            WHERE osm_id IN %s
         """, (ids_tuple,))
         
         return cur.fetchall()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch favorite amenities: {str(e)}") from e
 
-def fetch_amenities(cur, city_id, name, is_centroid):
-    """Fetch amenities by city ID and name, optionally fetching centroids."""
+def fetch_amenities(cur, city_id, name, is_centroid, batch_size=AMENITY_BATCH_SIZE):
+    """Fetch amenities by city ID and name, optionally fetching centroids, returning an iterator of row batches."""
     try:
         if is_centroid:
-            # Execute the query to fetch centroid GeoJSON and properties
+            # Execute the query to fetch the stored centroid GeoJSON and properties as text
             cur.execute("""
-                SELECT ST_AsGeoJSON(ST_Centroid(geom), 5) AS centroid, properties
+                SELECT centroid_geojson AS centroid, properties::text AS properties
                 FROM amenities
                 WHERE city_id = %s AND name = %s
             """, (city_id, name))
         else:
-            # Execute the query to fetch normal GeoJSON and properties
+            # Execute the query to fetch the stored GeoJSON and properties as text
             cur.execute("""
-                SELECT ST_AsGeoJSON(geom, 5) AS geom, properties
+                SELECT geojson AS geom, properties::text AS properties
                 FROM amenities
                 WHERE city_id = %s AND name = %s
             """, (city_id, name))
-        return cur.fetchall()
+        return fetch_in_batches(cur, batch_size)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch amenities: {str(e)}") from e
 
+def fetch_in_batches(cur, batch_size):
+    """Yield the cursor's remaining rows in batches of at most batch_size."""
+    while True:
+        rows = cur.fetchmany(batch_size)
+        if not rows:
+            return
+        yield rows
+
 def fetch_network_graph(cur, city_id):
     """Fetch the network graph for a given city ID."""
     try:
@@ -54,6 +66,19 @@ def fetch_network_graph(cur, city_id):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch network graph: {str(e)}") from e
 
+def fetch_network_landmarks(cur, city_id):
+    """Fetch the precomputed landmark distance table for a given city ID, if any."""
+    try:
+        cur.execute("""
+            SELECT landmarks
+            FROM network_graphs
+            WHERE city_id = %s
+        """, (city_id,))
+        row = cur.fetchone()
+        return row[0] if row else None
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch network landmarks: {str(e)}") from e
+
 def fetch_network_nodes(cur, city_id, amenities):
     """Fetch network nodes for given amenities in a city."""
     amenities = set(amenities) # Sets in Python don't maintain order
@@ -72,14 +97,55 @@ def fetch_network_nodes(cur, city_id, amenities):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch network nodes: {str(e)}") from e
 
-def fetch_apartment_geom_and_centroid(cur, city_id):
-    """Fetch geometry and centroid for apartments in a city."""
+def fetch_apartment_features(cur, city_id):
+    """Fetch OSM id, centroid coordinates, stored GeoJSON, properties text and seeded network node for apartments in a city."""
     try:
+        # Centroids keep the 5-decimal precision of the stored GeoJSON; properties stay text to be spliced into responses
         cur.execute("""
-            SELECT ST_AsGeoJSON(geom, 5) AS geom, ST_AsGeoJSON(ST_Centroid(geom), 5) AS centroid, properties
+            SELECT
+                COALESCE(osm_id, -1) AS osm_id,
+                round(ST_X(centroid)::numeric, 5)::float8 AS x,
+                round(ST_Y(centroid)::numeric, 5)::float8 AS y,
+                geojson,
+                centroid_geojson,
+                properties::text,
+                network_node
             FROM amenities
             WHERE city_id = %s AND name = 'apartment'
         """, (city_id,))
         return cur.fetchall()
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to fetch apartment geometry and centroid: {str(e)}") from e
+        raise HTTPException(status_code=500, detail=f"Failed to fetch apartment features: {str(e)}") from e
+
+def fetch_suitable_apartment_collections(cur, city_id, max_distances):
+    """Fetch apartments within the max walking distance of each amenity as polygon and centroid FeatureCollection texts."""
+    # Column names come from DISTANCE_COLUMNS only; the distances themselves are bound parameters
+    constraints = [(DISTANCE_COLUMNS[amenity], value) for amenity, value in max_distances.items() if amenity in DISTANCE_COLUMNS and value]
+    conditions = "".join(f" AND {column} <= %s" for column, _ in constraints)
+    try:
+        cur.execute(f"""
+            SELECT
+                '{{"type":"FeatureCollection","features":[' || COALESCE(string_agg(
+                    '{{"type":"Feature","geometry":' || geojson || ',"properties":' || COALESCE(properties::text, 'null') || '}}', ','
+                ), '') || ']}}',
+                '{{"type":"FeatureCollection","features":[' || COALESCE(string_agg(
+                    '{{"type":"Feature","geometry":' || centroid_geojson || ',"properties":' || COALESCE(properties::text, 'null') || '}}', ','
+                ), '') || ']}}'
+            FROM amenities
+            WHERE city_id = %s AND name = 'apartment' AND geojson IS NOT NULL{conditions}
+        """, (city_id, *[value for _, value in constraints]))
+        return cur.fetchone()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch suitable apartments: {str(e)}") from e
+
+def fetch_seed_versions(cur):
+    """Fetch the seed data version of every city, derived from the content hashes in the seed manifest."""
+    try:
+        cur.execute("""
+            SELECT city_id, left(md5(string_agg(artifact || ':' || content_hash, ',' ORDER BY artifact)), 12)
+            FROM seed_manifest
+            GROUP BY city_id
+        """)
+        return {row[0]: row[1] for row in cur.fetchall()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch seed versions: {str(e)}") from e
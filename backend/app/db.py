@@ -1,4 +1,5 @@
 import os
+from contextlib import contextmanager
 from fastapi import HTTPException
 import psycopg2.pool
 from psycopg2 import DatabaseError
@@ -23,4 +24,16 @@ def get_connection():
         finally:
             pool.putconn(conn)
     except DatabaseError:
-        raise HTTPException(status_code=503, detail="Database connection pool exhausted")
\ No newline at end of file
+        raise HTTPException(status_code=503, detail="Database connection pool exhausted")
+
+# Borrow a connection for work that outlives the request dependency, such as a streaming response body
+@contextmanager
+def borrow_connection():
+    try:
+        conn = pool.getconn()
+    except DatabaseError:
+        raise HTTPException(status_code=503, detail="Database connection pool exhausted")
+    try:
+        yield conn
+    finally:
+        pool.putconn(conn)
@@ -1,7 +1,9 @@
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import favorites, analyze, amenities, proxy, health
+from app.cache import DATA_VERSION_HEADER
+from app.routers import favorites, analyze, amenities, proxy, health, route
 
 DOMAIN_NAME = os.getenv('DOMAIN_NAME')
 
@@ -14,16 +16,24 @@ origins = [
 	f"https://{DOMAIN_NAME}", # public domain name
 ]
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Release pooled upstream connections on shutdown
+    await proxy.close_osrm_client()
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[DATA_VERSION_HEADER],
 )
 app.include_router(health.router)
 app.include_router(amenities.router)
 app.include_router(favorites.router)
 app.include_router(analyze.router)
 app.include_router(proxy.router)
+app.include_router(route.router)
@@ -1,36 +1,52 @@
-import json
-from fastapi import APIRouter, Depends, Query, HTTPException
+from itertools import chain
+from fastapi import APIRouter, Query, HTTPException
+from fastapi.responses import StreamingResponse
 from psycopg2 import DatabaseError
-from app.db import get_connection
+from app.db import borrow_connection
+from app.cache import data_version_headers, refresh_city_versions
 from app.crud import fetch_amenities
 
 router = APIRouter()
 
+def iter_amenity_batches(city_id, name, is_centroid):
+    """Yield amenity row batches from a server-side cursor on a connection held for the whole stream."""
+    # The request's dependency connection is released before the body streams, so borrow one for the stream itself
+    with borrow_connection() as conn:
+        with conn.cursor() as cur:
+            refresh_city_versions(cur)
+        with conn.cursor(name="amenities_stream") as cur:
+            yield from fetch_amenities(cur, city_id, name, is_centroid)
+
+def render_feature_collection(batches):
+    """Yield a GeoJSON FeatureCollection chunk by chunk, splicing the stored GeoJSON and properties text."""
+    yield '{"type":"FeatureCollection","features":['
+    separator = ""
+    for rows in batches:
+        if not rows:
+            continue
+        yield separator + ",".join(
+            f'{{"type":"Feature","geometry":{row[0] or "null"},"properties":{row[1] or "null"}}}'
+            for row in rows
+        )
+        separator = ","
+    yield ']}'
+
 @router.get("/amenities")
-def get_amenities(city_id: int = Query(...), name: str = Query(...), is_centroid: bool = Query(False), conn=Depends(get_connection)):
+def get_amenities(city_id: int = Query(...), name: str = Query(...), is_centroid: bool = Query(False)):
     """Return GeoJSON FeatureCollection from the amenities table based on city_id and name."""
     try:
-        with conn.cursor() as cur:
-            res = fetch_amenities(cur, city_id, name, is_centroid)
+        batches = iter_amenity_batches(city_id, name, is_centroid)
+        # Run the query before responding so database errors still map to an error status
+        first_batch = next(batches, [])
 
-            features = []
-            geojson = {}
-            for row in res:
-                geojson = {
-                    'type': "Feature",
-                    'geometry': json.loads(row[0]),
-                    'properties': row[1]
-                }
-                features.append(geojson)
-                
-            return {
-                "type": "FeatureCollection",
-                "features": features,
-            }
+        return StreamingResponse(
+            render_feature_collection(chain([first_batch], batches)),
+            media_type="application/json",
+            headers=data_version_headers(city_id),
+        )
 
     except DatabaseError as e:
         raise HTTPException(status_code=500, detail=f"Database error: {e}")
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred: {e}")
- 
\ No newline at end of file
@@ -1,25 +1,56 @@
+import os
 import json
 import time
-from fastapi import APIRouter, Depends, Query, HTTPException
-from fastapi.responses import JSONResponse
+from typing import Dict, List
+from fastapi import APIRouter, Body, Depends, Query, HTTPException
+from fastapi.responses import Response
+from pydantic import BaseModel
 from psycopg2 import DatabaseError
-from concurrent.futures import ThreadPoolExecutor
 from app.db import get_connection
-from app.crud import fetch_network_nodes, fetch_apartment_geom_and_centroid, fetch_network_graph
-from app.utils.geometry import create_gdf_with_centroid
-from app.utils.network import deserialize_graph, find_suitable_apartment_network_nodes, retrieve_suitable_apartments
+from app.cache import data_version_headers, get_city_apartment_index, get_city_graph, refresh_city_versions
+from app.crud import fetch_network_nodes, fetch_suitable_apartment_collections
+from app.utils.geometry import render_suitable_apartments
+from app.utils.network import (
+    find_suitable_apartment_network_nodes,
+    find_suitable_apartment_network_nodes_for_scenarios,
+    retrieve_suitable_apartments,
+)
 
 router = APIRouter()
 
 PREFIX_AMENITY = "max_meter_"
+# "sql" answers from the seeded per-apartment distance columns, keeping no graphs in memory
+ANALYZE_MODE = os.getenv('ANALYZE_MODE', 'graph')
+
+class AnalyzeScenario(BaseModel):
+    city_id: int
+    kwargs: Dict[str, float] = {}
 
 def transform_key(key: str, prefix: str) -> str:
     """Remove the prefix from the key."""
     return key[len(prefix):] if key.startswith(prefix) else key
 
+def get_max_distances(kwargs):
+    """Remove the prefix from the keys and create the max_distances dictionary."""
+    return {
+        key[len(PREFIX_AMENITY):]: value
+        for key, value in kwargs.items()
+        if key.startswith(PREFIX_AMENITY)
+    }
+
+def render_analysis(polygon, centroid, **fields):
+    """Splice polygon and centroid FeatureCollection texts (and any JSON-encoded fields) into a response object."""
+    members = [f'"{key}":{json.dumps(value)}' for key, value in fields.items()]
+    members += [f'"polygon":{polygon}', f'"centroid":{centroid}']
+    return "{" + ",".join(members) + "}"
+
+def analyze_apartments_sql(cur, city_id, kwargs):
+    """Return the polygon and centroid FeatureCollection texts of suitable apartments, filtered in the database."""
+    return fetch_suitable_apartment_collections(cur, city_id, get_max_distances(kwargs))
+
 @router.get("/analyze")
 def analyze_apartments(
-    city_id: int = Query(...), 
+    city_id: int = Query(...),
     kwargs: str = Query(...),  # Accept kwargs as a JSON string
     conn=Depends(get_connection),
 ):
@@ -30,27 +61,31 @@ def analyze_apartments(
         amenity_keys = [key.replace(PREFIX_AMENITY, '') for key in kwargs.keys()]
         start_time = time.time()
 
+        if ANALYZE_MODE == "sql":
+            with conn.cursor() as cur:
+                refresh_city_versions(cur)
+                polygon, centroid = analyze_apartments_sql(cur, city_id, kwargs)
+
+            print(f"Execution time for Analize Suitable Apartments (SQL): {time.time() - start_time} seconds")
+
+            # The FeatureCollections are built by Postgres and spliced without parsing
+            return Response(
+                content=render_analysis(polygon, centroid),
+                media_type="application/json",
+                headers=data_version_headers(city_id),
+            )
+
         with conn.cursor() as cur:
-            with ThreadPoolExecutor() as executor:
-                future_apartment_geom_and_centroid = executor.submit(fetch_apartment_geom_and_centroid, cur, city_id)
-                apartment_geom_centroid_rows = future_apartment_geom_and_centroid.result()
-                future_graph = executor.submit(fetch_network_graph, cur, city_id)
-                graph_row = future_graph.result()
-                future_nodes = executor.submit(fetch_network_nodes, cur, city_id, amenity_keys)
-                nodes_rows = future_nodes.result()
-            
+            refresh_city_versions(cur)
+            G = get_city_graph(cur, city_id)
+            apartment_index = get_city_apartment_index(cur, city_id, G)
+            nodes_rows = fetch_network_nodes(cur, city_id, amenity_keys)
+
             ### Normalize result data from DB
-            apartment_gdf = create_gdf_with_centroid(apartment_geom_centroid_rows)
-            G = deserialize_graph(graph_row)
             nodes_dict = {row[0]: row[1] for row in nodes_rows}
 
             ### Prepare the kwargs
-            # Remove the prefix from the keys and create the max_distances dictionary
-            max_distances = {
-                key[len(PREFIX_AMENITY):]: value
-                for key, value in kwargs.items()
-                if key.startswith(PREFIX_AMENITY)
-            }
+            max_distances = get_max_distances(kwargs)
             # Format the kwargs {key: (nodes, max distance)}
             amenity_kwargs = {
                 key: (nodes_dict.get(key), value)
@@ -60,28 +95,81 @@ def analyze_apartments(
 
             ### Find suitable apartments
             suitable_apartment_nnodes = find_suitable_apartment_network_nodes(
-                G, 
-                nodes_dict.get('apartment'), 
+                G,
+                nodes_dict.get('apartment'),
                 **amenity_kwargs
             )
-            suitable_apartment_gdf = retrieve_suitable_apartments(apartment_gdf, G, suitable_apartment_nnodes)
+            positions = retrieve_suitable_apartments(apartment_index, suitable_apartment_nnodes)
 
-            ### Format response
-            # Drop centroid column
-            suitable_apartment_polygon = suitable_apartment_gdf.copy().drop(columns=['centroid'])
-            # Set centroid to geometry and drop centroid column
-            suitable_apartment_centroid = suitable_apartment_gdf.copy().assign(geometry=suitable_apartment_gdf['centroid']).drop(columns=['centroid'])
+            ### Format response from the pre-rendered features
+            polygon, centroid = render_suitable_apartments(apartment_index, positions)
 
             print(f"Execution time for Analize Suitable Apartments: {time.time() - start_time} seconds")
-            
-            return JSONResponse(content={
-                "polygon": json.loads(suitable_apartment_polygon.to_json()),
-                "centroid": json.loads(suitable_apartment_centroid.to_json())
-            })
+
+            return Response(
+                content=render_analysis(polygon, centroid),
+                media_type="application/json",
+                headers=data_version_headers(city_id),
+            )
+
+    except DatabaseError as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {e}")
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred: {e}")
+
+@router.post("/analyze/batch")
+def analyze_apartments_batch(
+    scenarios: List[AnalyzeScenario] = Body(...),
+    conn=Depends(get_connection),
+):
+    """Analyze apartments for several (city_id, kwargs) scenarios, sharing one search pass per city."""
+    try:
+        start_time = time.time()
+
+        # Group scenario indexes by city so each city's data is loaded and searched once
+        scenario_indexes_by_city = {}
+        for index, scenario in enumerate(scenarios):
+            scenario_indexes_by_city.setdefault(scenario.city_id, []).append(index)
+
+        results = [None] * len(scenarios)
+        with conn.cursor() as cur:
+            refresh_city_versions(cur)
+            for city_id, scenario_indexes in scenario_indexes_by_city.items():
+                if ANALYZE_MODE == "sql":
+                    for index in scenario_indexes:
+                        polygon, centroid = analyze_apartments_sql(cur, city_id, scenarios[index].kwargs)
+                        results[index] = render_analysis(polygon, centroid, city_id=city_id, kwargs=scenarios[index].kwargs)
+                    continue
+
+                scenario_max_distances = [get_max_distances(scenarios[index].kwargs) for index in scenario_indexes]
+                amenity_keys = list({key for max_distances in scenario_max_distances for key in max_distances})
+
+                ### Normalize result data from DB
+                G = get_city_graph(cur, city_id)
+                apartment_index = get_city_apartment_index(cur, city_id, G)
+                nodes_dict = {row[0]: row[1] for row in fetch_network_nodes(cur, city_id, amenity_keys)}
+
+                ### Find suitable apartments for every scenario of the city
+                suitable_apartment_nnodes_list = find_suitable_apartment_network_nodes_for_scenarios(
+                    G,
+                    nodes_dict.get('apartment'),
+                    nodes_dict,
+                    scenario_max_distances
+                )
+
+                ### Format response from the pre-rendered features
+                for index, suitable_apartment_nnodes in zip(scenario_indexes, suitable_apartment_nnodes_list):
+                    positions = retrieve_suitable_apartments(apartment_index, suitable_apartment_nnodes)
+                    polygon, centroid = render_suitable_apartments(apartment_index, positions)
+                    results[index] = render_analysis(polygon, centroid, city_id=city_id, kwargs=scenarios[index].kwargs)
+
+        print(f"Execution time for Analize Suitable Apartments (batch of {len(scenarios)}): {time.time() - start_time} seconds")
+
+        return Response(content="[" + ",".join(results) + "]", media_type="application/json")
 
     except DatabaseError as e:
         raise HTTPException(status_code=500, detail=f"Database error: {e}")
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred: {e}")
- 
\ No newline at end of file
@@ -1,33 +1,83 @@
 import json
+import threading
+from collections import OrderedDict
+from typing import List
 from fastapi import APIRouter, Depends, Query, HTTPException
 from fastapi.responses import JSONResponse
 from psycopg2 import DatabaseError
 from app.db import get_connection
+from app.cache import on_city_data_changed
 from app.crud import fetch_favorites
 
 router = APIRouter()
 
+FAVORITES_CACHE_SIZE = 4096
+
+# LRU cache of rendered favorite features, keyed by OSM id
+_favorites_cache = OrderedDict()
+_favorites_cache_lock = threading.Lock()
+
+def get_cached_favorites(ids):
+    """Return cached features for the given IDs and the IDs missing from the cache."""
+    cached, missing = {}, []
+    with _favorites_cache_lock:
+        for id in ids:
+            if id in _favorites_cache:
+                _favorites_cache.move_to_end(id)
+                cached[id] = _favorites_cache[id]
+            else:
+                missing.append(id)
+    return cached, missing
+
+def cache_favorites(features_by_id):
+    """Store rendered features by ID, evicting the least recently used entries."""
+    with _favorites_cache_lock:
+        for id, features in features_by_id.items():
+            _favorites_cache[id] = features
+            _favorites_cache.move_to_end(id)
+        while len(_favorites_cache) > FAVORITES_CACHE_SIZE:
+            _favorites_cache.popitem(last=False)
+
+def clear_favorites_cache():
+    """Drop every cached favorite feature."""
+    with _favorites_cache_lock:
+        _favorites_cache.clear()
+
+# Favorites are cached by OSM id rather than city, so any reseeded city drops the whole cache.
+# The manifest is checked by the city endpoints, keeping fully cached lookups off the database.
+on_city_data_changed(lambda city_ids: clear_favorites_cache())
+
 @router.get("/favorites")
-def get_favorites(ids: list = Query(...), conn=Depends(get_connection)):
+def get_favorites(ids: List[int] = Query(...), conn=Depends(get_connection)):
     """Return List of feature from the amenities table based on property IDs."""
     try:
-        with conn.cursor() as cur:
-            res = fetch_favorites(cur, ids)
-            
-            features = []
-            geojson = {}
+        # Normalize and deduplicate IDs while keeping the requested order
+        ids = list(dict.fromkeys(int(id) for id in ids))
+        features_by_id, missing_ids = get_cached_favorites(ids)
+
+        if missing_ids:
+            with conn.cursor() as cur:
+                res = fetch_favorites(cur, missing_ids)
+
+            # IDs without a matching row are cached as empty to skip the lookup next time
+            fetched = {id: [] for id in missing_ids}
             for row in res:
                 geojson = {
                     'type': "Feature",
                     'geometry': json.loads(row[0]),
                     'properties': row[1],
                 }
-                features.append(geojson)
+                fetched.setdefault(int(row[1]['id']), []).append(geojson)
+
+            cache_favorites(fetched)
+            features_by_id.update(fetched)
+
+        features = [feature for id in ids for feature in features_by_id.get(id, [])]
 
-            return JSONResponse(content=features)
+        return JSONResponse(content=features)
 
     except DatabaseError as e:
         raise HTTPException(status_code=500, detail=f"Database error: {e}")
 
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"An error occurred: {e}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"An error occurred: {e}")
@@ -1,11 +1,87 @@
-from fastapi import APIRouter
-import requests
+import os
+from collections import OrderedDict
+import httpx
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import JSONResponse
 
 router = APIRouter()
 
+# Upstream OSRM server, overridable to point at a local instance or a mock
+OSRM_URL = os.getenv('OSRM_URL', 'http://router.project-osrm.org')
+OSRM_TIMEOUT = float(os.getenv('OSRM_TIMEOUT', '5'))
+OSRM_CONNECT_TIMEOUT = float(os.getenv('OSRM_CONNECT_TIMEOUT', '2'))
+OSRM_MAX_CONNECTIONS = int(os.getenv('OSRM_MAX_CONNECTIONS', '20'))
+ROUTE_CACHE_SIZE = int(os.getenv('OSRM_ROUTE_CACHE_SIZE', '1024'))
+COORDINATE_DECIMALS = 5  # ~1 m, matching the precision of the seeded geometries
+
+_client = None
+# LRU cache of successful route responses, keyed by rounded coordinates
+_route_cache = OrderedDict()
+
+def get_osrm_client() -> httpx.AsyncClient:
+    """Return the shared OSRM client, creating it on first use."""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            base_url=OSRM_URL,
+            timeout=httpx.Timeout(OSRM_TIMEOUT, connect=OSRM_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=OSRM_MAX_CONNECTIONS, max_keepalive_connections=OSRM_MAX_CONNECTIONS),
+        )
+    return _client
+
+async def close_osrm_client():
+    """Close the shared OSRM client and its connection pool."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+def clear_route_cache():
+    """Drop every cached route response."""
+    _route_cache.clear()
+
+def normalize_coordinates(coordinates: str) -> str:
+    """Round 'lon,lat;lon,lat' coordinates so nearby requests share a cache entry."""
+    try:
+        points = [
+            ",".join(f"{round(float(value), COORDINATE_DECIMALS):.{COORDINATE_DECIMALS}f}" for value in point.split(","))
+            for point in coordinates.split(";")
+        ]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid coordinates: {coordinates}") from e
+
+    if len(points) < 2 or any(point.count(",") != 1 for point in points):
+        raise HTTPException(status_code=400, detail=f"Invalid coordinates: {coordinates}")
+    return ";".join(points)
+
 @router.get("/proxy/osrm")
-def get_osrm_route(coordinates: str):
+async def get_osrm_route(coordinates: str = Query(...)):
     """Fetches the route from the OSRM API based on the provided coordinates."""
-    osrm_url = f"http://router.project-osrm.org/route/v1/driving/{coordinates}?overview=full&geometries=geojson&steps=true"
-    response = requests.get(osrm_url)
-    return response.json()
+    coordinates = normalize_coordinates(coordinates)
+
+    if coordinates in _route_cache:
+        _route_cache.move_to_end(coordinates)
+        return JSONResponse(content=_route_cache[coordinates])
+
+    try:
+        response = await get_osrm_client().get(
+            f"/route/v1/driving/{coordinates}",
+            params={"overview": "full", "geometries": "geojson", "steps": "true"},
+        )
+        data = response.json()
+    except httpx.TimeoutException as e:
+        raise HTTPException(status_code=504, detail=f"OSRM request timed out: {e}")
+    except (httpx.HTTPError, ValueError) as e:
+        raise HTTPException(status_code=502, detail=f"OSRM request failed: {e}")
+
+    # OSRM always answers with an object; anything else is an upstream error
+    if not isinstance(data, dict):
+        raise HTTPException(status_code=502, detail=f"OSRM request failed: unexpected response {response.text[:200]}")
+
+    # Only cache successful routes so transient upstream errors are retried
+    if response.status_code == 200 and data.get("code") == "Ok":
+        _route_cache[coordinates] = data
+        while len(_route_cache) > ROUTE_CACHE_SIZE:
+            _route_cache.popitem(last=False)
+
+    return JSONResponse(content=data, status_code=response.status_code)
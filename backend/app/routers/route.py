@@ -0,0 +1,57 @@
+import time
+import networkx as nx
+from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi.responses import JSONResponse
+from psycopg2 import DatabaseError
+from app.db import get_connection
+from app.cache import data_version_headers, get_city_graph, refresh_city_versions
+from app.utils.network import find_walking_route
+
+router = APIRouter()
+
+WALKING_SPEED_MPS = 1.4  # ~5 km/h
+
+def parse_coordinates(coordinates: str):
+    """Parse 'lon,lat;lon,lat' into origin and destination tuples."""
+    try:
+        points = [tuple(float(value) for value in point.split(",")) for point in coordinates.split(";")]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid coordinates: {coordinates}") from e
+
+    if len(points) != 2 or any(len(point) != 2 for point in points):
+        raise HTTPException(status_code=400, detail=f"Invalid coordinates: {coordinates}")
+    return points
+
+@router.get("/route")
+def get_walking_route(city_id: int = Query(...), coordinates: str = Query(...), conn=Depends(get_connection)):
+    """Return the walking route between two points on the city's network graph, in an OSRM-compatible shape."""
+    origin, destination = parse_coordinates(coordinates)
+
+    try:
+        start_time = time.time()
+
+        with conn.cursor() as cur:
+            refresh_city_versions(cur)
+            G = get_city_graph(cur, city_id)
+
+        geometry, distance = find_walking_route(G, origin, destination)
+
+        print(f"Execution time for Walking Route: {time.time() - start_time} seconds")
+
+        return JSONResponse(content={
+            "code": "Ok",
+            "routes": [{
+                "geometry": geometry,
+                "distance": distance,
+                "duration": distance / WALKING_SPEED_MPS,
+            }],
+        }, headers=data_version_headers(city_id))
+
+    except nx.NetworkXNoPath:
+        raise HTTPException(status_code=404, detail="No walking route found between the given points")
+
+    except DatabaseError as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {e}")
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred: {e}")
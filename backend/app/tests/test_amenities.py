@@ -0,0 +1,96 @@
+import json
+import sys
+from contextlib import contextmanager
+from unittest.mock import MagicMock
+import pytest
+from fastapi import HTTPException
+
+# Create a custom DatabaseError that inherits from BaseException
+class MockDatabaseError(Exception):
+    pass
+# Mock psycopg2 so importing the router does not open a connection pool
+mock_psycopg2 = MagicMock()
+mock_pool = MagicMock()
+mock_pool.SimpleConnectionPool.return_value = MagicMock()
+mock_psycopg2.pool = mock_pool
+mock_psycopg2.DatabaseError = MockDatabaseError
+sys.modules['psycopg2'] = mock_psycopg2
+sys.modules['psycopg2.pool'] = mock_pool
+
+from app.routers.amenities import get_amenities
+
+def make_row(id):
+    return ('{"type":"Point","coordinates":[1.5,1.5]}', json.dumps({"id": id, "name": f"Cafe {id}"}))
+
+@pytest.fixture
+def returned_connections(mocker):
+    """Patch the borrowed connection and record when it goes back to the pool."""
+    returned = []
+    mock_conn = mocker.MagicMock()
+
+    @contextmanager
+    def borrow_connection():
+        try:
+            yield mock_conn
+        finally:
+            returned.append(mock_conn)
+
+    mocker.patch('app.routers.amenities.borrow_connection', borrow_connection)
+    return returned
+
+async def read_body(response):
+    """Drain a StreamingResponse body into a string."""
+    return "".join([chunk async for chunk in response.body_iterator])
+
+# =============================================================================
+# Tests for get_amenities function
+# =============================================================================
+
+# Success Cases
+@pytest.mark.asyncio
+async def test_get_amenities_streams_feature_collection(mocker, returned_connections):
+    """Test that row batches are streamed as one FeatureCollection and the connection is returned afterwards."""
+    # Arrange
+    fetch_mock = mocker.patch('app.routers.amenities.fetch_amenities', return_value=iter([[make_row(1), make_row(2)], [make_row(3)]]))
+
+    # Act
+    response = get_amenities(city_id=1, name="cafe", is_centroid=True)
+    returned_before_streaming = list(returned_connections)
+    content = json.loads(await read_body(response))
+
+    # Assert
+    fetch_mock.assert_called_once_with(mocker.ANY, 1, "cafe", True)
+    assert response.media_type == "application/json"
+    assert returned_before_streaming == []
+    assert len(returned_connections) == 1
+    assert content["type"] == "FeatureCollection"
+    assert [feature["properties"]["id"] for feature in content["features"]] == [1, 2, 3]
+    assert content["features"][0]["geometry"] == {"type": "Point", "coordinates": [1.5, 1.5]}
+
+# Edge Cases
+@pytest.mark.asyncio
+async def test_get_amenities_empty_layer(mocker, returned_connections):
+    """Test that an empty layer streams an empty FeatureCollection."""
+    # Arrange
+    mocker.patch('app.routers.amenities.fetch_amenities', return_value=iter([]))
+
+    # Act
+    response = get_amenities(city_id=1, name="cafe", is_centroid=False)
+
+    # Assert
+    assert json.loads(await read_body(response)) == {"type": "FeatureCollection", "features": []}
+    assert len(returned_connections) == 1
+
+# Error Cases
+def test_get_amenities_database_error(mocker, returned_connections):
+    """Test that query errors are raised before streaming starts."""
+    # Arrange
+    mocker.patch('app.routers.amenities.fetch_amenities', side_effect=MockDatabaseError("Connection failed"))
+
+    # Act & Assert
+    with pytest.raises(HTTPException) as exc_info:
+        get_amenities(city_id=1, name="cafe", is_centroid=False)
+
+    assert exc_info.value.status_code == 500
+    assert "Database error: Connection failed" in exc_info.value.detail
+    assert len(returned_connections) == 1
@@ -19,8 +19,11 @@ mock_psycopg2.DatabaseError = MockDatabaseError
 sys.modules['psycopg2'] = mock_psycopg2
 sys.modules['psycopg2.pool'] = mock_pool
 
-from fastapi.responses import JSONResponse
-from app.routers.analyze import analyze_apartments
+import numpy as np
+from fastapi.responses import Response
+from app.routers import analyze
+from app.routers.analyze import AnalyzeScenario, analyze_apartments, analyze_apartments_batch
+from app.utils.geometry import create_apartment_index
 
 # =============================================================================
 # Tests for analyze_apartments function
@@ -41,22 +44,16 @@ def test_analyze_apartments_with_valid_constraints(mocker):
     
     mocker.patch('app.db.get_connection', return_value=mock_conn)
 
-    mock_apartment_gdf = mocker.MagicMock()
-    mock_suitable_gdf = mocker.MagicMock()
-    mock_suitable_gdf.copy.return_value = mock_suitable_gdf
-    mock_suitable_gdf.to_json.return_value = '{"type":"FeatureCollection","features":[{"type":"Feature","geometry":{"type":"Polygon","coordinates":[[[1,1],[1,2],[2,2],[2,1],[1,1]]]},"properties":{"id":1,"name":"apartment"}}]}'
-    mock_suitable_gdf.__getitem__.return_value = mock_suitable_gdf
-    mock_suitable_gdf.drop.return_value = mock_suitable_gdf
-    mock_suitable_gdf.assign.return_value = mock_suitable_gdf
-
-    fetch_apartment_geom_mock = mocker.patch('app.routers.analyze.fetch_apartment_geom_and_centroid', return_value=mock_cursor.fetchall.return_value)
-    fetch_network_graph_mock = mocker.patch('app.routers.analyze.fetch_network_graph', return_value={"directed": False, "nodes": [], "links": []})
+    apartment_index = create_apartment_index([
+        (1, 1.5, 1.5, '{"type":"Polygon","coordinates":[[[1,1],[1,2],[2,2],[2,1],[1,1]]]}', '{"type":"Point","coordinates":[1.5,1.5]}', '{"id": 1, "name": "apartment"}', None),
+        (2, 3.5, 3.5, '{"type":"Polygon","coordinates":[[[3,3],[3,4],[4,4],[4,3],[3,3]]]}', '{"type":"Point","coordinates":[3.5,3.5]}', '{"id": 2, "name": "apartment"}', None),
+    ])
+    get_city_apartment_index_mock = mocker.patch('app.routers.analyze.get_city_apartment_index', return_value=apartment_index)
     fetch_network_nodes_mock = mocker.patch('app.routers.analyze.fetch_network_nodes', return_value=[('apartment', [1, 2, 3]), ('cafe', [4, 5, 6])])
-    create_gdf_mock = mocker.patch('app.routers.analyze.create_gdf_with_centroid', return_value=mock_apartment_gdf)
     mock_graph = mocker.MagicMock()
-    deserialize_graph_mock = mocker.patch('app.routers.analyze.deserialize_graph', return_value=mock_graph)
+    get_city_graph_mock = mocker.patch('app.routers.analyze.get_city_graph', return_value=mock_graph)
     find_suitable_nodes_mock = mocker.patch('app.routers.analyze.find_suitable_apartment_network_nodes', return_value=[1, 2])
-    retrieve_suitable_apartments_mock = mocker.patch('app.routers.analyze.retrieve_suitable_apartments', return_value=mock_suitable_gdf)
+    retrieve_suitable_apartments_mock = mocker.patch('app.routers.analyze.retrieve_suitable_apartments', return_value=np.array([0]))
 
     city_id = 1
     kwargs = json.dumps({"max_meter_cafe": 500})
@@ -65,16 +62,15 @@ def test_analyze_apartments_with_valid_constraints(mocker):
     result = analyze_apartments(city_id=city_id, kwargs=kwargs, conn=mock_conn)
 
     # Assert
-    assert isinstance(result, JSONResponse)
+    assert isinstance(result, Response)
+    assert result.media_type == "application/json"
     content = json.loads(result.body)
-    assert "polygon" in content
-    assert "centroid" in content
+    assert [feature["properties"]["id"] for feature in content["polygon"]["features"]] == [1]
+    assert content["centroid"]["features"][0]["geometry"] == {"type": "Point", "coordinates": [1.5, 1.5]}
 
-    fetch_apartment_geom_mock.assert_called_once()
-    fetch_network_graph_mock.assert_called_once()
+    get_city_apartment_index_mock.assert_called_once_with(mocker.ANY, city_id, mock_graph)
     fetch_network_nodes_mock.assert_called_once_with(mocker.ANY, city_id, ['cafe'])
-    create_gdf_mock.assert_called_once_with(mock_cursor.fetchall.return_value)
-    deserialize_graph_mock.assert_called_once()
+    get_city_graph_mock.assert_called_once()
     find_suitable_nodes_mock.assert_called_once()
     retrieve_suitable_apartments_mock.assert_called_once()
 
@@ -92,22 +88,16 @@ def test_analyze_apartments_with_no_constraints(mocker):
     
     mocker.patch('app.db.get_connection', return_value=mock_conn)
 
-    mock_apartment_gdf = mocker.MagicMock()
-    mock_suitable_gdf = mocker.MagicMock()
-    mock_suitable_gdf.copy.return_value = mock_suitable_gdf
-    mock_suitable_gdf.to_json.return_value = '{"type":"FeatureCollection","features":[{"type":"Feature","geometry":{"type":"Polygon","coordinates":[[[1,1],[1,2],[2,2],[2,1],[1,1]]]},"properties":{"id":1,"name":"apartment"}}]}'
-    mock_suitable_gdf.__getitem__.return_value = mock_suitable_gdf
-    mock_suitable_gdf.drop.return_value = mock_suitable_gdf
-    mock_suitable_gdf.assign.return_value = mock_suitable_gdf
-
-    fetch_apartment_geom_mock = mocker.patch('app.routers.analyze.fetch_apartment_geom_and_centroid', return_value=mock_cursor.fetchall.return_value)
-    fetch_network_graph_mock = mocker.patch('app.routers.analyze.fetch_network_graph', return_value={"directed": False, "nodes": [], "links": []})
+    apartment_index = create_apartment_index([
+        (1, 1.5, 1.5, '{"type":"Polygon","coordinates":[[[1,1],[1,2],[2,2],[2,1],[1,1]]]}', '{"type":"Point","coordinates":[1.5,1.5]}', '{"id": 1, "name": "apartment"}', None),
+        (2, 3.5, 3.5, '{"type":"Polygon","coordinates":[[[3,3],[3,4],[4,4],[4,3],[3,3]]]}', '{"type":"Point","coordinates":[3.5,3.5]}', '{"id": 2, "name": "apartment"}', None),
+    ])
+    get_city_apartment_index_mock = mocker.patch('app.routers.analyze.get_city_apartment_index', return_value=apartment_index)
     fetch_network_nodes_mock = mocker.patch('app.routers.analyze.fetch_network_nodes', return_value=[('apartment', [1, 2, 3])])
-    create_gdf_mock = mocker.patch('app.routers.analyze.create_gdf_with_centroid', return_value=mock_apartment_gdf)
     mock_graph = mocker.MagicMock()
-    deserialize_graph_mock = mocker.patch('app.routers.analyze.deserialize_graph', return_value=mock_graph)
+    get_city_graph_mock = mocker.patch('app.routers.analyze.get_city_graph', return_value=mock_graph)
     find_suitable_nodes_mock = mocker.patch('app.routers.analyze.find_suitable_apartment_network_nodes', return_value=[1, 2, 3])
-    retrieve_suitable_apartments_mock = mocker.patch('app.routers.analyze.retrieve_suitable_apartments', return_value=mock_suitable_gdf)
+    retrieve_suitable_apartments_mock = mocker.patch('app.routers.analyze.retrieve_suitable_apartments', return_value=np.array([0]))
 
     city_id = 1
     kwargs = json.dumps({})
@@ -116,18 +106,33 @@ def test_analyze_apartments_with_no_constraints(mocker):
     result = analyze_apartments(city_id=city_id, kwargs=kwargs, conn=mock_conn)
     
     # Assert
-    assert isinstance(result, JSONResponse)
+    assert isinstance(result, Response)
     content = json.loads(result.body)
     assert "polygon" in content
     assert "centroid" in content
     
-    fetch_apartment_geom_mock.assert_called_once_with(mocker.ANY, city_id)
-    fetch_network_graph_mock.assert_called_once_with(mocker.ANY, city_id)
+    get_city_apartment_index_mock.assert_called_once_with(mocker.ANY, city_id, mock_graph)
+    get_city_graph_mock.assert_called_once_with(mocker.ANY, city_id)
     fetch_network_nodes_mock.assert_called_once_with(mocker.ANY, city_id, [])
-    create_gdf_mock.assert_called_once_with(mock_cursor.fetchall.return_value)
-    deserialize_graph_mock.assert_called_once_with(mocker.ANY)
     find_suitable_nodes_mock.assert_called_once_with(mock_graph, [1, 2, 3])
-    retrieve_suitable_apartments_mock.assert_called_once_with(mock_apartment_gdf, mock_graph, [1, 2, 3])
+    retrieve_suitable_apartments_mock.assert_called_once_with(apartment_index, [1, 2, 3])
+
+def test_analyze_apartments_sql_mode_skips_graph(mocker):
+    """Test that the SQL mode returns the collections built by the database without loading a graph."""
+    # Arrange
+    mocker.patch.object(analyze, 'ANALYZE_MODE', 'sql')
+    mocker.patch('app.routers.analyze.refresh_city_versions')
+    collection = '{"type":"FeatureCollection","features":[]}'
+    fetch_mock = mocker.patch('app.routers.analyze.fetch_suitable_apartment_collections', return_value=(collection, collection))
+    get_city_graph_mock = mocker.patch('app.routers.analyze.get_city_graph')
+
+    # Act
+    result = analyze_apartments(city_id=1, kwargs=json.dumps({"max_meter_park": 500, "max_meter_cafe": 200}), conn=mocker.MagicMock())
+
+    # Assert
+    assert json.loads(result.body) == {"polygon": json.loads(collection), "centroid": json.loads(collection)}
+    fetch_mock.assert_called_once_with(mocker.ANY, 1, {"park": 500, "cafe": 200})
+    get_city_graph_mock.assert_not_called()
 
 # Error Cases
 def test_analyze_apartments_error_handling(mocker):
@@ -150,8 +155,7 @@ def test_analyze_apartments_error_handling(mocker):
     
     # Scenario 2: Database error
     database_error = MockDatabaseError("Simulated database error")
-    fetch_apartment_geom_mock = mocker.patch('app.routers.analyze.fetch_apartment_geom_and_centroid', 
-                                          side_effect=database_error)
+    get_city_graph_mock = mocker.patch('app.routers.analyze.get_city_graph', side_effect=database_error)
     
     kwargs = json.dumps({"max_meter_cafe": 500})
     
@@ -163,13 +167,13 @@ def test_analyze_apartments_error_handling(mocker):
     assert "Database error" in exc_info.value.detail
     assert str(database_error) in exc_info.value.detail
     
-    fetch_apartment_geom_mock.assert_called_once()
+    get_city_graph_mock.assert_called_once()
     
-    # Scenario 3: Empty apartment data
-    fetch_apartment_geom_mock = mocker.patch('app.routers.analyze.fetch_apartment_geom_and_centroid', 
-                                          return_value=[])
-    create_gdf_mock = mocker.patch('app.routers.analyze.create_gdf_with_centroid', 
-                               side_effect=ValueError("not enough values to unpack"))
+    # Scenario 3: Invalid apartment data
+    mock_graph = mocker.MagicMock()
+    mocker.patch('app.routers.analyze.get_city_graph', return_value=mock_graph)
+    get_city_apartment_index_mock = mocker.patch('app.routers.analyze.get_city_apartment_index', 
+                                                 side_effect=ValueError("not enough values to unpack"))
     
     # Act & Assert for empty apartment data
     with pytest.raises(HTTPException) as exc_info:
@@ -179,6 +183,84 @@ def test_analyze_apartments_error_handling(mocker):
     assert "An error occurred" in exc_info.value.detail
     assert "not enough values to unpack" in exc_info.value.detail
     
-    fetch_apartment_geom_mock.assert_called_once()
-    create_gdf_mock.assert_called_once_with([])
-    
\ No newline at end of file
+    get_city_apartment_index_mock.assert_called_once_with(mocker.ANY, city_id, mock_graph)
+
+# =============================================================================
+# Tests for analyze_apartments_batch function
+# =============================================================================
+
+# Success Cases
+def test_analyze_apartments_batch_groups_scenarios_by_city(mocker):
+    """Test that the batch endpoint loads each city once and returns results per scenario."""
+
+    # Arrange
+    mock_conn = mocker.MagicMock()
+    get_city_apartment_index_mock = mocker.patch('app.routers.analyze.get_city_apartment_index', return_value=create_apartment_index([]))
+    fetch_network_nodes_mock = mocker.patch('app.routers.analyze.fetch_network_nodes', return_value=[('apartment', [1, 2, 3]), ('cafe', [4])])
+    get_city_graph_mock = mocker.patch('app.routers.analyze.get_city_graph', return_value=mocker.MagicMock())
+    find_scenarios_mock = mocker.patch(
+        'app.routers.analyze.find_suitable_apartment_network_nodes_for_scenarios',
+        side_effect=lambda G, apartment_nnodes, nodes_dict, scenario_max_distances: [[1]] * len(scenario_max_distances)
+    )
+    retrieve_suitable_apartments_mock = mocker.patch('app.routers.analyze.retrieve_suitable_apartments', return_value=np.array([], dtype=np.int64))
+
+    scenarios = [
+        AnalyzeScenario(city_id=1, kwargs={"max_meter_cafe": 500}),
+        AnalyzeScenario(city_id=2, kwargs={"max_meter_cafe": 300}),
+        AnalyzeScenario(city_id=1, kwargs={"max_meter_cafe": 800}),
+    ]
+
+    # Act
+    result = analyze_apartments_batch(scenarios=scenarios, conn=mock_conn)
+
+    # Assert
+    assert isinstance(result, Response)
+    content = json.loads(result.body)
+    assert [item["city_id"] for item in content] == [1, 2, 1]
+    assert content[2]["kwargs"] == {"max_meter_cafe": 800}
+    assert all(item["polygon"] == {"type": "FeatureCollection", "features": []} for item in content)
+
+    assert get_city_apartment_index_mock.call_count == 2
+    assert fetch_network_nodes_mock.call_count == 2
+    assert get_city_graph_mock.call_count == 2
+    assert find_scenarios_mock.call_count == 2
+    assert find_scenarios_mock.call_args_list[0][0][3] == [{"cafe": 500}, {"cafe": 800}]
+    assert retrieve_suitable_apartments_mock.call_count == 3
+
+def test_analyze_apartments_batch_sql_mode_splices_collections(mocker):
+    """Test that the SQL mode batch splices each scenario's collections into the response without parsing them."""
+    # Arrange
+    mocker.patch.object(analyze, 'ANALYZE_MODE', 'sql')
+    mocker.patch('app.routers.analyze.refresh_city_versions')
+    collection = '{"type":"FeatureCollection","features":[]}'
+    fetch_mock = mocker.patch('app.routers.analyze.fetch_suitable_apartment_collections', return_value=(collection, collection))
+    scenarios = [
+        AnalyzeScenario(city_id=1, kwargs={"max_meter_cafe": 500}),
+        AnalyzeScenario(city_id=2, kwargs={}),
+    ]
+
+    # Act
+    result = analyze_apartments_batch(scenarios=scenarios, conn=mocker.MagicMock())
+
+    # Assert
+    assert json.loads(result.body) == [
+        {"city_id": 1, "kwargs": {"max_meter_cafe": 500}, "polygon": json.loads(collection), "centroid": json.loads(collection)},
+        {"city_id": 2, "kwargs": {}, "polygon": json.loads(collection), "centroid": json.loads(collection)},
+    ]
+    assert fetch_mock.call_count == 2
+
+# Error Cases
+def test_analyze_apartments_batch_error_handling(mocker):
+    """Test that the batch endpoint reports database errors."""
+
+    # Arrange
+    mock_conn = mocker.MagicMock()
+    database_error = MockDatabaseError("Simulated database error")
+    mocker.patch('app.routers.analyze.get_city_graph', side_effect=database_error)
+
+    # Act & Assert
+    with pytest.raises(HTTPException) as exc_info:
+        analyze_apartments_batch(scenarios=[AnalyzeScenario(city_id=1, kwargs={})], conn=mock_conn)
+
+    assert exc_info.value.status_code == 500
+    assert "Database error" in exc_info.value.detail
@@ -1,6 +1,6 @@
 import pytest
 from fastapi import HTTPException
-from app.crud import fetch_amenities, fetch_apartment_geom_and_centroid, fetch_favorites, fetch_network_graph, fetch_network_nodes  
+from app.crud import fetch_amenities, fetch_apartment_features, fetch_favorites, fetch_network_graph, fetch_network_landmarks, fetch_network_nodes, fetch_seed_versions, fetch_suitable_apartment_collections
 
 # =============================================================================
 # Tests for fetch_favorites function
@@ -22,7 +22,8 @@ def test_fetch_favorites_returns_correct_amenities(mocker):
 
     # Assert
     mock_cur.execute.assert_called_once()
-    assert "WHERE (properties->>'id')::bigint IN %s" in mock_cur.execute.call_args[0][0]
+    assert "SELECT centroid_geojson AS centroid, properties, city_id" in mock_cur.execute.call_args[0][0]
+    assert "WHERE osm_id IN %s" in mock_cur.execute.call_args[0][0]
     assert mock_cur.execute.call_args[0][1] == ((1, 2),)
 
     # Verify the result
@@ -43,7 +44,7 @@ def test_fetch_favorites_with_empty_ids_list(mocker):
 
     # Assert
     mock_cur.execute.assert_called_once()
-    assert "WHERE (properties->>'id')::bigint IN %s" in mock_cur.execute.call_args[0][0]
+    assert "WHERE osm_id IN %s" in mock_cur.execute.call_args[0][0]
     assert mock_cur.execute.call_args[0][1] == ((),)
 
     # Verify the result is an empty list
@@ -74,62 +75,79 @@ def test_fetch_amenities_with_centroid(mocker):
     """Test that function returns amenities with centroids."""
     # Arrange
     mock_cursor = mocker.MagicMock()
-    mock_cursor.fetchall.return_value = [
+    rows = [
         {"centroid": '{"type":"Point","coordinates":[10.0,20.0]}', "properties": {"type": "restaurant"}}
     ]
+    mock_cursor.fetchmany.side_effect = [rows, []]
     city_id = 123
     name = "Restaurant"
     is_centroid = True
 
     # Act
-    result = fetch_amenities(mock_cursor, city_id, name, is_centroid)
+    result = list(fetch_amenities(mock_cursor, city_id, name, is_centroid))
 
     # Assert
     mock_cursor.execute.assert_called_once()
     sql = mock_cursor.execute.call_args[0][0]
-    assert "SELECT ST_AsGeoJSON(ST_Centroid(geom), 5) AS centroid" in sql
+    assert "SELECT centroid_geojson AS centroid, properties::text AS properties" in sql
     assert mock_cursor.execute.call_args[0][1] == (city_id, name)
-    assert result == mock_cursor.fetchall.return_value
+    assert result == [rows]
 
 def test_fetch_amenities_without_centroid(mocker):
     """Test that function returns amenities without centroid."""
     # Arrange
     mock_cursor = mocker.MagicMock()
-    mock_cursor.fetchall.return_value = [
+    rows = [
         {"geom": '{"type":"Point","coordinates":[10.0,20.0]}', "properties": {"amenity": "cafe", "name": "Starbucks"}}
     ]
+    mock_cursor.fetchmany.side_effect = [rows, []]
     city_id = 123
     name = "cafe"
     is_centroid = False
 
     # Act
-    result = fetch_amenities(mock_cursor, city_id, name, is_centroid)
+    result = list(fetch_amenities(mock_cursor, city_id, name, is_centroid))
 
     # Assert
     mock_cursor.execute.assert_called_once()
     sql = mock_cursor.execute.call_args[0][0]
-    assert "SELECT ST_AsGeoJSON(geom, 5) AS geom, properties" in sql
+    assert "SELECT geojson AS geom, properties::text AS properties" in sql
     assert mock_cursor.execute.call_args[0][1] == (city_id, name)
-    assert result == mock_cursor.fetchall.return_value
+    assert result == [rows]
 
 def test_fetch_amenities_with_special_characters_in_name(mocker):
     """Test that function handles special characters in name parameter."""
     # Arrange
     mock_cursor = mocker.MagicMock()
-    mock_cursor.fetchall.return_value = [
+    rows = [
         {"geom": '{"type":"Point","coordinates":[10.0,20.0]}', "properties": {"type": "café"}}
     ]
+    mock_cursor.fetchmany.side_effect = [rows, []]
     city_id = 123
     name = "Café & Bistro"
     is_centroid = False
 
     # Act
-    result = fetch_amenities(mock_cursor, city_id, name, is_centroid)
+    result = list(fetch_amenities(mock_cursor, city_id, name, is_centroid))
 
     # Assert
     mock_cursor.execute.assert_called_once()
     assert mock_cursor.execute.call_args[0][1] == (city_id, name)
-    assert result == mock_cursor.fetchall.return_value
+    assert result == [rows]
+
+def test_fetch_amenities_yields_batches(mocker):
+    """Test that rows are read with fetchmany in batches of the requested size."""
+    # Arrange
+    mock_cursor = mocker.MagicMock()
+    mock_cursor.fetchmany.side_effect = [[("g1", "{}"), ("g2", "{}")], [("g3", "{}")], []]
+
+    # Act
+    result = list(fetch_amenities(mock_cursor, 123, "cafe", False, batch_size=2))
+
+    # Assert
+    assert result == [[("g1", "{}"), ("g2", "{}")], [("g3", "{}")]]
+    mock_cursor.fetchmany.assert_called_with(2)
+    mock_cursor.fetchall.assert_not_called()
 
 # Error Cases
 def test_fetch_amenities_raises_exception_for_invalid_city_id(mocker):
@@ -189,6 +207,33 @@ def test_fetch_network_graph_raises_exception_for_invalid_city_id(mocker):
     assert excinfo.value.status_code == 500
     assert excinfo.value.detail == "Failed to fetch network graph: Database error"
 
+# =============================================================================
+# Tests for fetch_network_landmarks function
+# =============================================================================
+
+def test_fetch_network_landmarks_returns_table(mocker):
+    """Test that function returns the landmark table for a city."""
+    # Arrange
+    mock_cur = mocker.Mock()
+    mock_cur.fetchone.return_value = [{"nodes": [1], "landmarks": [1], "distances": [[0.0]]}]
+
+    # Act
+    result = fetch_network_landmarks(mock_cur, 1)
+
+    # Assert
+    assert "SELECT landmarks" in mock_cur.execute.call_args[0][0]
+    assert mock_cur.execute.call_args[0][1] == (1,)
+    assert result == {"nodes": [1], "landmarks": [1], "distances": [[0.0]]}
+
+def test_fetch_network_landmarks_returns_none_when_missing(mocker):
+    """Test that function returns None when the city has no landmark table."""
+    # Arrange
+    mock_cur = mocker.Mock()
+    mock_cur.fetchone.return_value = None
+
+    # Act & Assert
+    assert fetch_network_landmarks(mock_cur, 1) is None
+
 # =============================================================================
 # Tests for fetch_network_nodes function
 # =============================================================================
@@ -261,38 +306,36 @@ def test_fetch_network_nodes_raises_exception_for_invalid_city_id(mocker):
     assert excinfo.value.detail == "Failed to fetch network nodes: Database error"
 
 # =============================================================================
-# Tests for fetch_apartment_geom_and_centroid function
+# Tests for fetch_apartment_features function
 # =============================================================================
 
 # Success Cases
-def test_fetch_apartment_geom_and_centroid_returns_correct_data(mocker):
+def test_fetch_apartment_features_returns_correct_data(mocker):
     """Test that function returns correct data for given city_id."""
     # Arrange
     mock_cursor = mocker.MagicMock()
     mock_cursor.fetchall.return_value = [
-        {
-            "geom": '{"type":"Polygon","coordinates":[[[1,1],[1,2],[2,2],[2,1],[1,1]]]}',
-            "centroid": '{"type":"Point","coordinates":[1.5,1.5]}',
-            "properties": {"id": 1, "name": "apartment"}
-        }
+        (1, 1.5, 1.5, '{"type":"Polygon","coordinates":[]}', '{"type":"Point","coordinates":[1.5,1.5]}', '{"id": 1}')
     ]
     city_id = 1
 
     # Act
-    result = fetch_apartment_geom_and_centroid(mock_cursor, city_id)
+    result = fetch_apartment_features(mock_cursor, city_id)
 
     # Assert
     mock_cursor.execute.assert_called_once()
     actual_sql = mock_cursor.execute.call_args[0][0]
-    assert "SELECT ST_AsGeoJSON(geom, 5) AS geom" in actual_sql
-    assert "ST_AsGeoJSON(ST_Centroid(geom), 5) AS centroid" in actual_sql
+    assert "COALESCE(osm_id, -1) AS osm_id" in actual_sql
+    assert "geojson" in actual_sql and "centroid_geojson" in actual_sql and "properties::text" in actual_sql
+    assert "network_node" in actual_sql
+    assert "ST_X(centroid)" in actual_sql and "ST_Y(centroid)" in actual_sql
     assert "FROM amenities" in actual_sql
     assert "WHERE city_id = %s AND name = 'apartment'" in actual_sql
     assert mock_cursor.execute.call_args[0][1] == (city_id,)
     assert result == mock_cursor.fetchall.return_value
 
 # Edge Cases
-def test_fetch_apartment_geom_and_centroid_handles_nonexistent_city_id(mocker):
+def test_fetch_apartment_features_handles_nonexistent_city_id(mocker):
     """Test that function returns empty list for nonexistent city_id."""
     # Arrange
     mock_cursor = mocker.MagicMock()
@@ -300,20 +343,21 @@ def test_fetch_apartment_geom_and_centroid_handles_nonexistent_city_id(mocker):
     city_id = 999 # Assuming this is a city_id with no apartments
 
     # Act
-    result = fetch_apartment_geom_and_centroid(mock_cursor, city_id)
+    result = fetch_apartment_features(mock_cursor, city_id)
 
     # Assert
     mock_cursor.execute.assert_called_once()
     actual_sql = mock_cursor.execute.call_args[0][0]
-    assert "SELECT ST_AsGeoJSON(geom, 5) AS geom" in actual_sql
-    assert "ST_AsGeoJSON(ST_Centroid(geom), 5) AS centroid" in actual_sql
+    assert "COALESCE(osm_id, -1) AS osm_id" in actual_sql
+    assert "geojson" in actual_sql and "centroid_geojson" in actual_sql and "properties::text" in actual_sql
+    assert "ST_X(centroid)" in actual_sql and "ST_Y(centroid)" in actual_sql
     assert "FROM amenities" in actual_sql
     assert "WHERE city_id = %s AND name = 'apartment'" in actual_sql
     assert mock_cursor.execute.call_args[0][1] == (city_id,)
     assert result == []  # Function should return empty list
 
 # Error Cases
-def test_fetch_apartment_geom_and_centroid_raises_exception_for_invalid_city_id(mocker):
+def test_fetch_apartment_features_raises_exception_for_invalid_city_id(mocker):
     """Test that function raises HTTPException for invalid city_id."""
     # Arrange
     mock_cursor = mocker.MagicMock()
@@ -322,9 +366,72 @@ def test_fetch_apartment_geom_and_centroid_raises_exception_for_invalid_city_id(
 
     # Act & Assert
     with pytest.raises(HTTPException) as excinfo:
-        fetch_apartment_geom_and_centroid(mock_cursor, city_id)
+        fetch_apartment_features(mock_cursor, city_id)
 
     # Verify exception details
     assert excinfo.value.status_code == 500
-    assert excinfo.value.detail == "Failed to fetch apartment geometry and centroid: Database error"
-    
\ No newline at end of file
+    assert excinfo.value.detail == "Failed to fetch apartment features: Database error"
+    
+
+# =============================================================================
+# Tests for fetch_suitable_apartment_collections function
+# =============================================================================
+
+def test_fetch_suitable_apartment_collections_filters_by_distance_columns(mocker):
+    """Test that each requested amenity becomes a bound condition on its distance column."""
+    # Arrange
+    mock_cur = mocker.Mock()
+    mock_cur.fetchone.return_value = ('{"type":"FeatureCollection","features":[]}', '{"type":"FeatureCollection","features":[]}')
+
+    # Act
+    result = fetch_suitable_apartment_collections(mock_cur, 1, {"park": 500, "cafe": 200, "supermarket": 0, "unknown": 100})
+
+    # Assert
+    sql, params = mock_cur.execute.call_args[0]
+    assert "dist_park <= %s" in sql and "dist_cafe <= %s" in sql
+    assert "dist_supermarket" not in sql and "unknown" not in sql
+    assert params == (1, 500, 200)
+    assert result == mock_cur.fetchone.return_value
+
+def test_fetch_suitable_apartment_collections_raises_exception_on_error(mocker):
+    """Test that function raises HTTPException when the query fails."""
+    # Arrange
+    mock_cur = mocker.Mock()
+    mock_cur.execute.side_effect = Exception('column "dist_park" does not exist')
+
+    # Act & Assert
+    with pytest.raises(HTTPException) as exc_info:
+        fetch_suitable_apartment_collections(mock_cur, 1, {"park": 500})
+
+    assert exc_info.value.status_code == 500
+    assert "Failed to fetch suitable apartments" in exc_info.value.detail
+
+# =============================================================================
+# Tests for fetch_seed_versions function
+# =============================================================================
+
+def test_fetch_seed_versions_returns_version_by_city(mocker):
+    """Test that function returns each city's version from the seed manifest."""
+    # Arrange
+    mock_cur = mocker.Mock()
+    mock_cur.fetchall.return_value = [(1, "a1b2c3d4e5f6"), (2, "0123456789ab")]
+
+    # Act
+    result = fetch_seed_versions(mock_cur)
+
+    # Assert
+    assert "FROM seed_manifest" in mock_cur.execute.call_args[0][0]
+    assert result == {1: "a1b2c3d4e5f6", 2: "0123456789ab"}
+
+def test_fetch_seed_versions_raises_exception_without_manifest(mocker):
+    """Test that function raises HTTPException when the manifest cannot be read."""
+    # Arrange
+    mock_cur = mocker.Mock()
+    mock_cur.execute.side_effect = Exception('relation "seed_manifest" does not exist')
+
+    # Act & Assert
+    with pytest.raises(HTTPException) as exc_info:
+        fetch_seed_versions(mock_cur)
+
+    assert exc_info.value.status_code == 500
+    assert "Failed to fetch seed versions" in exc_info.value.detail
@@ -0,0 +1,142 @@
+import json
+import sys
+from unittest.mock import MagicMock
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+# Create a custom DatabaseError that inherits from BaseException
+class MockDatabaseError(Exception):
+    pass
+# Mock psycopg2 so importing the router does not open a connection pool
+mock_psycopg2 = MagicMock()
+mock_pool = MagicMock()
+mock_pool.SimpleConnectionPool.return_value = MagicMock()
+mock_psycopg2.pool = mock_pool
+mock_psycopg2.DatabaseError = MockDatabaseError
+sys.modules['psycopg2'] = mock_psycopg2
+sys.modules['psycopg2.pool'] = mock_pool
+
+from app import cache
+from app.db import get_connection
+from app.routers import favorites
+from app.routers.favorites import get_favorites, clear_favorites_cache
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    clear_favorites_cache()
+    yield
+    clear_favorites_cache()
+
+def make_row(id, city_id=1):
+    return ('{"type":"Point","coordinates":[1.5,1.5]}', {"id": id, "name": f"Cafe {id}"}, city_id)
+
+# =============================================================================
+# Tests for get_favorites function
+# =============================================================================
+
+# Success Cases
+def test_get_favorites_returns_features_in_requested_order(mocker):
+    """Test that features are returned in the order of the requested IDs."""
+    # Arrange
+    mock_conn = mocker.MagicMock()
+    fetch_mock = mocker.patch('app.routers.favorites.fetch_favorites', return_value=[make_row(2), make_row(1)])
+
+    # Act
+    result = get_favorites(ids=["1", "2"], conn=mock_conn)
+
+    # Assert
+    content = json.loads(result.body)
+    assert [feature['properties']['id'] for feature in content] == [1, 2]
+    assert content[0]['geometry'] == {"type": "Point", "coordinates": [1.5, 1.5]}
+    fetch_mock.assert_called_once_with(mocker.ANY, [1, 2])
+
+def test_get_favorites_serves_repeated_ids_from_cache(mocker):
+    """Test that IDs already fetched are not looked up in the database again."""
+    # Arrange
+    mock_conn = mocker.MagicMock()
+    fetch_mock = mocker.patch('app.routers.favorites.fetch_favorites', side_effect=[[make_row(1)], [make_row(3)]])
+
+    # Act
+    get_favorites(ids=["1"], conn=mock_conn)
+    result = get_favorites(ids=["1", "3"], conn=mock_conn)
+
+    # Assert
+    content = json.loads(result.body)
+    assert [feature['properties']['id'] for feature in content] == [1, 3]
+    assert fetch_mock.call_count == 2
+    assert fetch_mock.call_args_list[1][0][1] == [3]
+
+def test_get_favorites_skips_database_when_all_ids_cached(mocker):
+    """Test that a fully cached request does not touch the database."""
+    # Arrange
+    mock_conn = mocker.MagicMock()
+    fetch_mock = mocker.patch('app.routers.favorites.fetch_favorites', return_value=[])
+
+    # Act
+    get_favorites(ids=["999"], conn=mock_conn)
+    result = get_favorites(ids=["999"], conn=mock_conn)
+
+    # Assert
+    assert json.loads(result.body) == []
+    fetch_mock.assert_called_once()
+
+# Edge Cases
+def test_get_favorites_evicts_least_recently_used(mocker):
+    """Test that the cache stays within its size limit."""
+    # Arrange
+    mock_conn = mocker.MagicMock()
+    mocker.patch.object(favorites, 'FAVORITES_CACHE_SIZE', 2)
+    fetch_mock = mocker.patch('app.routers.favorites.fetch_favorites', side_effect=lambda cur, ids: [make_row(id) for id in ids])
+
+    # Act
+    get_favorites(ids=["1", "2", "3"], conn=mock_conn)
+    get_favorites(ids=["1"], conn=mock_conn)
+
+    # Assert
+    assert len(favorites._favorites_cache) == 2
+    assert fetch_mock.call_args_list[1][0][1] == [1]
+
+def test_get_favorites_refetches_after_city_data_changed(mocker):
+    """Test that a reseeded city drops cached favorites so they are fetched again."""
+    # Arrange
+    mock_conn = mocker.MagicMock()
+    fetch_mock = mocker.patch('app.routers.favorites.fetch_favorites', return_value=[make_row(1)])
+    get_favorites(ids=["1"], conn=mock_conn)
+
+    # Act
+    for callback in cache._invalidation_callbacks:
+        callback({1})
+    get_favorites(ids=["1"], conn=mock_conn)
+
+    # Assert
+    assert fetch_mock.call_count == 2
+
+# Error Cases
+def test_get_favorites_error_handling(mocker):
+    """Test that fetch errors are surfaced as HTTP 500."""
+    # Arrange
+    mock_conn = mocker.MagicMock()
+    mocker.patch('app.routers.favorites.fetch_favorites', side_effect=Exception("Simulated error"))
+
+    # Act & Assert
+    with pytest.raises(HTTPException) as exc_info:
+        get_favorites(ids=["1"], conn=mock_conn)
+
+    assert exc_info.value.status_code == 500
+    assert "Simulated error" in exc_info.value.detail
+
+def test_get_favorites_rejects_non_numeric_ids(mocker):
+    """Test that non-numeric IDs are rejected with HTTP 422 before reaching the database."""
+    # Arrange
+    app = FastAPI()
+    app.include_router(favorites.router)
+    app.dependency_overrides[get_connection] = lambda: mocker.MagicMock()
+    fetch_mock = mocker.patch('app.routers.favorites.fetch_favorites')
+
+    # Act
+    response = TestClient(app).get("/favorites", params={"ids": ["1", "abc"]})
+
+    # Assert
+    assert response.status_code == 422
+    fetch_mock.assert_not_called()
@@ -0,0 +1,97 @@
+import json
+import numpy as np
+from app.utils.geometry import create_apartment_index, render_feature, render_suitable_apartments
+
+POLYGON = '{"type":"Polygon","coordinates":[[[1,1],[1,2],[2,2],[2,1],[1,1]]]}'
+CENTROID = '{"type":"Point","coordinates":[1.5,1.5]}'
+
+# =============================================================================
+# Tests for create_apartment_index function
+# =============================================================================
+
+# Success Cases
+def test_create_apartment_index_builds_columns_and_features():
+    """Test that apartment rows become id and centroid arrays with pre-rendered features."""
+    # Arrange
+    rows = [
+        (11, 1.5, 1.5, POLYGON, CENTROID, '{"id": 11, "name": "apartment"}', 1001),
+        (12, 2.5, 3.5, POLYGON, CENTROID, '{"id": 12}', None),
+    ]
+
+    # Act
+    apartment_index = create_apartment_index(rows)
+
+    # Assert
+    assert apartment_index["ids"].dtype == np.int64
+    assert apartment_index["ids"].tolist() == [11, 12]
+    assert apartment_index["x"].tolist() == [1.5, 2.5]
+    assert apartment_index["y"].tolist() == [1.5, 3.5]
+    assert apartment_index["network_nodes"].tolist() == [1001, -1]
+    assert json.loads(apartment_index["polygon_features"][0]) == {
+        "type": "Feature",
+        "geometry": json.loads(POLYGON),
+        "properties": {"id": 11, "name": "apartment"},
+    }
+    assert json.loads(apartment_index["centroid_features"][1])["geometry"] == json.loads(CENTROID)
+
+# Edge Cases
+def test_create_apartment_index_skips_rows_without_geometry():
+    """Test that rows missing a geometry or centroid are skipped."""
+    # Arrange
+    rows = [
+        (1, 0.0, 0.0, None, CENTROID, '{"id": 1}', None),
+        (2, None, None, POLYGON, None, '{"id": 2}', None),
+        (3, 0.3, 0.6, POLYGON, CENTROID, '{"id": 3}', None),
+    ]
+
+    # Act
+    apartment_index = create_apartment_index(rows)
+
+    # Assert
+    assert apartment_index["ids"].tolist() == [3]
+    assert len(apartment_index["polygon_features"]) == 1
+
+def test_create_apartment_index_empty_rows():
+    """Test that a city without apartments gives an empty index instead of an error."""
+    # Act
+    apartment_index = create_apartment_index([])
+
+    # Assert
+    assert len(apartment_index["ids"]) == 0
+    assert apartment_index["polygon_features"] == []
+
+# =============================================================================
+# Tests for render_suitable_apartments function
+# =============================================================================
+
+def test_render_suitable_apartments_selects_positions():
+    """Test that only the features at the given positions are rendered, in order."""
+    # Arrange
+    apartment_index = create_apartment_index([
+        (1, 1.5, 1.5, POLYGON, CENTROID, '{"id": 1}', None),
+        (2, 1.5, 1.5, POLYGON, CENTROID, '{"id": 2}', None),
+        (3, 1.5, 1.5, POLYGON, CENTROID, None, None),
+    ])
+
+    # Act
+    polygon, centroid = render_suitable_apartments(apartment_index, np.array([0, 2]))
+
+    # Assert
+    polygon = json.loads(polygon)
+    centroid = json.loads(centroid)
+    assert polygon["type"] == "FeatureCollection"
+    assert [feature["properties"] for feature in polygon["features"]] == [{"id": 1}, None]
+    assert [feature["geometry"]["type"] for feature in centroid["features"]] == ["Point", "Point"]
+
+def test_render_suitable_apartments_no_positions():
+    """Test that an empty selection renders empty FeatureCollections."""
+    # Act
+    polygon, centroid = render_suitable_apartments(create_apartment_index([]), np.array([], dtype=np.int64))
+
+    # Assert
+    assert json.loads(polygon) == {"type": "FeatureCollection", "features": []}
+    assert json.loads(centroid) == {"type": "FeatureCollection", "features": []}
+
+def test_render_feature_defaults_properties_to_null():
+    """Test that a missing properties text renders as JSON null."""
+    assert json.loads(render_feature(CENTROID, None)) == {"type": "Feature", "geometry": json.loads(CENTROID), "properties": None}
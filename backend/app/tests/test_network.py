@@ -1,11 +1,16 @@
 import networkx as nx
 import numpy as np
-import geopandas as gpd
-from shapely.geometry import Point
 from app.utils.network import (
+    attach_landmarks,
     deserialize_graph,
+    find_apartment_nearest_nodes,
+    find_nearest_nodes,
+    find_nodes_within_distance,
+    find_walking_route,
+    haversine_distance,
     find_suitable_apartment_network_nodes,
-    retrieve_suitable_apartments
+    find_suitable_apartment_network_nodes_for_scenarios,
+    retrieve_suitable_apartments,
 )
 import pytest
 
@@ -72,11 +77,12 @@ def test_find_suitable_apartment_network_nodes_with_constraints(mocker):
     # Arrange
     G = nx.Graph()
     apartment_nnodes = [1, 2, 3, 4]
-    mock_dijkstra = mocker.patch.object(nx, 'multi_source_dijkstra_path_length')
-    mock_dijkstra.side_effect = [
-        {1: 100, 2: 200, 3: 300},
-        {1: 150, 2: 250, 4: 350}
-    ]
+    mock_search = mocker.patch('app.utils.network.find_nodes_within_distance')
+    # Searches run concurrently, so results are keyed by their sources rather than call order
+    mock_search.side_effect = lambda G, sources, max_distance: {
+        10: {1: 100, 2: 200, 3: 300},
+        20: {1: 150, 2: 250, 4: 350},
+    }[sources[0]]
     amenity_kwargs = {
         'supermarket': ([10, 11], 500),
         'park': ([20, 21], 600)
@@ -87,19 +93,19 @@ def test_find_suitable_apartment_network_nodes_with_constraints(mocker):
 
     # Assert
     assert result == [1, 2]
-    assert mock_dijkstra.call_count == 2
+    assert mock_search.call_count == 2
 
 def test_find_suitable_apartment_network_nodes_multiple_amenities(mocker):
     """Test that function correctly handles multiple amenity types with different constraints."""
     # Arrange
     G = nx.Graph()
     apartment_nnodes = [1, 2, 3, 4, 5]
-    mock_dijkstra = mocker.patch.object(nx, 'multi_source_dijkstra_path_length')
-    mock_dijkstra.side_effect = [
-        {1: 100, 2: 200, 3: 300},
-        {1: 150, 2: 250, 4: 350},
-        {1: 180, 5: 280}
-    ]
+    mock_search = mocker.patch('app.utils.network.find_nodes_within_distance')
+    mock_search.side_effect = lambda G, sources, max_distance: {
+        10: {1: 100, 2: 200, 3: 300},
+        20: {1: 150, 2: 250, 4: 350},
+        30: {1: 180, 5: 280},
+    }[sources[0]]
     amenity_kwargs = {
         'supermarket': ([10, 11], 500),
         'park': ([20, 21], 600),
@@ -111,7 +117,7 @@ def test_find_suitable_apartment_network_nodes_multiple_amenities(mocker):
 
     # Assert
     assert result == [1]
-    assert mock_dijkstra.call_count == 3
+    assert mock_search.call_count == 3
 
 def test_find_suitable_apartment_network_nodes_real_graph():
     """Test finding suitable apartment network nodes with a real graph instance."""
@@ -161,7 +167,7 @@ def test_find_suitable_apartment_network_nodes_empty_apartment_nodes(mocker):
     # Arrange
     G = nx.Graph()
     apartment_nnodes = []
-    mock_dijkstra = mocker.patch.object(nx, 'multi_source_dijkstra_path_length')
+    mock_search = mocker.patch('app.utils.network.find_nodes_within_distance', return_value={})
     amenity_kwargs = {
         'supermarket': ([10, 11], 500),
         'park': ([20, 21], 600)
@@ -172,7 +178,7 @@ def test_find_suitable_apartment_network_nodes_empty_apartment_nodes(mocker):
 
     # Assert
     assert result == []
-    assert mock_dijkstra.call_count == 2
+    assert mock_search.call_count == 2
 
 # Error Cases
 def test_find_suitable_apartment_network_nodes_error_handling():
@@ -197,8 +203,8 @@ def test_find_suitable_apartment_network_nodes_networkx_error(mocker):
     # Arrange
     G = nx.MultiGraph()
     apartment_nnodes = [1, 2, 3]
-    mocker.patch.object(nx, 'multi_source_dijkstra_path_length', 
-                                        side_effect=nx.NetworkXNoPath("No path between nodes"))
+    mocker.patch('app.utils.network.find_nodes_within_distance',
+                 side_effect=nx.NetworkXNoPath("No path between nodes"))
     amenity_kwargs = {
         'cafe': ([2], 500)
     }
@@ -211,97 +217,359 @@ def test_find_suitable_apartment_network_nodes_networkx_error(mocker):
     assert "No path between nodes" in str(exc_info.value)
 
 # =============================================================================
-# Tests for retrieve_suitable_apartments function
+# Tests for find_suitable_apartment_network_nodes_for_scenarios function
 # =============================================================================
 
 # Success Cases
-def test_retrieve_suitable_apartments_with_matching_nodes(mocker):
-    """Test that function returns apartments whose nearest nodes are in the suitable nodes list."""
+def test_find_suitable_apartment_network_nodes_for_scenarios_matches_single_runs():
+    """Test that shared searches give the same result as one search per scenario."""
     # Arrange
-    points = [Point(1, 1), Point(2, 2), Point(3, 3)]
-    data = {
-        'id': [1, 2, 3],
-        'centroid': points
-    }
-    apartment_gdf = gpd.GeoDataFrame(data=data, geometry=points)
-    G = mocker.MagicMock()
-    nearest_nodes_mock = mocker.patch('osmnx.distance.nearest_nodes')
-    nearest_nodes_mock.return_value = np.array([100, 200, 300])
-    suitable_apartment_nnodes = [100, 300]
+    G = nx.MultiGraph()
+    G.add_edges_from([(1, 2, {'length': 1}), (2, 3, {'length': 1}), (1, 3, {'length': 2}), (3, 4, {'length': 3})])
+    apartment_nnodes = [1, 2, 3, 4]
+    nodes_dict = {'cafe': [2], 'park': [3]}
+    scenario_max_distances = [
+        {'cafe': 1, 'park': 2},
+        {'cafe': 0.5, 'park': 2},
+        {'park': 3},
+        {},
+    ]
 
     # Act
-    result = retrieve_suitable_apartments(apartment_gdf, G, suitable_apartment_nnodes)
+    result = find_suitable_apartment_network_nodes_for_scenarios(G, apartment_nnodes, nodes_dict, scenario_max_distances)
 
     # Assert
-    assert len(result) == 2
-    assert result['id'].tolist() == [1, 3]
-    nearest_nodes_mock.assert_called_once()
+    expected = [
+        find_suitable_apartment_network_nodes(
+            G, apartment_nnodes,
+            **{key: (nodes_dict[key], value) for key, value in max_distances.items()}
+        )
+        for max_distances in scenario_max_distances
+    ]
+    assert result == expected
+    assert result == [[1, 2, 3], [2], [1, 2, 3, 4], [1, 2, 3, 4]]
 
-# Edge Cases
-def test_retrieve_suitable_apartments_no_matching_nodes(mocker):
-    """Test that function returns empty result when no apartments have nearest nodes in suitable list."""
+def test_find_suitable_apartment_network_nodes_for_scenarios_searches_once_per_amenity(mocker):
+    """Test that each amenity is searched once, at the largest requested distance."""
     # Arrange
-    points = [Point(1, 1), Point(2, 2), Point(3, 3)]
-    data = {
-        'id': [1, 2, 3],
-        'centroid': points
-    }
-    apartment_gdf = gpd.GeoDataFrame(data=data, geometry=points)
-    G = mocker.MagicMock()
-    nearest_nodes_mock = mocker.patch('osmnx.distance.nearest_nodes')
-    
-    # Two scenarios that result in no matching nodes:
-    # 1. Nodes found but none match the suitable nodes
-    nearest_nodes_mock.return_value = np.array([400, 500, 600])
-    suitable_apartment_nnodes = [700, 800, 900]
+    G = nx.Graph()
+    mock_search = mocker.patch('app.utils.network.find_nodes_within_distance')
+    mock_search.side_effect = lambda G, sources, max_distance: {10: {1: 100, 2: 400}, 20: {1: 50}}[sources[0]]
+    nodes_dict = {'cafe': [10], 'park': [20]}
+    scenario_max_distances = [{'cafe': 200}, {'cafe': 500}, {'cafe': 500, 'park': 100}]
 
     # Act
-    result = retrieve_suitable_apartments(apartment_gdf, G, suitable_apartment_nnodes)
+    result = find_suitable_apartment_network_nodes_for_scenarios(G, [1, 2, 3], nodes_dict, scenario_max_distances)
 
     # Assert
-    assert len(result) == 0
-    nearest_nodes_mock.assert_called_once()
-    
-    # 2. Empty suitable nodes list
-    nearest_nodes_mock.reset_mock()
-    nearest_nodes_mock.return_value = np.array([100, 200, 300])
-    suitable_apartment_nnodes = []
-    
+    assert result == [[1], [1, 2], [1]]
+    assert mock_search.call_count == 2
+    mock_search.assert_any_call(G, [10], 500)
+    mock_search.assert_any_call(G, [20], 100)
+
+# Edge Cases
+def test_find_suitable_apartment_network_nodes_for_scenarios_ignores_unknown_amenities(mocker):
+    """Test that amenities without network nodes do not constrain the result."""
+    # Arrange
+    G = nx.Graph()
+    mock_search = mocker.patch('app.utils.network.find_nodes_within_distance')
+
     # Act
-    result = retrieve_suitable_apartments(apartment_gdf, G, suitable_apartment_nnodes)
-    
+    result = find_suitable_apartment_network_nodes_for_scenarios(G, [1, 2], {'cafe': []}, [{'cafe': 100, 'school': 200}])
+
     # Assert
-    assert result.empty
-    nearest_nodes_mock.assert_called_once()
+    assert result == [[1, 2]]
+    mock_search.assert_not_called()
 
 # Error Cases
-def test_retrieve_suitable_apartments_error_handling(mocker):
-    """Test error handling in retrieve_suitable_apartments function."""
+def test_find_suitable_apartment_network_nodes_for_scenarios_error_handling():
+    """Test error handling in find_suitable_apartment_network_nodes_for_scenarios."""
     # Arrange
-    # 1. Invalid GeoDataFrame
-    apartment_gdf = None
     G = nx.MultiGraph()
-    suitable_apartment_nnodes = [1, 2]
 
     # Act & Assert
     with pytest.raises(ValueError) as exc_info:
-        retrieve_suitable_apartments(apartment_gdf, G, suitable_apartment_nnodes)
-    
-    assert "Error retrieving suitable apartments" in str(exc_info.value)
-    
-    # 2. Error in osmnx nearest_nodes function
-    points = [Point(1, 1), Point(2, 2)]
-    data = {
-        'id': [1, 2],
-        'centroid': points
-    }
-    apartment_gdf = gpd.GeoDataFrame(data=data, geometry=points)
-    mocker.patch('osmnx.distance.nearest_nodes', 
-                                     side_effect=Exception("Network error"))
-    
+        find_suitable_apartment_network_nodes_for_scenarios(G, [1], {'cafe': [2]}, [{'cafe': "invalid_distance"}])
+
+    assert "Error finding suitable apartment network nodes" in str(exc_info.value)
+
+# =============================================================================
+# Tests for find_nodes_within_distance function
+# =============================================================================
+
+# Success Cases
+def test_find_nodes_within_distance_matches_networkx():
+    """Test that the csgraph search matches networkx multi-source Dijkstra."""
+    # Arrange
+    G = nx.MultiDiGraph()
+    G.add_edges_from([(1, 2, {'length': 5}), (1, 2, {'length': 1}), (2, 3, {'length': 1}), (3, 1, {'length': 2}), (4, 3, {'length': 1})])
+
+    # Act
+    result = find_nodes_within_distance(G, [1, 4], 2)
+
+    # Assert
+    assert result == nx.multi_source_dijkstra_path_length(G, [1, 4], cutoff=2, weight="length")
+    assert result == {1: 0, 4: 0, 2: 1, 3: 1}
+
+def test_find_nodes_within_distance_undirected_graph():
+    """Test that edges of undirected graphs can be walked in both directions."""
+    # Arrange
+    G = nx.MultiGraph()
+    G.add_edges_from([(1, 2, {'length': 1}), (2, 3, {'length': 1})])
+
+    # Act
+    result = find_nodes_within_distance(G, [3], 1.5)
+
+    # Assert
+    assert result == {3: 0, 2: 1}
+
+def test_find_nodes_within_distance_indexed_graph():
+    """Test that graphs with contiguous node indices are searched without a position lookup table."""
+    # Arrange
+    G = nx.MultiDiGraph(osm_ids=[9001, 42, 7])
+    G.add_edges_from([(0, 1, {'length': 1}), (1, 2, {'length': 1}), (2, 0, {'length': 5})])
+
+    # Act
+    result = find_nodes_within_distance(G, [2], 5)
+
+    # Assert
+    assert result == {2: 0, 0: 5}
+    assert G.graph['_adjacency'][1].dtype == np.int32
+
+def test_find_nodes_within_distance_undirected_simple_graph():
+    """Test that a deserialized undirected simple graph gives the same distances as its two-way MultiDiGraph."""
+    # Arrange
+    multi = nx.MultiDiGraph()
+    for u, v, length in [(1, 2, 3.0), (2, 3, 4.0), (1, 3, 9.0)]:
+        multi.add_edge(u, v, length=length)
+        multi.add_edge(v, u, length=length)
+    G = deserialize_graph(nx.node_link_data(nx.Graph(multi)))
+
+    # Act
+    result = find_nodes_within_distance(G, [3], 10)
+
+    # Assert
+    assert not G.is_directed()
+    assert result == nx.multi_source_dijkstra_path_length(multi, [3], cutoff=10, weight="length")
+
+def test_find_nodes_within_distance_reuses_cached_matrix():
+    """Test that the adjacency matrix is built once and stored on the graph."""
+    # Arrange
+    G = make_grid_graph()
+
+    # Act
+    find_nodes_within_distance(G, [0], 100)
+    adjacency = G.graph['_adjacency']
+    find_nodes_within_distance(G, [8], 100)
+
+    # Assert
+    assert G.graph['_adjacency'] is adjacency
+
+# =============================================================================
+# Tests for retrieve_suitable_apartments function
+# =============================================================================
+
+# Success Cases
+def test_retrieve_suitable_apartments_with_matching_nodes():
+    """Test that function returns the positions of apartments whose nearest nodes are in the suitable nodes list."""
+    # Arrange
+    apartment_index = {"nearest_nodes": np.array([100, 200, 300, 100])}
+    suitable_apartment_nnodes = [100, 300]
+
+    # Act
+    result = retrieve_suitable_apartments(apartment_index, suitable_apartment_nnodes)
+
+    # Assert
+    assert result.tolist() == [0, 2, 3]
+
+# Edge Cases
+def test_retrieve_suitable_apartments_no_matching_nodes():
+    """Test that function returns no positions when no apartments have nearest nodes in suitable list."""
+    # Arrange
+    apartment_index = {"nearest_nodes": np.array([400, 500, 600])}
+
+    # Act & Assert
+    assert len(retrieve_suitable_apartments(apartment_index, [700, 800, 900])) == 0
+    assert len(retrieve_suitable_apartments(apartment_index, [])) == 0
+    assert len(retrieve_suitable_apartments({"nearest_nodes": np.array([], dtype=np.int64)}, [1])) == 0
+
+# Error Cases
+def test_retrieve_suitable_apartments_error_handling():
+    """Test error handling in retrieve_suitable_apartments function."""
     # Act & Assert
     with pytest.raises(ValueError) as exc_info:
-        retrieve_suitable_apartments(apartment_gdf, G, suitable_apartment_nnodes)
-    
+        retrieve_suitable_apartments(None, [1, 2])
+
     assert "Error retrieving suitable apartments" in str(exc_info.value)
-    assert "Network error" in str(exc_info.value) 
+
+# =============================================================================
+# Tests for haversine_distance function
+# =============================================================================
+
+def test_haversine_distance_one_degree_of_latitude():
+    """Test that one degree of latitude is about 111 km."""
+    # Act
+    result = haversine_distance(-105.0, 39.0, -105.0, 40.0)
+
+    # Assert
+    assert result == pytest.approx(111195, rel=1e-3)
+
+def test_haversine_distance_same_point():
+    """Test that the distance between identical points is zero."""
+    assert haversine_distance(-105.0, 39.0, -105.0, 39.0) == 0
+
+# =============================================================================
+# Tests for find_nearest_nodes function
+# =============================================================================
+
+def make_grid_graph():
+    """Build a small bidirectional 3x3 walk grid with ~100 m blocks."""
+    G = nx.MultiDiGraph()
+    step = 0.001
+    for i in range(3):
+        for j in range(3):
+            G.add_node(i * 3 + j, x=-105.0 + j * step, y=39.0 + i * step)
+    for i in range(3):
+        for j in range(3):
+            node = i * 3 + j
+            for neighbor in ([node + 1] if j < 2 else []) + ([node + 3] if i < 2 else []):
+                length = haversine_distance(G.nodes[node]['x'], G.nodes[node]['y'], G.nodes[neighbor]['x'], G.nodes[neighbor]['y'])
+                G.add_edge(node, neighbor, length=length)
+                G.add_edge(neighbor, node, length=length)
+    return G
+
+def test_find_nearest_nodes_returns_closest_node_ids():
+    """Test that each point snaps to its closest graph node."""
+    # Arrange
+    G = make_grid_graph()
+
+    # Act
+    result = find_nearest_nodes(G, [-105.0001, -104.9981], [39.0001, 39.0019])
+
+    # Assert
+    assert result.tolist() == [0, 8]
+
+def test_find_nearest_nodes_reuses_cached_index():
+    """Test that the KD-tree is built once and stored on the graph."""
+    # Arrange
+    G = make_grid_graph()
+
+    # Act
+    find_nearest_nodes(G, [-105.0], [39.0])
+    index = G.graph['_node_index']
+    find_nearest_nodes(G, [-105.0], [39.0])
+
+    # Assert
+    assert G.graph['_node_index'] is index
+
+def test_find_apartment_nearest_nodes_uses_seeded_nodes():
+    """Test that apartments keep the node the seed snapped them to, even when another node is closer."""
+    # Arrange
+    G = make_grid_graph()
+    G.graph['osm_ids'] = [1000 + node for node in range(9)]
+    apartment_index = {
+        "x": np.array([-105.0001, -104.9981]),
+        "y": np.array([39.0001, 39.0019]),
+        "network_nodes": np.array([1001, 1008]),
+    }
+
+    # Act
+    result = find_apartment_nearest_nodes(apartment_index, G)
+
+    # Assert
+    assert result.tolist() == [1, 8]
+    assert '_node_index' not in G.graph
+
+def test_find_apartment_nearest_nodes_snaps_apartments_without_seeded_node():
+    """Test that apartments seeded without a node, or with one missing from the graph, snap to their closest node."""
+    # Arrange
+    G = make_grid_graph()
+    apartment_index = {
+        "x": np.array([-104.9981, -105.0001, -105.0]),
+        "y": np.array([39.0019, 39.0001, 39.0]),
+        "network_nodes": np.array([-1, 4, 999]),
+    }
+
+    # Act
+    result = find_apartment_nearest_nodes(apartment_index, G)
+
+    # Assert
+    assert result.tolist() == [8, 4, 0]
+
+def test_find_apartment_nearest_nodes_empty_index():
+    """Test that a city without apartments gives no nearest nodes and builds no KD-tree."""
+    # Arrange
+    G = make_grid_graph()
+    empty = np.array([])
+
+    # Act
+    result = find_apartment_nearest_nodes({"x": empty, "y": empty, "network_nodes": empty.astype(np.int64)}, G)
+
+    # Assert
+    assert len(result) == 0
+    assert '_node_index' not in G.graph
+
+# =============================================================================
+# Tests for find_walking_route function
+# =============================================================================
+
+# Success Cases
+def test_find_walking_route_matches_dijkstra_distance():
+    """Test that the A* route has the same length as the Dijkstra shortest path."""
+    # Arrange
+    G = make_grid_graph()
+    origin = (-105.0, 39.0)
+    destination = (-104.998, 39.002)
+
+    # Act
+    geometry, distance = find_walking_route(G, origin, destination)
+
+    # Assert
+    assert geometry['type'] == "LineString"
+    assert geometry['coordinates'][0] == list(origin)
+    assert geometry['coordinates'][-1] == list(destination)
+    assert len(geometry['coordinates']) == 2 + 5  # endpoints plus the 5 nodes of the path
+    assert distance == pytest.approx(nx.dijkstra_path_length(G, 0, 8, weight="length"))
+
+def test_find_walking_route_with_landmarks_matches_dijkstra_distance():
+    """Test that the ALT heuristic keeps the route optimal."""
+    # Arrange
+    G = make_grid_graph()
+    nodes = list(G.nodes)
+    landmarks = [0, 2]
+    distances = [
+        [round(nx.dijkstra_path_length(G, landmark, node, weight="length"), 1) for node in nodes]
+        for landmark in landmarks
+    ]
+    attach_landmarks(G, {"nodes": nodes, "landmarks": landmarks, "distances": distances})
+
+    # Act
+    _, distance = find_walking_route(G, (-104.998, 39.0), (-105.0, 39.002))
+
+    # Assert
+    assert '_landmarks' in G.graph
+    assert distance == pytest.approx(nx.dijkstra_path_length(G, 2, 6, weight="length"))
+
+def test_attach_landmarks_skips_missing_table():
+    """Test that graphs without a landmark table fall back to the haversine heuristic."""
+    # Arrange
+    G = make_grid_graph()
+
+    # Act
+    attach_landmarks(G, None)
+
+    # Assert
+    assert '_landmarks' not in G.graph
+
+# Error Cases
+def test_find_walking_route_no_path():
+    """Test that disconnected points raise NetworkXNoPath."""
+    # Arrange
+    G = nx.MultiDiGraph()
+    G.add_node(1, x=-105.0, y=39.0)
+    G.add_node(2, x=-104.0, y=39.0)
+
+    # Act & Assert
+    with pytest.raises(nx.NetworkXNoPath):
+        find_walking_route(G, (-105.0, 39.0), (-104.0, 39.0))
+
@@ -0,0 +1,133 @@
+import json
+import httpx
+import pytest
+from fastapi import HTTPException
+from app.routers import proxy
+from app.routers.proxy import get_osrm_route, normalize_coordinates, clear_route_cache
+
+OSRM_OK_RESPONSE = {
+    "code": "Ok",
+    "routes": [{"geometry": {"type": "LineString", "coordinates": [[1.0, 1.0], [2.0, 2.0]]}, "distance": 10.0, "duration": 2.0}],
+}
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    clear_route_cache()
+    yield
+    clear_route_cache()
+
+@pytest.fixture
+def mock_osrm(mocker):
+    """Route the shared OSRM client to a mock transport and record the requests."""
+    requests = []
+    responses = []
+
+    def handler(request):
+        requests.append(request)
+        return responses.pop(0) if responses else httpx.Response(200, json=OSRM_OK_RESPONSE)
+
+    client = httpx.AsyncClient(base_url="http://osrm.test", transport=httpx.MockTransport(handler))
+    mocker.patch.object(proxy, '_client', client)
+    return requests, responses
+
+# =============================================================================
+# Tests for normalize_coordinates function
+# =============================================================================
+
+def test_normalize_coordinates_rounds_values():
+    """Test that coordinates are rounded to a fixed precision."""
+    # Act
+    result = normalize_coordinates("-104.9903123,39.7392358;-104.98,39.75")
+
+    # Assert
+    assert result == "-104.99031,39.73924;-104.98000,39.75000"
+
+def test_normalize_coordinates_invalid_input():
+    """Test that malformed coordinates are rejected with HTTP 400."""
+    for coordinates in ["abc,def;1,2", "1,2", "1,2,3;4,5"]:
+        with pytest.raises(HTTPException) as exc_info:
+            normalize_coordinates(coordinates)
+        assert exc_info.value.status_code == 400
+
+# =============================================================================
+# Tests for get_osrm_route function
+# =============================================================================
+
+# Success Cases
+@pytest.mark.asyncio
+async def test_get_osrm_route_returns_upstream_response(mock_osrm):
+    """Test that the upstream route is returned and requested with rounded coordinates."""
+    # Arrange
+    requests, _ = mock_osrm
+
+    # Act
+    result = await get_osrm_route(coordinates="1.000001,2.000001;3,4")
+
+    # Assert
+    assert json.loads(result.body) == OSRM_OK_RESPONSE
+    assert len(requests) == 1
+    assert requests[0].url.path == "/route/v1/driving/1.00000,2.00000;3.00000,4.00000"
+    assert requests[0].url.params["geometries"] == "geojson"
+
+@pytest.mark.asyncio
+async def test_get_osrm_route_serves_nearby_requests_from_cache(mock_osrm):
+    """Test that requests rounding to the same coordinates hit the cache."""
+    # Arrange
+    requests, _ = mock_osrm
+
+    # Act
+    await get_osrm_route(coordinates="1.000001,2.000001;3,4")
+    result = await get_osrm_route(coordinates="1.000002,2.000002;3,4")
+
+    # Assert
+    assert json.loads(result.body) == OSRM_OK_RESPONSE
+    assert len(requests) == 1
+
+# Edge Cases
+@pytest.mark.asyncio
+async def test_get_osrm_route_does_not_cache_errors(mock_osrm):
+    """Test that unsuccessful upstream responses are passed through and not cached."""
+    # Arrange
+    requests, responses = mock_osrm
+    responses.append(httpx.Response(400, json={"code": "InvalidQuery"}))
+
+    # Act
+    first = await get_osrm_route(coordinates="1,2;3,4")
+    second = await get_osrm_route(coordinates="1,2;3,4")
+
+    # Assert
+    assert first.status_code == 400
+    assert second.status_code == 200
+    assert len(requests) == 2
+
+# Error Cases
+@pytest.mark.asyncio
+async def test_get_osrm_route_non_object_response(mock_osrm):
+    """Test that a JSON array or scalar from upstream is reported as HTTP 502 and not cached."""
+    # Arrange
+    requests, responses = mock_osrm
+    responses.extend([httpx.Response(200, json=["Ok"]), httpx.Response(200, json="Ok")])
+
+    # Act & Assert
+    for _ in range(2):
+        with pytest.raises(HTTPException) as exc_info:
+            await get_osrm_route(coordinates="1,2;3,4")
+        assert exc_info.value.status_code == 502
+        assert "OSRM request failed" in exc_info.value.detail
+    assert len(requests) == 2
+
+@pytest.mark.asyncio
+async def test_get_osrm_route_timeout(mocker):
+    """Test that upstream timeouts are reported as HTTP 504."""
+    # Arrange
+    def handler(request):
+        raise httpx.ReadTimeout("timed out", request=request)
+
+    client = httpx.AsyncClient(base_url="http://osrm.test", transport=httpx.MockTransport(handler))
+    mocker.patch.object(proxy, '_client', client)
+
+    # Act & Assert
+    with pytest.raises(HTTPException) as exc_info:
+        await get_osrm_route(coordinates="1,2;3,4")
+
+    assert exc_info.value.status_code == 504
@@ -0,0 +1,228 @@
+import json
+import sys
+from unittest.mock import MagicMock
+import networkx as nx
+import numpy as np
+import pytest
+from fastapi import HTTPException
+
+# Create a custom DatabaseError that inherits from BaseException
+class MockDatabaseError(Exception):
+    pass
+# Mock psycopg2 so importing the router does not open a connection pool
+mock_psycopg2 = MagicMock()
+mock_pool = MagicMock()
+mock_pool.SimpleConnectionPool.return_value = MagicMock()
+mock_psycopg2.pool = mock_pool
+mock_psycopg2.DatabaseError = MockDatabaseError
+sys.modules['psycopg2'] = mock_psycopg2
+sys.modules['psycopg2.pool'] = mock_pool
+
+from app import cache
+from app.cache import clear_city_graphs, get_city_apartment_index, get_city_graph, refresh_city_versions, reset_city_versions
+from app.routers.route import get_walking_route
+
+# =============================================================================
+# Tests for get_city_graph function
+# =============================================================================
+
+def test_get_city_graph_deserializes_once_per_city(mocker):
+    """Test that a city's graph is fetched and deserialized only on first use."""
+    # Arrange
+    clear_city_graphs()
+    fetch_mock = mocker.patch('app.cache.fetch_network_graph', return_value={"directed": True, "multigraph": True, "graph": {}, "nodes": [{"id": 1}], "links": []})
+    mock_cur = mocker.MagicMock()
+
+    # Act
+    first = get_city_graph(mock_cur, 1)
+    second = get_city_graph(mock_cur, 1)
+    clear_city_graphs(1)
+    third = get_city_graph(mock_cur, 1)
+
+    # Assert
+    assert first is second
+    assert third is not first
+    assert fetch_mock.call_count == 2
+    clear_city_graphs()
+
+def test_get_city_graph_does_not_cache_graph_read_before_invalidation(mocker):
+    """Test that a graph fetched while the city is invalidated is returned but not cached."""
+    # Arrange
+    clear_city_graphs()
+    graph_data = {"directed": True, "multigraph": True, "graph": {}, "nodes": [{"id": 1}], "links": []}
+    # Another request drops the city's cached data while this one is still fetching
+    fetch_mock = mocker.patch('app.cache.fetch_network_graph', side_effect=lambda cur, city_id: clear_city_graphs(city_id) or graph_data)
+    mock_cur = mocker.MagicMock()
+
+    # Act
+    first = get_city_graph(mock_cur, 1)
+    second = get_city_graph(mock_cur, 1)
+
+    # Assert
+    assert first is not second
+    assert fetch_mock.call_count == 2
+    clear_city_graphs()
+
+def test_get_city_apartment_index_builds_index_once_per_graph(mocker):
+    """Test that a city's apartment index is fetched, built and snapped to the graph only on first use."""
+    # Arrange
+    fetch_mock = mocker.patch('app.cache.fetch_apartment_features', return_value=[
+        (1, -104.99, 39.75, '{"type":"Polygon","coordinates":[]}', '{"type":"Point","coordinates":[-104.99,39.75]}', '{"id": 1}', None),
+    ])
+    nearest_nodes_mock = mocker.patch('app.cache.find_apartment_nearest_nodes', return_value=np.array([7]))
+    mock_cur = mocker.MagicMock()
+    G, other_G = nx.MultiDiGraph(), nx.MultiDiGraph()
+
+    # Act
+    first = get_city_apartment_index(mock_cur, 1, G)
+    second = get_city_apartment_index(mock_cur, 1, G)
+    other = get_city_apartment_index(mock_cur, 2, other_G)
+
+    # Assert
+    assert first is second
+    assert other is not first
+    assert G.graph['_apartment_index'] is first
+    assert first["ids"].tolist() == [1]
+    assert first["nearest_nodes"].tolist() == [7]
+    assert fetch_mock.call_count == 2
+    assert nearest_nodes_mock.call_count == 2
+
+def test_get_city_apartment_index_reseed_between_graph_and_index(mocker):
+    """Test that an index built on a graph dropped by a reseed is never paired with the reloaded graph."""
+    # Arrange
+    clear_city_graphs()
+    old_graph = {"directed": False, "multigraph": False, "graph": {"osm_ids": [100]}, "nodes": [{"id": 0, "x": -104.99, "y": 39.75}], "links": []}
+    new_graph = {"directed": False, "multigraph": False, "graph": {"osm_ids": [200, 100]}, "nodes": [{"id": 0, "x": -104.98, "y": 39.75}, {"id": 1, "x": -104.99, "y": 39.75}], "links": []}
+    mocker.patch('app.cache.fetch_network_graph', side_effect=[old_graph, new_graph])
+    mocker.patch('app.cache.fetch_network_landmarks', return_value=None)
+    mocker.patch('app.cache.fetch_apartment_features', return_value=[
+        (1, -104.99, 39.75, '{"type":"Polygon","coordinates":[]}', '{"type":"Point","coordinates":[-104.99,39.75]}', '{"id": 1}', 100),
+    ])
+    mock_cur = mocker.MagicMock()
+
+    # Act
+    G = get_city_graph(mock_cur, 1)
+    clear_city_graphs(1)  # A reseed lands between the graph and the index lookups
+    stale = get_city_apartment_index(mock_cur, 1, G)
+    new_G = get_city_graph(mock_cur, 1)
+    current = get_city_apartment_index(mock_cur, 1, new_G)
+
+    # Assert
+    assert new_G is not G
+    assert current is not stale
+    assert stale["nearest_nodes"].tolist() == [0]
+    assert current["nearest_nodes"].tolist() == [1]
+    clear_city_graphs()
+
+# =============================================================================
+# Tests for refresh_city_versions function
+# =============================================================================
+
+def test_refresh_city_versions_drops_only_changed_cities(mocker):
+    """Test that a new manifest version reloads the changed city's graph and runs the invalidation callbacks."""
+    # Arrange
+    reset_city_versions()
+    clear_city_graphs()
+    mocker.patch.object(cache, 'MANIFEST_CHECK_SECONDS', 0)
+    mocker.patch('app.cache.fetch_seed_versions', side_effect=[{1: "aaa", 2: "bbb"}, {1: "aaa", 2: "ccc"}])
+    # Each fetch parses fresh JSON, so graphs never share their attribute dict
+    mocker.patch('app.cache.fetch_network_graph', side_effect=lambda cur, city_id: {"directed": True, "multigraph": True, "graph": {}, "nodes": [{"id": 1}], "links": []})
+    mocker.patch('app.cache.fetch_apartment_features', return_value=[])
+    callback = mocker.MagicMock()
+    mocker.patch.object(cache, '_invalidation_callbacks', [callback])
+    mock_cur = mocker.MagicMock()
+    refresh_city_versions(mock_cur)
+    graphs = {city_id: get_city_graph(mock_cur, city_id) for city_id in (1, 2)}
+    apartments = {city_id: get_city_apartment_index(mock_cur, city_id, graphs[city_id]) for city_id in (1, 2)}
+
+    # Act
+    refresh_city_versions(mock_cur)
+
+    # Assert
+    assert get_city_graph(mock_cur, 1) is graphs[1]
+    assert get_city_graph(mock_cur, 2) is not graphs[2]
+    assert get_city_apartment_index(mock_cur, 1, graphs[1]) is apartments[1]
+    assert get_city_apartment_index(mock_cur, 2, get_city_graph(mock_cur, 2)) is not apartments[2]
+    assert cache.data_version_headers(2) == {"X-Data-Version": "ccc"}
+    assert callback.call_args_list[-1].args == ({2},)
+    reset_city_versions()
+    clear_city_graphs()
+
+def test_refresh_city_versions_checks_once_per_interval(mocker):
+    """Test that the manifest is not re-read within the check interval."""
+    # Arrange
+    reset_city_versions()
+    mocker.patch.object(cache, 'MANIFEST_CHECK_SECONDS', 3600)
+    fetch_mock = mocker.patch('app.cache.fetch_seed_versions', return_value={1: "aaa"})
+
+    # Act
+    refresh_city_versions(mocker.MagicMock())
+    refresh_city_versions(mocker.MagicMock())
+
+    # Assert
+    fetch_mock.assert_called_once()
+    reset_city_versions()
+
+def test_refresh_city_versions_keeps_cache_without_manifest(mocker):
+    """Test that a database without a manifest keeps serving cached data."""
+    # Arrange
+    reset_city_versions()
+    mocker.patch('app.cache.fetch_seed_versions', side_effect=HTTPException(status_code=500, detail="Failed to fetch seed versions"))
+    clear_mock = mocker.patch('app.cache.clear_city_graphs')
+    mock_cur = mocker.MagicMock()
+
+    # Act
+    refresh_city_versions(mock_cur)
+
+    # Assert
+    mock_cur.connection.rollback.assert_called_once()
+    clear_mock.assert_not_called()
+    assert cache.data_version_headers(1) == {}
+    reset_city_versions()
+
+# =============================================================================
+# Tests for get_walking_route function
+# =============================================================================
+
+# Success Cases
+def test_get_walking_route_returns_osrm_compatible_route(mocker):
+    """Test that the route is returned with geometry, distance and walking duration."""
+    # Arrange
+    mock_conn = mocker.MagicMock()
+    mocker.patch('app.routers.route.refresh_city_versions')
+    mocker.patch('app.routers.route.get_city_graph', return_value=mocker.MagicMock())
+    mocker.patch('app.routers.route.data_version_headers', return_value={"X-Data-Version": "a1b2c3d4e5f6"})
+    geometry = {"type": "LineString", "coordinates": [[1.0, 2.0], [3.0, 4.0]]}
+    find_route_mock = mocker.patch('app.routers.route.find_walking_route', return_value=(geometry, 140.0))
+
+    # Act
+    result = get_walking_route(city_id=1, coordinates="1,2;3,4", conn=mock_conn)
+
+    # Assert
+    content = json.loads(result.body)
+    assert content["code"] == "Ok"
+    assert content["routes"][0]["geometry"] == geometry
+    assert content["routes"][0]["distance"] == 140.0
+    assert content["routes"][0]["duration"] == pytest.approx(100.0)
+    find_route_mock.assert_called_once_with(mocker.ANY, (1.0, 2.0), (3.0, 4.0))
+    assert result.headers["X-Data-Version"] == "a1b2c3d4e5f6"
+
+# Error Cases
+def test_get_walking_route_invalid_coordinates(mocker):
+    """Test that malformed coordinates are rejected with HTTP 400."""
+    for coordinates in ["1,2", "a,b;c,d", "1,2;3,4;5,6"]:
+        with pytest.raises(HTTPException) as exc_info:
+            get_walking_route(city_id=1, coordinates=coordinates, conn=mocker.MagicMock())
+        assert exc_info.value.status_code == 400
+
+def test_get_walking_route_no_path(mocker):
+    """Test that unreachable destinations are reported as HTTP 404."""
+    # Arrange
+    mocker.patch('app.routers.route.get_city_graph', return_value=mocker.MagicMock())
+    mocker.patch('app.routers.route.find_walking_route', side_effect=nx.NetworkXNoPath("no path"))
+
+    # Act & Assert
+    with pytest.raises(HTTPException) as exc_info:
+        get_walking_route(city_id=1, coordinates="1,2;3,4", conn=mocker.MagicMock())
+
+    assert exc_info.value.status_code == 404
@@ -1,28 +1,32 @@
-import json
-import geopandas as gpd
-from shapely.geometry import shape
+import numpy as np
 
-def create_gdf_with_centroid(geom_centroid_rows):
-    """Create a GeoDataFrame with geometries and centroids from parsed data from DB."""
-    # Parse rows with list comprehensions for better performance
-    parsed_data = [
-        (
-            shape(json.loads(row[0])),
-            shape(json.loads(row[1])),
-            row[2]
-        )
-        for row in geom_centroid_rows
-        if row[0] and row[1]  # Skip rows with None or empty strings
-    ]
-    
-    # Separate parsed data into respective columns
-    geometries, centroids, properties_list = zip(*parsed_data)
+def render_feature(geometry, properties):
+    """Render a GeoJSON Feature from stored GeoJSON geometry and properties text."""
+    return f'{{"type":"Feature","geometry":{geometry},"properties":{properties or "null"}}}'
 
-    gdf = gpd.GeoDataFrame(
-        list(properties_list),
-        geometry=list(geometries),
-        crs="EPSG:4326"
-    )
-    gdf['centroid'] = list(centroids)
+def render_feature_collection(features):
+    """Render a GeoJSON FeatureCollection from rendered features."""
+    return '{"type":"FeatureCollection","features":[' + ",".join(features) + ']}'
+
+def create_apartment_index(apartment_rows):
+    """Create an apartment index of NumPy id, centroid and seeded network node columns with pre-rendered polygon and centroid features."""
+    rows = [row for row in apartment_rows if row[1] is not None and row[2] is not None and row[3] and row[4]]  # Skip rows without geometry
 
-    return gdf
+    return {
+        "ids": np.array([row[0] for row in rows], dtype=np.int64),
+        "x": np.array([row[1] for row in rows], dtype=float),
+        "y": np.array([row[2] for row in rows], dtype=float),
+        # OSM id of the node the seed snapped each apartment to, -1 when the seed did not store it
+        "network_nodes": np.array([-1 if row[6] is None else row[6] for row in rows], dtype=np.int64),
+        "polygon_features": [render_feature(row[3], row[5]) for row in rows],
+        "centroid_features": [render_feature(row[4], row[5]) for row in rows],
+    }
+
+def render_suitable_apartments(apartment_index, positions):
+    """Render the polygon and centroid FeatureCollections of the apartments at the given index positions."""
+    polygon_features = apartment_index["polygon_features"]
+    centroid_features = apartment_index["centroid_features"]
+    return (
+        render_feature_collection(polygon_features[position] for position in positions),
+        render_feature_collection(centroid_features[position] for position in positions),
+    )
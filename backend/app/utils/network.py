@@ -1,11 +1,59 @@
+import os
+import math
 import numpy as np
-import osmnx as ox
 import networkx as nx
+from concurrent.futures import ThreadPoolExecutor
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from scipy.spatial import cKDTree
 
-def deserialize_graph(graph_json) -> nx.MultiGraph:
-    """Deserialize a graph JSON into a network graph."""
+EARTH_RADIUS_METERS = 6371008.8
+LANDMARK_TOLERANCE = 0.1  # Landmark distances are stored rounded to 0.1 m
+SEARCH_WORKERS = int(os.getenv('SEARCH_WORKERS', '4'))
+
+# Shared pool for per-amenity searches; csgraph releases the GIL so they run in parallel
+_search_executor = ThreadPoolExecutor(max_workers=SEARCH_WORKERS)
+
+def deserialize_graph(graph_json) -> nx.Graph:
+    """Deserialize a graph JSON into a network graph (an undirected simple graph for seeded walk graphs)."""
     return nx.node_link_graph(graph_json)
 
+def get_node_positions(G):
+    """Return the node IDs by position and a node-to-position lookup for array-backed structures."""
+    if 'osm_ids' in G.graph:
+        # Seeded graphs use contiguous int32 node indices, so a node is its own position
+        node_ids = np.arange(G.number_of_nodes(), dtype=np.int32)
+        return node_ids, node_ids
+    node_ids = np.array(list(G.nodes))
+    return node_ids, {node: position for position, node in enumerate(node_ids.tolist())}
+
+def get_adjacency_matrix(G):
+    """Return the graph as a CSR matrix of edge lengths, building it on first use."""
+    if '_adjacency' not in G.graph:
+        node_ids, positions = get_node_positions(G)
+        # Keep the shortest of any parallel edges, in both directions for undirected graphs
+        lengths = {}
+        for u, v, length in G.edges(data="length", default=0.0):
+            pairs = [(positions[u], positions[v])] if G.is_directed() else [(positions[u], positions[v]), (positions[v], positions[u])]
+            for pair in pairs:
+                lengths[pair] = min(length, lengths.get(pair, np.inf))
+        rows, cols = zip(*lengths) if lengths else ((), ())
+        matrix = csr_matrix((np.fromiter(lengths.values(), dtype=float, count=len(lengths)), (rows, cols)), shape=(len(node_ids), len(node_ids)))
+        G.graph['_adjacency'] = (matrix, node_ids, positions)
+    return G.graph['_adjacency']
+
+def find_nodes_within_distance(G, sources, max_distance):
+    """Return a dict mapping every node within max_distance of any source to its shortest path distance."""
+    matrix, node_ids, positions = get_adjacency_matrix(G)
+    distances = dijkstra(matrix, indices=[positions[node] for node in sources], min_only=True, limit=float(max_distance))
+    reached = np.flatnonzero(np.isfinite(distances))
+    return dict(zip(node_ids[reached].tolist(), distances[reached].tolist()))
+
+def search_amenities(G, searches):
+    """Run one distance search per (sources, max_distance) pair concurrently on the shared pool."""
+    futures = [_search_executor.submit(find_nodes_within_distance, G, sources, max_distance) for sources, max_distance in searches]
+    return [future.result() for future in futures]
+
 def find_suitable_apartment_network_nodes(G, apartment_nnodes, **amenity_kwargs):
     """Find suitable apartment network nodes based on distance constraints to amenities."""
     if not amenity_kwargs: 
@@ -13,11 +61,11 @@ def find_suitable_apartment_network_nodes(G, apartment_nnodes, **amenity_kwargs)
 
     try:
         # Calculate nodes within max distance of each amenity type, returning dicts mapping node IDs to shortest path distances
-        matched_nodes = [
-            nx.multi_source_dijkstra_path_length(G, nodes, cutoff=max_distance, weight="length")
+        matched_nodes = search_amenities(G, [
+            (nodes, max_distance)
             for nodes, max_distance in amenity_kwargs.values()
             if nodes and max_distance
-        ]
+        ])
 
         # Keep only apartment nodes that are within range of every amenity type by checking presence in all distance dicts
         suitable_apartment_nnodes = [
@@ -30,15 +78,123 @@ def find_suitable_apartment_network_nodes(G, apartment_nnodes, **amenity_kwargs)
     except Exception as e:
         raise ValueError(f"Error finding suitable apartment network nodes: {e}") from e
 
-def retrieve_suitable_apartments(apartment_gdf, G, suitable_apartment_nnodes):
-    """Retrieve suitable apartments based on proximity to specified network nodes."""
+def find_suitable_apartment_network_nodes_for_scenarios(G, apartment_nnodes, nodes_dict, scenario_max_distances):
+    """Find suitable apartment network nodes for several scenarios sharing one search per amenity."""
     try:
-        centroids = np.array([(c.x, c.y) for c in apartment_gdf['centroid']])
-        # Get an array of closest network nodes, one for each apartment's centroid coordinates
-        nearest_nodes = ox.distance.nearest_nodes(G, X=centroids[:, 0], Y=centroids[:, 1])
-        # Filter apartments whose nearest node is in the suitable nodes
-        suitable_apartments = apartment_gdf[np.isin(nearest_nodes, suitable_apartment_nnodes)].copy()
+        # Search each amenity once, at the largest distance any scenario asks for
+        cutoffs = {}
+        for max_distances in scenario_max_distances:
+            for amenity, max_distance in max_distances.items():
+                if nodes_dict.get(amenity) and max_distance:
+                    cutoffs[amenity] = max(cutoffs.get(amenity, 0), max_distance)
+
+        distances = dict(zip(
+            cutoffs,
+            search_amenities(G, [(nodes_dict[amenity], cutoff) for amenity, cutoff in cutoffs.items()])
+        ))
+
+        # Filter every scenario against the shared distance results
+        suitable_apartment_nnodes_list = []
+        for max_distances in scenario_max_distances:
+            constraints = [
+                (distances[amenity], max_distance)
+                for amenity, max_distance in max_distances.items()
+                if amenity in distances and max_distance
+            ]
+            suitable_apartment_nnodes_list.append([
+                node for node in apartment_nnodes
+                if all(dists.get(node, np.inf) <= max_distance for dists, max_distance in constraints)
+            ])
+
+        return suitable_apartment_nnodes_list
+
+    except Exception as e:
+        raise ValueError(f"Error finding suitable apartment network nodes: {e}") from e
+
+def find_apartment_nearest_nodes(apartment_index, G):
+    """Find each apartment's network node, using the seed's snap and snapping only apartments seeded without one."""
+    # Seeded graphs store the OSM id of each node by index; other graphs are keyed by OSM id
+    osm_ids = G.graph.get('osm_ids')
+    nodes = dict(zip(osm_ids, range(len(osm_ids)))) if osm_ids is not None else {node: node for node in G.nodes}
+    nearest_nodes = np.array([nodes.get(node, -1) for node in apartment_index["network_nodes"].tolist()], dtype=np.int64)
 
-        return suitable_apartments
+    missing = nearest_nodes < 0
+    if missing.any():
+        nearest_nodes[missing] = find_nearest_nodes(G, apartment_index["x"][missing], apartment_index["y"][missing])
+    return nearest_nodes
+
+def retrieve_suitable_apartments(apartment_index, suitable_apartment_nnodes):
+    """Return the index positions of apartments whose nearest node is one of the suitable nodes."""
+    try:
+        return np.flatnonzero(np.isin(apartment_index["nearest_nodes"], np.asarray(suitable_apartment_nnodes, dtype=np.int64)))
     except Exception as e:
         raise ValueError(f"Error retrieving suitable apartments: {e}")
+
+def haversine_distance(lon1, lat1, lon2, lat2):
+    """Great-circle distance in meters between two (lon, lat) points."""
+    lon1, lat1, lon2, lat2 = map(math.radians, (lon1, lat1, lon2, lat2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * math.asin(math.sqrt(a))
+
+def get_node_index(G):
+    """Return the KD-tree over the graph's node coordinates, building it on first use."""
+    if '_node_index' not in G.graph:
+        node_ids, _ = get_node_positions(G)
+        lons = np.array([G.nodes[node]['x'] for node in node_ids.tolist()], dtype=float)
+        lats = np.array([G.nodes[node]['y'] for node in node_ids.tolist()], dtype=float)
+        # Scale longitudes so Euclidean distances approximate ground distances at the city's latitude
+        lon_scale = np.cos(np.radians(lats.mean())) if len(lats) else 1.0
+        tree = cKDTree(np.column_stack((lons * lon_scale, lats)))
+        G.graph['_node_index'] = (tree, node_ids, lon_scale)
+    return G.graph['_node_index']
+
+def find_nearest_nodes(G, X, Y):
+    """Find the closest graph node for each (X, Y) coordinate using the cached KD-tree."""
+    tree, node_ids, lon_scale = get_node_index(G)
+    _, positions = tree.query(np.column_stack((np.asarray(X, dtype=float) * lon_scale, np.asarray(Y, dtype=float))))
+    return node_ids[positions]
+
+def attach_landmarks(G, landmarks):
+    """Attach a precomputed ALT landmark distance table to the graph, keyed by node position."""
+    if not landmarks or not landmarks.get("landmarks"):
+        return G
+    positions = {node: position for position, node in enumerate(landmarks["nodes"])}
+    # Unreachable nodes are stored as null and become NaN so they never tighten the bound
+    distances = np.array(landmarks["distances"], dtype=float).reshape(len(landmarks["landmarks"]), len(positions))
+    G.graph['_landmarks'] = (positions, distances)
+    return G
+
+def landmark_lower_bound(G, target):
+    """Return a lower-bound function to the target using the triangle inequality over the graph's landmarks."""
+    positions, distances = G.graph['_landmarks']
+    target_distances = distances[:, positions[target]] if target in positions else None
+
+    def lower_bound(u):
+        if target_distances is None or u not in positions:
+            return 0.0
+        bounds = np.abs(target_distances - distances[:, positions[u]])
+        bounds = bounds[~np.isnan(bounds)]
+        # Give back the rounding error so the bound stays admissible
+        return max(float(bounds.max()) - LANDMARK_TOLERANCE, 0.0) if len(bounds) else 0.0
+
+    return lower_bound
+
+def find_walking_route(G, origin, destination):
+    """Find the shortest walking route between two (lon, lat) points with A* and a haversine or ALT heuristic."""
+    source, target = find_nearest_nodes(G, [origin[0], destination[0]], [origin[1], destination[1]])
+    lower_bound = landmark_lower_bound(G, target) if '_landmarks' in G.graph else None
+
+    def heuristic(u, v):
+        estimate = haversine_distance(G.nodes[u]['x'], G.nodes[u]['y'], G.nodes[v]['x'], G.nodes[v]['y'])
+        # Both bounds are admissible, so the larger one prunes the most without losing optimality
+        return max(estimate, lower_bound(u)) if lower_bound else estimate
+
+    path = nx.astar_path(G, source, target, heuristic=heuristic, weight="length")
+
+    # Include the walk from the requested points to their nearest network nodes
+    coordinates = [list(origin)] + [[G.nodes[node]['x'], G.nodes[node]['y']] for node in path] + [list(destination)]
+    distance = nx.path_weight(G, path, weight="length")
+    distance += haversine_distance(*origin, G.nodes[source]['x'], G.nodes[source]['y'])
+    distance += haversine_distance(*destination, G.nodes[target]['x'], G.nodes[target]['y'])
+
+    return {"type": "LineString", "coordinates": coordinates}, float(distance)
@@ -0,0 +1,84 @@
+"""Compare GeoJSON/JSON seed outputs with GeoParquet/NumPy outputs (requires pyarrow).
+
+Measures file size, read time and the time to encode the binary COPY rows the loader streams.
+
+Usage (from the repository root):
+    python seed/benchmarks/bench_formats.py --features 100000
+"""
+import os
+import sys
+import time
+import json
+import random
+import argparse
+import tempfile
+import numpy as np
+import geopandas as gpd
+from shapely.geometry import Polygon
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.loader import iter_amenity_rows, iter_network_nodes_rows
+
+def parse_args():
+    """Parse command line options for the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark seed output formats.")
+    parser.add_argument("--features", type=int, default=100000, help="Number of synthetic amenity polygons.")
+    parser.add_argument("--nodes", type=int, default=100000, help="Number of network node indices.")
+    return parser.parse_args()
+
+def make_gdf(count, seed=0):
+    """Build building-like polygons with a mix of OSM tags."""
+    rng = random.Random(seed)
+    geometry = []
+    properties = []
+    for element_id in range(count):
+        x, y = rng.uniform(-105, -104.8), rng.uniform(39.6, 39.8)
+        geometry.append(Polygon([(x + 1e-4 * dx, y + 1e-4 * dy) for dx, dy in [(0, 0), (1, 0), (1, 1), (0.5, 1.5), (0, 1)]]))
+        properties.append({"building": "apartments", "name": f"Building {element_id}" if rng.random() < 0.3 else None, "id": element_id})
+    return gpd.GeoDataFrame(properties, geometry=geometry, crs="EPSG:4326")
+
+def timed(function):
+    """Return the result of a call and the seconds it took."""
+    start_time = time.time()
+    result = function()
+    return result, time.time() - start_time
+
+def report(label, geojson_value, parquet_value, unit):
+    print(f"{label:<24} {geojson_value:>12.2f} {parquet_value:>12.2f} {unit}")
+
+if __name__ == "__main__":
+    args = parse_args()
+    gdf = make_gdf(args.features)
+    nodes = sorted(random.Random(1).sample(range(args.nodes * 10), args.nodes))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        geojson_path = os.path.join(tmp_dir, "amenities.geojson")
+        parquet_path = os.path.join(tmp_dir, "amenities.parquet")
+        json_path = os.path.join(tmp_dir, "nodes.json")
+        npy_path = os.path.join(tmp_dir, "nodes.npy")
+
+        _, geojson_write = timed(lambda: gdf.to_file(geojson_path, driver="GeoJSON"))
+        _, parquet_write = timed(lambda: gdf.to_parquet(parquet_path, index=False))
+        _, geojson_read = timed(lambda: gpd.read_file(geojson_path))
+        _, parquet_read = timed(lambda: gpd.read_parquet(parquet_path))
+        _, geojson_load = timed(lambda: sum(len(row) for row in iter_amenity_rows(1, "apartment", geojson_path)))
+        _, parquet_load = timed(lambda: sum(len(row) for row in iter_amenity_rows(1, "apartment", parquet_path)))
+
+        with open(json_path, "w") as f:
+            json.dump(nodes, f, separators=(",", ":"))
+        np.save(npy_path, np.asarray(nodes, dtype=np.int32))
+        _, json_read = timed(lambda: json.load(open(json_path)))
+        _, npy_read = timed(lambda: np.load(npy_path))
+        _, json_load = timed(lambda: list(iter_network_nodes_rows(1, {"apartment": json_path})))
+        _, npy_load = timed(lambda: list(iter_network_nodes_rows(1, {"apartment": npy_path})))
+
+        print(f"{args.features} amenity polygons, {args.nodes} network nodes")
+        print(f"{'':<24} {'GeoJSON/JSON':>12} {'Parquet/npy':>12}")
+        report("amenities size", os.path.getsize(geojson_path) / 1e6, os.path.getsize(parquet_path) / 1e6, "MB")
+        report("amenities write", geojson_write, parquet_write, "s")
+        report("amenities read", geojson_read, parquet_read, "s")
+        report("amenities COPY encode", geojson_load, parquet_load, "s")
+        report("nodes size", os.path.getsize(json_path) / 1e6, os.path.getsize(npy_path) / 1e6, "MB")
+        report("nodes read", json_read * 1e3, npy_read * 1e3, "ms")
+        report("nodes COPY encode", json_load * 1e3, npy_load * 1e3, "ms")
@@ -0,0 +1,72 @@
+"""Compare per-element geometry construction with the bulk shapely 2 builder used by create_gdf.
+
+Usage (from the repository root):
+    python seed/benchmarks/bench_geometry.py --elements 200000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import geopandas as gpd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.data_fetcher import create_gdf
+from utils.geometry import create_geometry, filter_properties
+
+def parse_args():
+    """Parse command line options for the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark GeoDataFrame creation from OSM elements.")
+    parser.add_argument("--elements", type=int, default=200000, help="Number of synthetic OSM elements.")
+    return parser.parse_args()
+
+def make_elements(count, seed=0):
+    """Build tagged nodes, open ways and closed ways shaped like an `out geom` Overpass response."""
+    rng = random.Random(seed)
+    tags = [{"amenity": "cafe", "name": "Cafe"}, {"building": "apartments"}, {"leisure": "park"}, {"shop": "supermarket"}]
+    elements = []
+    for element_id in range(count):
+        kind = rng.choice(["node", "way", "way", "way"])
+        if kind == "node":
+            elements.append({"type": "node", "id": element_id, "lon": rng.uniform(-105, -104), "lat": rng.uniform(39, 40), "tags": rng.choice(tags)})
+            continue
+        coords = [{"lon": rng.uniform(-105, -104), "lat": rng.uniform(39, 40)} for _ in range(rng.randint(4, 20))]
+        if rng.random() < 0.8:
+            coords.append(dict(coords[0]))
+        elements.append({"type": "way", "id": element_id, "geometry": coords, "tags": rng.choice(tags)})
+    return elements
+
+def create_gdf_per_element(elements):
+    """Reference implementation building one geometry per element in a Python loop."""
+    geometry = []
+    properties = []
+    for element in elements:
+        geom = create_geometry(element)
+        filtered_props = filter_properties(element)
+        if geom and filtered_props:
+            geometry.append(geom)
+            filtered_props["id"] = element["id"]
+            properties.append(filtered_props)
+    return gpd.GeoDataFrame(properties, geometry=geometry, crs="EPSG:4326")
+
+if __name__ == "__main__":
+    args = parse_args()
+    elements = make_elements(args.elements)
+
+    start_time = time.time()
+    expected = create_gdf_per_element(elements)
+    loop_time = time.time() - start_time
+
+    start_time = time.time()
+    result = create_gdf(iter(elements))
+    bulk_time = time.time() - start_time
+
+    identical = (
+        result["id"].tolist() == expected["id"].tolist()
+        and all(a.equals_exact(b, 0) and a.geom_type == b.geom_type for a, b in zip(result.geometry, expected.geometry))
+    )
+    print(f"{args.elements} elements, {len(result)} features")
+    print(f"Per-element create_geometry: {loop_time:.2f} seconds")
+    print(f"Bulk create_geometries: {bulk_time:.2f} seconds")
+    print(f"Identical output: {identical}")
@@ -0,0 +1,72 @@
+"""Compare per-point osmnx snapping with bulk KD-tree snapping.
+
+Usage (from the repository root):
+    python seed/benchmarks/bench_snapping.py --city Denver --points 5000
+    python seed/benchmarks/bench_snapping.py --synthetic 200 --points 5000
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import osmnx as ox
+import networkx as nx
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.data_processor import load_data
+from utils.geometry import get_geometry_by_objectid
+from utils.network import build_node_index, create_network_graph, snap_to_nearest_nodes
+from shapely.geometry import shape
+
+data_dir = "seed/cdphe_open_data"
+
+def parse_args():
+    """Parse command line options for the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark nearest-node snapping.")
+    parser.add_argument("--city", default="Denver", help="City from target_citylist.csv to download (or read from the cache).")
+    parser.add_argument("--synthetic", type=int, default=0, help="Use an N x N grid graph instead of a city graph.")
+    parser.add_argument("--points", type=int, default=5000, help="Number of random points to snap.")
+    parser.add_argument("--loop-points", type=int, default=200, help="Points snapped one call at a time (extrapolated to --points).")
+    return parser.parse_args()
+
+def load_city_graph(city):
+    """Load the walk graph of a city through the seed download cache."""
+    csv_data, geojson_data = load_data(f"{data_dir}/target_citylist.csv", f"{data_dir}/Colorado_City_Boundaries.geojson")
+    row = csv_data[csv_data['NAME'].str.lower() == city.lower()].iloc[0]
+    return create_network_graph(shape(get_geometry_by_objectid(geojson_data, row['OBJECTID'])))
+
+def make_grid_graph(size):
+    """Build a size x size grid graph around Denver."""
+    G = nx.MultiDiGraph(crs="EPSG:4326")
+    for i in range(size):
+        for j in range(size):
+            G.add_node(i * size + j, x=-105.0 + j * 0.0005, y=39.6 + i * 0.0005)
+    return G
+
+if __name__ == "__main__":
+    args = parse_args()
+    os.environ.setdefault("SEED_CACHE_DIR", "seed/data/cache")
+    G = make_grid_graph(args.synthetic) if args.synthetic else load_city_graph(args.city)
+
+    xs = np.array([data['x'] for _, data in G.nodes(data=True)])
+    ys = np.array([data['y'] for _, data in G.nodes(data=True)])
+    rng = np.random.default_rng(0)
+    X = rng.uniform(xs.min(), xs.max(), args.points)
+    Y = rng.uniform(ys.min(), ys.max(), args.points)
+    loop_points = min(args.loop_points, args.points)
+
+    start_time = time.time()
+    loop_nodes = [ox.distance.nearest_nodes(G, x, y) for x, y in zip(X[:loop_points], Y[:loop_points])]
+    loop_time = (time.time() - start_time) * args.points / loop_points
+
+    start_time = time.time()
+    node_index = build_node_index(G)
+    bulk_nodes = snap_to_nearest_nodes(node_index, np.column_stack((X, Y)))
+    bulk_time = time.time() - start_time
+
+    matches = sum(int(a) == b for a, b in zip(loop_nodes, bulk_nodes))
+    print(f"Graph: {G.number_of_nodes()} nodes, {args.points} points")
+    print(f"Per-point osmnx nearest_nodes: {loop_time:.2f} seconds (extrapolated from {loop_points} points)")
+    print(f"Bulk KD-tree snapping: {bulk_time:.3f} seconds (index build included)")
+    print(f"Same node for {matches}/{loop_points} compared points")
@@ -1,16 +1,69 @@
 import os
+import argparse
 import warnings
-from utils.data_processor import load_data, process_data
+from utils.cache import CACHE_DIR_ENV, OFFLINE_ENV
+from utils.file import OUTPUT_FORMAT_ENV, OUTPUT_FORMATS
+from utils.data_processor import BOUNDARY_SPACING_ENV, MAX_WALK_METERS, TILE_MAX_AREA_KM2, load_data, process_data
 
 data_dir = "seed/cdphe_open_data"
 
 # Suppress FutureWarning
 warnings.simplefilter(action='ignore', category=FutureWarning)
 
+def parse_args():
+    """Parse command line options for the seed data generation."""
+    parser = argparse.ArgumentParser(description="Generate seed data for the target cities.")
+    parser.add_argument("--landmarks", type=int, default=0,
+                        help="Number of ALT landmarks to precompute per city graph (0 to skip).")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of cities to process in parallel.")
+    parser.add_argument("--checkpoint-dir", default="",
+                        help="Directory of per-city checkpoints to resume an interrupted run; completed cities are skipped "
+                             "(disabled by default, delete the directory before a fresh run).")
+    parser.add_argument("--cache-dir", default="",
+                        help="Directory of cached Overpass and OSMnx downloads, reused across runs and never expired "
+                             "(disabled by default so every run fetches fresh data).")
+    parser.add_argument("--offline", action="store_true",
+                        help="Read downloads only from the cache and fail on a cache miss (requires --cache-dir).")
+    parser.add_argument("--max-tile-area", type=float, default=TILE_MAX_AREA_KM2,
+                        help="Split cities larger than this many square kilometers into tiles (0, the default, disables tiling). "
+                             "Each tile becomes its own citydict entry and id, so this changes the cities the frontend lists.")
+    parser.add_argument("--tile-buffer", type=float, default=MAX_WALK_METERS,
+                        help="Meters each tile's graph extends past its core; at least the longest walk searched.")
+    parser.add_argument("--boundary-spacing", type=float, default=0,
+                        help="Resample park boundaries to a point about every this many meters before snapping "
+                             "(densifies long edges, thins dense vertices; 0 keeps the boundary vertices).")
+    parser.add_argument("--output-format", choices=OUTPUT_FORMATS, default="geojson",
+                        help="Write amenities and network nodes as GeoJSON/JSON or as GeoParquet/NumPy (requires pyarrow).")
+    args = parser.parse_args()
+    if args.offline and not args.cache_dir:
+        parser.error("--offline requires --cache-dir")
+    if args.output_format == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            parser.error("--output-format parquet requires pyarrow")
+    return args
+
 if __name__ == "__main__":
+    args = parse_args()
+    # Configure the download cache through the environment so process pool workers share it
+    os.environ[CACHE_DIR_ENV] = args.cache_dir
+    os.environ[OFFLINE_ENV] = "1" if args.offline else ""
+    os.environ[OUTPUT_FORMAT_ENV] = args.output_format
+    os.environ[BOUNDARY_SPACING_ENV] = str(args.boundary_spacing or "")
     csv_file_path = os.path.abspath(f"{data_dir}/target_citylist.csv")
     geojson_file_path = os.path.abspath(f"{data_dir}/Colorado_City_Boundaries.geojson")
     output_file_path = os.path.abspath("shared/citydict.json")
 
     csv_data, geojson_data = load_data(csv_file_path, geojson_file_path)
-    process_data(csv_data, geojson_data, output_file_path)
+    process_data(
+        csv_data,
+        geojson_data,
+        output_file_path,
+        num_landmarks=args.landmarks,
+        workers=args.workers,
+        checkpoint_dir=args.checkpoint_dir,
+        max_tile_area_km2=args.max_tile_area,
+        tile_buffer_meters=args.tile_buffer,
+    )
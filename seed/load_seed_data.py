@@ -0,0 +1,49 @@
+import os
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from utils.loader import DROP_TABLES_SQL, CREATE_TABLES_SQL, CREATE_INDEXES_SQL, PRUNE_CITIES_SQL, get_dsn, load_city, run_sql
+
+seed_dir = os.path.dirname(os.path.abspath(__file__))
+
+def parse_args():
+    """Parse command line options for loading the seed data into the database."""
+    parser = argparse.ArgumentParser(description="Load the generated seed data into PostGIS with COPY.")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="Number of cities to load in parallel.")
+    parser.add_argument("--data-dir", default=os.path.join(seed_dir, "data"),
+                        help="Directory of the generated seed data.")
+    parser.add_argument("--citydict", default=os.path.join(seed_dir, "..", "shared", "citydict.json"),
+                        help="Path to the city dictionary produced by generate_seed_data.py.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Update only the features and artifacts that changed, keeping the tables online.")
+    return parser.parse_args()
+
+def load_seed_data(dsn, citydict, data_dir, workers=1, incremental=False):
+    """Recreate (or keep) the tables, load every city in its own transaction, then build indexes."""
+    start_time = time.time()
+    run_sql(dsn, CREATE_TABLES_SQL if incremental else DROP_TABLES_SQL + CREATE_TABLES_SQL)
+
+    with ProcessPoolExecutor(max_workers=max(workers, 1)) as executor:
+        futures = [
+            executor.submit(load_city, dsn, city, data["id"], data_dir, incremental=incremental)
+            for city, data in citydict.items()
+        ]
+        results = [future.result() for future in futures]
+
+    print("Creating indexes and analyzing tables...")
+    run_sql(dsn, CREATE_INDEXES_SQL)
+    # A failed incremental update keeps the city's previous rows, while a failed full reload leaves none
+    kept_city_ids = [data["id"] for data, loaded in zip(citydict.values(), results) if loaded or incremental]
+    run_sql(dsn, PRUNE_CITIES_SQL, {"city_ids": kept_city_ids})
+    print(f"Loaded {sum(results)}/{len(results)} cities in {time.time() - start_time:.1f} seconds")
+    return all(results)
+
+if __name__ == "__main__":
+    args = parse_args()
+    with open(args.citydict, "r") as f:
+        citydict = json.load(f)
+
+    if not load_seed_data(get_dsn(), citydict, args.data_dir, workers=args.workers, incremental=args.incremental):
+        raise SystemExit(1)
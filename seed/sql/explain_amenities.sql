@@ -0,0 +1,45 @@
+-- Compare the query plans of the amenity lookups before and after the stored
+-- centroid/GeoJSON columns and the (city_id, name) index.
+--
+-- The "before" plans run in a transaction that drops every btree index with a
+-- (city_id, ...) prefix on amenities and then rolls back, so they see the
+-- original schema (only the GIST index on geom). DROP INDEX takes an exclusive
+-- lock on amenities until the rollback, so run this against a seeded copy, not
+-- a database that is serving traffic.
+--
+-- Usage (keep the output next to this file so plans can be compared across changes):
+--   psql "$CONNECTION_STRING" -v city_id=55 -v name=cafe -f sql/explain_amenities.sql > sql/explain_amenities.out
+
+\echo '=== before: original indexes, values computed at query time ==='
+BEGIN;
+DROP INDEX IF EXISTS idx_amenities_city_id_name;
+DROP INDEX IF EXISTS idx_amenities_feature_hash;
+DROP INDEX IF EXISTS idx_amenities_apartment_distances;
+
+\echo '=== /amenities?is_centroid=true ==='
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT ST_AsGeoJSON(ST_Centroid(geom), 5) AS centroid, properties
+FROM amenities
+WHERE city_id = :city_id AND name = :'name';
+
+\echo '=== /analyze apartments ==='
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT ST_AsGeoJSON(geom, 5) AS geom, ST_AsGeoJSON(ST_Centroid(geom), 5) AS centroid, properties
+FROM amenities
+WHERE city_id = :city_id AND name = 'apartment';
+
+ROLLBACK;
+
+\echo '=== after: (city_id, name) index, stored columns ==='
+
+\echo '=== /amenities?is_centroid=true ==='
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT centroid_geojson AS centroid, properties
+FROM amenities
+WHERE city_id = :city_id AND name = :'name';
+
+\echo '=== /analyze apartments ==='
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT geojson AS geom, centroid_geojson AS centroid, properties
+FROM amenities
+WHERE city_id = :city_id AND name = 'apartment';
@@ -0,0 +1,142 @@
+import pytest
+from unittest.mock import MagicMock
+import os
+from seed.utils.cache import CACHE_DIR_ENV, OFFLINE_ENV, OfflineCacheMiss, cached_call, cached_file, get_cache_path
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path))
+    monkeypatch.delenv(OFFLINE_ENV, raising=False)
+    return tmp_path
+
+# =============================================================================
+# Tests for cached_call function
+# =============================================================================
+def test_cached_call_fetches_once_per_key(cache_dir):
+    """Test that a second call with the same key is served from disk."""
+    # Arrange
+    fetch = MagicMock(return_value={"elements": [{"id": 1}]})
+
+    # Act
+    first = cached_call("overpass", "query text", fetch)
+    second = cached_call("overpass", "query text", fetch)
+
+    # Assert
+    assert first == second == {"elements": [{"id": 1}]}
+    fetch.assert_called_once()
+    assert (cache_dir / "overpass").is_dir()
+
+def test_cached_call_distinguishes_keys(cache_dir):
+    """Test that different key texts are cached separately."""
+    # Act
+    first = cached_call("overpass", "query A", lambda: {"query": "A"})
+    second = cached_call("overpass", "query B", lambda: {"query": "B"})
+
+    # Assert
+    assert first == {"query": "A"}
+    assert second == {"query": "B"}
+
+def test_cached_call_pickle_roundtrip(cache_dir):
+    """Test that non-JSON results such as graphs can be cached with pickle."""
+    # Arrange
+    graph = {"nodes": {1, 2}, "edges": [(1, 2)]}
+
+    # Act
+    cached_call("graphs", "polygon", lambda: graph, serializer="pickle")
+    result = cached_call("graphs", "polygon", MagicMock(), serializer="pickle")
+
+    # Assert
+    assert result == graph
+    assert get_cache_path(str(cache_dir), "graphs", "polygon", ".pkl").endswith(".pkl")
+
+def test_cached_call_without_cache_dir(monkeypatch):
+    """Test that every call fetches when no cache directory is configured."""
+    # Arrange
+    monkeypatch.delenv(CACHE_DIR_ENV, raising=False)
+    monkeypatch.delenv(OFFLINE_ENV, raising=False)
+    fetch = MagicMock(return_value={})
+
+    # Act
+    cached_call("overpass", "query", fetch)
+    cached_call("overpass", "query", fetch)
+
+    # Assert
+    assert fetch.call_count == 2
+
+# Offline Cases
+def test_cached_call_offline_reads_cache(cache_dir, monkeypatch):
+    """Test that offline mode serves cached entries without fetching."""
+    # Arrange
+    cached_call("overpass", "query", lambda: {"elements": []})
+    monkeypatch.setenv(OFFLINE_ENV, "1")
+    fetch = MagicMock()
+
+    # Act
+    result = cached_call("overpass", "query", fetch)
+
+    # Assert
+    assert result == {"elements": []}
+    fetch.assert_not_called()
+
+def test_cached_call_offline_miss_raises(cache_dir, monkeypatch):
+    """Test that offline mode fails instead of downloading on a cache miss."""
+    # Arrange
+    monkeypatch.setenv(OFFLINE_ENV, "1")
+    fetch = MagicMock()
+
+    # Act & Assert
+    with pytest.raises(OfflineCacheMiss):
+        cached_call("overpass", "uncached query", fetch)
+    fetch.assert_not_called()
+
+# =============================================================================
+# Tests for cached_file function
+# =============================================================================
+def write_file(text):
+    """Return a download callback writing the given text and recording its calls."""
+    download = MagicMock()
+    download.side_effect = lambda file_path: open(file_path, "w").write(text)
+    return download
+
+def test_cached_file_downloads_once_per_key(cache_dir):
+    """Test that a cached download is reused instead of downloaded again."""
+    # Arrange
+    download = write_file('{"elements": []}')
+
+    # Act
+    with cached_file("overpass", "query", download) as first_path:
+        first = open(first_path).read()
+    with cached_file("overpass", "query", download) as second_path:
+        second = open(second_path).read()
+
+    # Assert
+    assert first == second == '{"elements": []}'
+    assert first_path == second_path == get_cache_path(str(cache_dir), "overpass", "query", ".json")
+    download.assert_called_once()
+
+def test_cached_file_without_cache_dir_uses_temporary_file(monkeypatch):
+    """Test that downloads go to a temporary file removed after use when caching is disabled."""
+    # Arrange
+    monkeypatch.delenv(CACHE_DIR_ENV, raising=False)
+    monkeypatch.delenv(OFFLINE_ENV, raising=False)
+
+    # Act
+    with cached_file("overpass", "query", write_file("{}")) as file_path:
+        content = open(file_path).read()
+
+    # Assert
+    assert content == "{}"
+    assert not os.path.exists(file_path)
+
+def test_cached_file_failed_download_is_not_cached(cache_dir):
+    """Test that a failed download leaves no cache entry behind."""
+    # Arrange
+    def download(file_path):
+        open(file_path, "w").write('{"elem')
+        raise IOError("connection reset")
+
+    # Act & Assert
+    with pytest.raises(IOError):
+        with cached_file("overpass", "query", download):
+            pass
+    assert not any(files for _, _, files in os.walk(cache_dir))
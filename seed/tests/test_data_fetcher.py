@@ -1,14 +1,27 @@
+import json
 import pytest
 import geopandas as gpd
 import sys
+from contextlib import contextmanager
 from unittest.mock import patch, MagicMock
 from shapely.geometry import Point, Polygon
 
 # Mock the utils.geometry module
 geometry_mock = MagicMock()
 sys.modules['utils.geometry'] = geometry_mock
+# Mock the utils.cache module so downloads always go through the patched fetchers
+cache_mock = MagicMock()
+cache_mock.cached_call.side_effect = lambda namespace, key_text, fetch, serializer="json": fetch()
+sys.modules['utils.cache'] = cache_mock
 
-from seed.utils.data_fetcher import create_gdf, fetch_and_normalize_data
+from seed.utils.data_fetcher import (
+    create_gdf,
+    fetch_and_normalize_data,
+    fetch_data_from_overpass,
+    generate_query,
+    iter_json_array,
+    split_gdf_by_tags,
+)
 
 # =============================================================================
 # Tests for create_gdf function
@@ -49,11 +62,10 @@ def test_create_gdf_with_valid_data():
     }
     
     # Act
-    geometry_mock.create_geometry.side_effect = [
+    geometry_mock.create_geometries.side_effect = lambda elements: [
         Point(-74.0060, 40.7128),  # Node 1
         Polygon([(-74.0060, 40.7128), (-74.0065, 40.7130), (-74.0055, 40.7135), (-74.0060, 40.7128)]),  # Way 2
-        None,  # Node 3 (will be combined with empty properties to be skipped)
-        Point(-74.0055, 40.7135)  # Node 4
+        Point(-74.0055, 40.7135)  # Node 4 (node 3 has no properties and is not built)
     ]
     
     geometry_mock.filter_properties.side_effect = [
@@ -85,6 +97,25 @@ def test_create_gdf_with_empty_data():
     assert len(result) == 0
     assert result.crs == "EPSG:4326"
 
+def test_create_gdf_from_stream_in_chunks():
+    """Test that streamed elements converted in several chunks form one GeoDataFrame."""
+    # Arrange
+    elements = iter([{'type': 'node', 'id': element_id} for element_id in range(1, 6)])
+    geometry_mock.create_geometries.side_effect = lambda elements: [Point(element['id'], element['id']) for element in elements]
+    geometry_mock.filter_properties.side_effect = [
+        {'amenity': 'cafe'}, {'shop': 'supermarket'}, {}, {'amenity': 'cafe', 'name': 'Cafe'}, {'leisure': 'park'}
+    ]
+
+    # Act
+    result = create_gdf(elements, chunk_size=2)
+
+    # Assert
+    assert isinstance(result, gpd.GeoDataFrame)
+    assert result['id'].tolist() == [1, 2, 4, 5]
+    assert result.index.tolist() == [0, 1, 2, 3]
+    assert result.loc[2, 'name'] == 'Cafe'
+    assert result.crs == "EPSG:4326"
+
 def test_create_gdf_with_no_valid_elements():
     """Test creating GeoDataFrame from data that results in no valid geometries."""
     # Arrange
@@ -109,12 +140,12 @@ def test_create_gdf_with_no_valid_elements():
     
     # Act
     # Reset any previous side_effects
-    geometry_mock.create_geometry.reset_mock()
+    geometry_mock.create_geometries.reset_mock()
     geometry_mock.filter_properties.reset_mock()
     
     # Configure side_effects with lists that match the number of elements
-    geometry_mock.create_geometry.side_effect = [None, None]
-    geometry_mock.filter_properties.side_effect = [{}, {}]
+    geometry_mock.create_geometries.side_effect = lambda elements: [None] * len(elements)
+    geometry_mock.filter_properties.side_effect = [{'amenity': 'cafe'}, {}]
     
     result = create_gdf(mock_data)
     
@@ -122,8 +153,8 @@ def test_create_gdf_with_no_valid_elements():
     assert isinstance(result, gpd.GeoDataFrame)
     assert len(result) == 0
     assert result.crs == "EPSG:4326"
-    assert geometry_mock.create_geometry.call_count == 2
     assert geometry_mock.filter_properties.call_count == 2
+    assert geometry_mock.create_geometries.call_args[0][0] == [mock_data['elements'][0]]
 
 # =============================================================================
 # Tests for fetch_and_normalize_data function
@@ -202,3 +233,150 @@ def test_fetch_and_normalize_data_api_error_handling():
             fetch_and_normalize_data(test_query)
         
         mock_fetch.assert_called_once_with(test_query)
+
+# =============================================================================
+# Tests for iter_json_array and fetch_data_from_overpass functions
+# =============================================================================
+OVERPASS_RESPONSE = {
+    "version": 0.6,
+    "osm3s": {"copyright": "The data included in this document is from www.openstreetmap.org. [ODbL]"},
+    "elements": [
+        {"type": "node", "id": 12345678901, "lat": 39.7392358, "lon": -104.9903, "tags": {"name": "Caf\u00e9 \"]}\" & Co"}},
+        {"type": "way", "id": 2, "nodes": [1, 2], "geometry": [{"lat": 1e-3, "lon": -2.5E2}, {"lat": 0, "lon": 1}]},
+        {"type": "relation", "id": 3, "members": [], "tags": {}},
+    ],
+    "remark": "runtime error: [end]",
+}
+
+def split_text(text, size):
+    """Split text into chunks of the given size."""
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+def test_iter_json_array_matches_json_loads():
+    """Test that elements streamed from chunks of any size match a full parse."""
+    # Arrange
+    text = json.dumps(OVERPASS_RESPONSE, indent=1)
+
+    # Act & Assert
+    for size in [1, 2, 3, 7, 64, len(text)]:
+        assert list(iter_json_array(split_text(text, size), "elements")) == OVERPASS_RESPONSE["elements"]
+
+def test_iter_json_array_is_lazy():
+    """Test that elements are yielded before the rest of the document is read."""
+    # Arrange
+    chunks_read = []
+    def chunks():
+        for chunk in split_text(json.dumps(OVERPASS_RESPONSE), 16):
+            chunks_read.append(chunk)
+            yield chunk
+
+    # Act
+    first = next(iter_json_array(chunks(), "elements"))
+
+    # Assert
+    assert first == OVERPASS_RESPONSE["elements"][0]
+    assert len(chunks_read) < len(split_text(json.dumps(OVERPASS_RESPONSE), 16))
+
+def test_iter_json_array_large_element_is_not_reparsed_per_chunk(mocker):
+    """Test that an element spanning thousands of chunks is decoded a logarithmic number of times."""
+    # Arrange
+    element = {"type": "relation", "id": 1, "geometry": [{"lat": 39.0 + i * 1e-6, "lon": -105.0} for i in range(2000)]}
+    chunks = split_text(json.dumps({"elements": [element]}), 16)
+    decode_calls = []
+
+    class CountingDecoder(json.JSONDecoder):
+        def raw_decode(self, s, idx=0):
+            decode_calls.append(idx)
+            return super().raw_decode(s, idx)
+
+    mocker.patch.object(json, "JSONDecoder", CountingDecoder)
+
+    # Act
+    result = list(iter_json_array(chunks, "elements"))
+
+    # Assert
+    assert result == [element]
+    assert len(chunks) > 3000
+    assert len(decode_calls) < 50
+
+def test_iter_json_array_missing_key_and_invalid_input():
+    """Test that a missing key yields nothing and non-JSON input is rejected."""
+    # Act & Assert
+    assert list(iter_json_array(['{"remark": "empty"}'], "elements")) == []
+    with pytest.raises(ValueError):
+        list(iter_json_array(["<html>Too Many Requests</html>"], "elements"))
+    with pytest.raises(ValueError):
+        list(iter_json_array(['{"elements": [{"id": 1}, {"id"'], "elements"))
+
+def test_fetch_data_from_overpass_streams_downloaded_file(tmp_path):
+    """Test that elements are streamed from the downloaded response file."""
+    # Arrange
+    @contextmanager
+    def cached_file(namespace, key_text, download):
+        file_path = str(tmp_path / "response.json")
+        download(file_path)
+        yield file_path
+
+    def request_overpass(query, file_path):
+        with open(file_path, "w") as f:
+            json.dump(OVERPASS_RESPONSE, f)
+
+    # Act
+    with patch('seed.utils.data_fetcher.cached_file', side_effect=cached_file), \
+         patch('seed.utils.data_fetcher.request_overpass', side_effect=request_overpass) as mock_request, \
+         patch('seed.utils.data_fetcher.READ_CHUNK_SIZE', 10):
+        result = list(fetch_data_from_overpass("query"))
+
+    # Assert
+    assert result == OVERPASS_RESPONSE["elements"]
+    assert mock_request.call_args[0][0] == "query"
+
+# =============================================================================
+# Tests for generate_query function
+# =============================================================================
+def test_generate_query_combines_tag_pairs():
+    """Test that one query selects every tag pair within the polygon."""
+    # Act
+    query = generate_query("1 2 3 4", [("building", "apartments"), ("amenity", "cafe")], timeout=90)
+
+    # Assert
+    assert query.startswith("[out:json][timeout:90];")
+    assert 'nwr["building"="apartments"](poly:"1 2 3 4");' in query
+    assert 'nwr["amenity"="cafe"](poly:"1 2 3 4");' in query
+    assert query.endswith("out geom;\n")  # No recursion into member nodes
+
+# =============================================================================
+# Tests for split_gdf_by_tags function
+# =============================================================================
+def test_split_gdf_by_tags():
+    """Test splitting one combined result into per-amenity GeoDataFrames."""
+    # Arrange
+    gdf = gpd.GeoDataFrame(
+        [
+            {'building': 'apartments', 'id': 1},
+            {'leisure': 'park', 'name': 'Big Park', 'id': 2},
+            {'amenity': 'cafe', 'building': 'residential', 'id': 3},
+            {'shop': 'hardware', 'id': 4},
+        ],
+        geometry=[Point(0, 0), Point(1, 1), Point(2, 2), Point(3, 3)],
+        crs="EPSG:4326"
+    )
+    tag_groups = {
+        "apartment": [("building", "apartments"), ("building", "residential")],
+        "park": [("leisure", "park")],
+        "cafe": [("amenity", "cafe")],
+        "supermarket": [("shop", "supermarket")],
+        "school": [("amenity_type", "school")],
+    }
+
+    # Act
+    result = split_gdf_by_tags(gdf, tag_groups)
+
+    # Assert
+    assert result["apartment"]["id"].tolist() == [1, 3]
+    assert result["park"]["id"].tolist() == [2]
+    assert set(result["park"].columns) == {'leisure', 'name', 'id', 'geometry'}
+    assert result["cafe"]["id"].tolist() == [3]
+    assert len(result["supermarket"]) == 0
+    assert len(result["school"]) == 0
+    assert result["park"].crs == "EPSG:4326"
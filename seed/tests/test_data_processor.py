@@ -2,7 +2,8 @@ import pandas as pd
 import json
 import sys
 from unittest.mock import patch, MagicMock, mock_open
-from shapely.geometry import Polygon
+import geopandas as gpd
+from shapely.geometry import Point, Polygon, box, mapping, shape
 
 # Mock the external modules
 geometry_mock = MagicMock()
@@ -23,7 +24,14 @@ from seed.utils.data_processor import (
     save_city_dict_to_json,
     process_city_data,
     generate_network_graph,
-    generate_geojson_and_network_nodes
+    generate_geojson_and_network_nodes,
+    save_network_graph_and_nodes,
+    run_city,
+    load_checkpoint,
+    get_city_tiles,
+    add_amenity_distances,
+    in_tile_core,
+    BOUNDARY_SPACING_ENV
 )
 
 # =============================================================================
@@ -137,8 +145,38 @@ def test_generate_network_graph():
     # Assert
     network_mock.create_network_graph.assert_called_once()
     network_mock.compress_network_graph.assert_called_once_with(mock_graph)
-    file_mock.save_network_graph_to_json.assert_called_once_with(mock_compressed_graph, city)
-    assert result == mock_graph
+    assert result == mock_compressed_graph
+
+# =============================================================================
+# Tests for save_network_graph_and_nodes function
+# =============================================================================
+def test_save_network_graph_and_nodes():
+    """Test contracting around snapped nodes, simplifying, then saving the graph and network nodes as indices."""
+    # Arrange
+    city = "TestCity"
+    mock_graph = MagicMock()
+    mock_contracted_graph = MagicMock()
+    mock_undirected_graph = MagicMock()
+    mock_indexed_graph = MagicMock()
+    network_mock.contract_network_graph.return_value = mock_contracted_graph
+    network_mock.convert_to_undirected_graph.return_value = mock_undirected_graph
+    network_mock.index_network_graph.return_value = (mock_indexed_graph, {101: 0, 102: 1, 103: 2})
+    file_mock.save_network_graph_to_json.reset_mock()
+    file_mock.save_network_nodes.reset_mock()
+
+    # Act
+    with patch('builtins.print') as mock_print:
+        result = save_network_graph_and_nodes(mock_graph, city, {"park": [103, 101], "cafe": [102]})
+
+    # Assert
+    network_mock.contract_network_graph.assert_called_once_with(mock_graph, {101, 102, 103})
+    network_mock.convert_to_undirected_graph.assert_called_once_with(mock_contracted_graph)
+    network_mock.index_network_graph.assert_called_once_with(mock_undirected_graph)
+    file_mock.save_network_graph_to_json.assert_called_once_with(mock_indexed_graph, city)
+    file_mock.save_network_nodes.assert_any_call([0, 2], city, "park")
+    file_mock.save_network_nodes.assert_any_call([1], city, "cafe")
+    assert "Contracted network graph for TestCity" in mock_print.call_args[0][0]
+    assert result == mock_indexed_graph
 
 # =============================================================================
 # Tests for generate_geojson_and_network_nodes function
@@ -159,19 +197,23 @@ def test_generate_geojson_and_network_nodes():
     # Configure mocks
     geometry_mock.generate_poly_string.return_value = mock_poly_string
     data_fetcher_mock.generate_query.return_value = mock_query
-    data_fetcher_mock.fetch_and_normalize_data.return_value = mock_gdf
+    data_fetcher_mock.fetch_and_split_data.return_value = {
+        amenity: mock_gdf for amenity in ["apartment", "park", "supermarket", "cafe"]
+    }
     geometry_mock.add_boundary.return_value = mock_gdf_with_boundary
     geometry_mock.add_centroid.return_value = mock_gdf_with_centroid
     network_mock.convert_gdf_to_network_nodes.return_value = mock_nnodes
     
     # Act
-    generate_geojson_and_network_nodes(mock_graph, geometry, city)
+    result = generate_geojson_and_network_nodes(mock_graph, geometry, city)
     
     # Assert
     geometry_mock.generate_poly_string.assert_called_once_with(geometry)
-    assert data_fetcher_mock.generate_query.call_count == 4  # One for each amenity
-    assert data_fetcher_mock.fetch_and_normalize_data.call_count == 4
-    assert file_mock.save_gdf_to_geojson.call_count == 4
+    assert data_fetcher_mock.generate_query.call_count == 1  # One combined query for every amenity
+    assert len(data_fetcher_mock.generate_query.call_args[0][1]) == 7  # Every tag pair of the four amenities
+    data_fetcher_mock.fetch_and_split_data.assert_called_once()
+    assert data_fetcher_mock.fetch_and_split_data.call_args[0][0] == mock_query
+    assert file_mock.save_amenities.call_count == 4
     
     # Verify that parks are processed with boundary and not centroid
     assert geometry_mock.add_boundary.call_count >= 1
@@ -179,6 +221,84 @@ def test_generate_geojson_and_network_nodes():
     
     # Verify the number of calls to convert_gdf_to_network_nodes
     assert len(network_mock.convert_gdf_to_network_nodes.call_args_list) >= 4  # Should be called once per amenity
+    assert result == {amenity: mock_nnodes for amenity in ["apartment", "park", "supermarket", "cafe"]}
+
+def test_generate_geojson_and_network_nodes_for_tile():
+    """Test that a tile keeps only its core amenities but can walk to amenities in its buffer."""
+    # Arrange
+    core = mapping(box(0, 0, 1, 1))
+    gdf = gpd.GeoDataFrame({'id': [1, 2]}, geometry=[Point(0.5, 0.5), Point(1.5, 0.5)], crs="EPSG:4326")
+    data_fetcher_mock.fetch_and_split_data.return_value = {"apartment": gdf, "park": gdf}
+
+    # Act
+    with patch('seed.utils.data_processor.save_amenities') as mock_save_gdf, \
+         patch('seed.utils.data_processor.add_centroid', side_effect=lambda gdf: gdf), \
+         patch('seed.utils.data_processor.add_boundary', side_effect=lambda gdf: gdf), \
+         patch('seed.utils.data_processor.convert_gdf_to_network_nodes', side_effect=lambda G, gdf, **kwargs: gdf['id'].tolist()), \
+         patch('seed.utils.data_processor.add_amenity_distances', side_effect=lambda G, gdf, network_nodes, node_index: gdf) as mock_distances:
+        result = generate_geojson_and_network_nodes(MagicMock(), mapping(box(0, 0, 2, 1)), "TestCity 1", core)
+
+    # Assert
+    assert result == {"apartment": [1], "park": [1, 2]}
+    saved = {call[0][2]: call[0][0]['id'].tolist() for call in mock_save_gdf.call_args_list}
+    assert saved == {"apartment": [1], "park": [1]}
+    # Apartments walk to every destination in the buffered tile
+    assert mock_distances.call_args[0][2] == {"apartment": [1], "park": [1, 2]}
+
+def test_generate_geojson_and_network_nodes_passes_boundary_spacing(monkeypatch):
+    """Test that the --boundary-spacing setting reaches park snapping and unset keeps raw vertices."""
+    # Arrange
+    gdf = gpd.GeoDataFrame({'id': [1]}, geometry=[Point(0.5, 0.5)], crs="EPSG:4326")
+    data_fetcher_mock.fetch_and_split_data.return_value = {"park": gdf}
+    spacings = []
+
+    # Act
+    with patch('seed.utils.data_processor.save_amenities'), \
+         patch('seed.utils.data_processor.add_boundary', side_effect=lambda gdf: gdf), \
+         patch('seed.utils.data_processor.convert_gdf_to_network_nodes',
+               side_effect=lambda G, gdf, **kwargs: spacings.append(kwargs['boundary_spacing']) or [1]):
+        monkeypatch.setenv(BOUNDARY_SPACING_ENV, "25")
+        generate_geojson_and_network_nodes(MagicMock(), mapping(box(0, 0, 1, 1)), "TestCity")
+        monkeypatch.setenv(BOUNDARY_SPACING_ENV, "")
+        generate_geojson_and_network_nodes(MagicMock(), mapping(box(0, 0, 1, 1)), "TestCity")
+
+    # Assert
+    assert spacings == [25.0, None]
+
+def test_in_tile_core_assigns_shared_edges_to_one_tile():
+    """Test that a centroid on the edge shared by two tile cores belongs only to the first tile."""
+    # Arrange
+    first, second = box(0, 0, 1, 1), box(1, 0, 2, 1)
+    gdf = gpd.GeoDataFrame({'id': [1, 2, 3]}, geometry=[Point(0.5, 0.5), Point(1, 0.5), Point(1.5, 0.5)], crs="EPSG:4326")
+
+    # Act
+    in_first = in_tile_core(gdf, first)
+    in_second = in_tile_core(gdf, second, claimed=first)
+
+    # Assert
+    assert in_first.tolist() == [True, True, False]
+    assert in_second.tolist() == [False, False, True]
+
+def test_add_amenity_distances():
+    """Test that apartments get one distance column per amenity, snapped from their centroids."""
+    # Arrange
+    gdf = gpd.GeoDataFrame({'id': [1, 2]}, geometry=[Point(0, 0), Point(1, 1)], crs="EPSG:4326")
+    gdf['centroid'] = gdf.geometry
+    network_nodes = {"apartment": [10, 11], "park": [20], "cafe": []}
+    distances = {"park": [15.0, None], "supermarket": [None, None], "cafe": [None, None]}
+
+    # Act
+    with patch('seed.utils.data_processor.snap_to_nearest_nodes', return_value=[10, 11]) as mock_snap, \
+         patch('seed.utils.data_processor.compute_nearest_distances', return_value=distances) as mock_distances:
+        result = add_amenity_distances(MagicMock(), gdf, network_nodes, "INDEX")
+
+    # Assert
+    assert mock_snap.call_args[0] == ("INDEX", [(0.0, 0.0), (1.0, 1.0)])
+    assert mock_distances.call_args[0][1:] == ([10, 11], {"park": [20], "supermarket": [], "cafe": []}, 1200)
+    assert 'centroid' not in result.columns
+    assert result['dist_park'][0] == 15.0 and pd.isna(result['dist_park'][1])
+    assert result['dist_cafe'].isna().all()
+    assert result['network_node'].tolist() == [10, 11]
 
 # =============================================================================
 # Tests for process_city_data function
@@ -192,12 +312,75 @@ def test_process_city_data():
     
     # Act
     with patch('seed.utils.data_processor.generate_network_graph', return_value=mock_graph) as mock_gen_graph, \
-         patch('seed.utils.data_processor.generate_geojson_and_network_nodes') as mock_gen_geojson:
+         patch('seed.utils.data_processor.generate_geojson_and_network_nodes', return_value={"park": [1, 2]}) as mock_gen_geojson, \
+         patch('seed.utils.data_processor.save_network_graph_and_nodes') as mock_save_graph:
         process_city_data(city, geometry)
     
     # Assert
     mock_gen_graph.assert_called_once_with(geometry, city)
-    mock_gen_geojson.assert_called_once_with(mock_graph, geometry, city)
+    mock_gen_geojson.assert_called_once_with(mock_graph, geometry, city, None, None)
+    mock_save_graph.assert_called_once_with(mock_graph, city, {"park": [1, 2]})
+
+def test_process_city_data_returns_stage_timings():
+    """Test that process_city_data reports the seconds spent per stage."""
+    # Act
+    with patch('seed.utils.data_processor.generate_network_graph'), \
+         patch('seed.utils.data_processor.generate_geojson_and_network_nodes'), \
+         patch('seed.utils.data_processor.save_network_graph_and_nodes'), \
+         patch('seed.utils.data_processor.generate_landmarks'):
+        result = process_city_data("TestCity", {'type': 'Polygon'}, num_landmarks=4)
+
+    # Assert
+    assert list(result) == ["graph", "amenities", "export", "landmarks"]
+    assert all(seconds >= 0 for seconds in result.values())
+
+def test_process_city_data_for_tile():
+    """Test that a tile builds its graph over the buffered geometry and keeps its core for amenities."""
+    # Arrange
+    core, buffered, claimed = {'type': 'Polygon', 'core': True}, {'type': 'Polygon'}, {'type': 'Polygon', 'claimed': True}
+    mock_graph = MagicMock()
+
+    # Act
+    with patch('seed.utils.data_processor.generate_network_graph', return_value=mock_graph) as mock_gen_graph, \
+         patch('seed.utils.data_processor.generate_geojson_and_network_nodes', return_value={}) as mock_gen_geojson, \
+         patch('seed.utils.data_processor.save_network_graph_and_nodes'):
+        process_city_data("TestCity 1", core, buffer_geometry=buffered, claimed_geometry=claimed)
+
+    # Assert
+    mock_gen_graph.assert_called_once_with(buffered, "TestCity 1")
+    mock_gen_geojson.assert_called_once_with(mock_graph, buffered, "TestCity 1", core, claimed)
+
+# =============================================================================
+# Tests for get_city_tiles function
+# =============================================================================
+def test_get_city_tiles_names_and_ids():
+    """Test that tiles of a large city get numbered names and ids derived from the OBJECTID."""
+    # Arrange
+    geometry = mapping(box(0, 0, 2, 1))
+    tiles = [(box(0, 0, 1, 1), box(0, 0, 1.1, 1)), (box(1, 0, 2, 1), box(0.9, 0, 2, 1))]
+
+    # Act
+    with patch('seed.utils.data_processor.split_into_tiles', return_value=tiles) as mock_split:
+        result = get_city_tiles("Aurora", 12, geometry, max_tile_area_km2=100, buffer_meters=1200)
+
+    # Assert
+    assert mock_split.call_args[0][1:] == (100, 1200)
+    assert [(name, tile_id) for name, tile_id, _, _, _ in result] == [("Aurora 1", 12001), ("Aurora 2", 12002)]
+    assert result[0][2] == mapping(tiles[0][0])
+    assert result[0][3] == mapping(tiles[0][1])
+    # Only later tiles have earlier cores claiming their shared edges
+    assert result[0][4] is None
+    assert shape(result[1][4]).equals(tiles[0][0])
+
+def test_get_city_tiles_without_tiling():
+    """Test that small cities and disabled tiling keep the city as is."""
+    # Arrange
+    geometry = mapping(box(0, 0, 1, 1))
+
+    # Act & Assert
+    with patch('seed.utils.data_processor.split_into_tiles', return_value=[(box(0, 0, 1, 1), box(0, 0, 1, 1))]):
+        assert get_city_tiles("Golden", 7, geometry, max_tile_area_km2=100) == [("Golden", 7, geometry, None, None)]
+    assert get_city_tiles("Golden", 7, geometry) == [("Golden", 7, geometry, None, None)]
 
 # =============================================================================
 # Tests for process_data function
@@ -269,3 +452,66 @@ def test_process_data_error_handling():
     mock_process_city.assert_called_once()
     # The citydict should still be saved, even with errors
     mock_save.assert_called_once_with({}, output_path)
+
+def test_process_data_skips_checkpointed_cities(tmp_path):
+    """Test that cities with a checkpoint are merged into the city dictionary without being processed again."""
+    # Arrange
+    mock_csv_data = pd.DataFrame({
+        'NAME': ['City1', 'City2'],
+        'OBJECTID': [1, 2]
+    })
+    mock_geojson_data = {'features': []}
+    output_path = str(tmp_path / 'citydict.json')
+    (tmp_path / 'city1.json').write_text(json.dumps({"id": 1, "geometry": {'type': 'Polygon'}, "timings": {}}))
+
+    # Act
+    with patch('seed.utils.data_processor.process_city_data', return_value={"graph": 1.0}) as mock_process_city, \
+         patch('seed.utils.data_processor.get_geometry_by_objectid', return_value={'type': 'MultiPolygon'}), \
+         patch('builtins.print'):
+        process_data(mock_csv_data, mock_geojson_data, output_path, checkpoint_dir=str(tmp_path))
+
+    # Assert
+    mock_process_city.assert_called_once_with('City2', {'type': 'MultiPolygon'}, 0, None, None)
+    with open(output_path) as f:
+        assert json.load(f) == {
+            "city1": {"id": 1, "geometry": {'type': 'Polygon'}},
+            "city2": {"id": 2, "geometry": {'type': 'MultiPolygon'}},
+        }
+    assert load_checkpoint(str(tmp_path), 'City2') == {"id": 2, "geometry": {'type': 'MultiPolygon'}, "timings": {"graph": 1.0}}
+
+def test_process_data_writes_cities_in_csv_order(tmp_path):
+    """Test that the city dictionary follows the CSV order whether cities were checkpointed or processed."""
+    # Arrange
+    mock_csv_data = pd.DataFrame({
+        'NAME': ['City1', 'City2', 'City3'],
+        'OBJECTID': [1, 2, 3]
+    })
+    output_path = str(tmp_path / 'citydict.json')
+    checkpoint_dir = tmp_path / 'checkpoints'
+    checkpoint_dir.mkdir()
+    (checkpoint_dir / 'city3.json').write_text(json.dumps({"id": 3, "geometry": {'type': 'Polygon'}, "timings": {}}))
+
+    # Act
+    with patch('seed.utils.data_processor.process_city_data', return_value={"graph": 1.0}), \
+         patch('seed.utils.data_processor.get_geometry_by_objectid', return_value={'type': 'Polygon'}), \
+         patch('builtins.print'):
+        process_data(mock_csv_data, {'features': []}, output_path, checkpoint_dir=str(checkpoint_dir))
+
+    # Assert
+    with open(output_path) as f:
+        assert list(json.load(f)) == ["city1", "city2", "city3"]
+
+# =============================================================================
+# Tests for run_city function
+# =============================================================================
+def test_run_city_failure_writes_no_checkpoint(tmp_path):
+    """Test that a failed city returns no timings and is not checkpointed."""
+    # Act
+    with patch('seed.utils.data_processor.process_city_data', side_effect=Exception("Processing error")), \
+         patch('builtins.print') as mock_print:
+        result = run_city('City1', 1, {'type': 'Polygon'}, checkpoint_dir=str(tmp_path))
+
+    # Assert
+    assert result == ('City1', 1, {'type': 'Polygon'}, None)
+    assert load_checkpoint(str(tmp_path), 'City1') is None
+    assert any("Error processing City1: Processing error" in call[0][0] for call in mock_print.call_args_list)
@@ -1,6 +1,9 @@
+import random
 import pytest
 import geopandas as gpd
-from shapely.geometry import Point, LineString, Polygon, MultiPolygon, MultiLineString
+from shapely.geometry import Point, LineString, Polygon, MultiPolygon, MultiLineString, box
+from shapely.affinity import scale
+from shapely.ops import unary_union
 
 from seed.utils.geometry import (
     get_geometry_by_objectid,
@@ -8,7 +11,10 @@ from seed.utils.geometry import (
     add_centroid,
     add_boundary,
     create_geometry,
-    filter_properties
+    create_geometries,
+    filter_properties,
+    get_meter_scale,
+    split_into_tiles
 )
 
 # =============================================================================
@@ -349,6 +355,27 @@ def test_create_geometry_way_polygon():
     assert isinstance(result, Polygon)
     assert list(result.exterior.coords) == [(0.0, 0.0), (1.0, 0.0), (0.0, 1.0), (0.0, 0.0)]
 
+def test_create_geometry_way_inline_geometry():
+    """Test creating geometry from a way carrying its own `out geom` coordinates."""
+    # Arrange
+    element = {
+        'type': 'way',
+        'nodes': [1, 2, 3, 1],
+        'geometry': [
+            {'lon': 0.0, 'lat': 0.0},
+            {'lon': 1.0, 'lat': 0.0},
+            {'lon': 0.0, 'lat': 1.0},
+            {'lon': 0.0, 'lat': 0.0}
+        ]
+    }
+
+    # Act
+    result = create_geometry(element)
+
+    # Assert
+    assert isinstance(result, Polygon)
+    assert list(result.exterior.coords) == [(0.0, 0.0), (1.0, 0.0), (0.0, 1.0), (0.0, 0.0)]
+
 def test_create_geometry_relation_simple():
     """Test creating geometry from simple relation element."""
     # Arrange
@@ -486,6 +513,124 @@ def test_create_geometry_unsupported_type():
     # Assert
     assert result is None
 
+# =============================================================================
+# Tests for create_geometries function
+# =============================================================================
+def ring(x, y, size=1.0):
+    """Return a closed square ring of `out geom` coordinates."""
+    return [{'lon': x + dx, 'lat': y + dy} for dx, dy in [(0, 0), (size, 0), (size, size), (0, size), (0, 0)]]
+
+GEOMETRY_FIXTURES = [
+    {'type': 'node', 'lon': 1.0, 'lat': 2.0},
+    {'type': 'way', 'nodes': [1, 2]},
+    {'type': 'way', 'nodes': [1, 2, 3, 1]},
+    {'type': 'way', 'geometry': ring(5.0, 5.0)},
+    {'type': 'way', 'geometry': [{'lon': 0, 'lat': 0}, {'lon': 1, 'lat': 1}, {'lon': 2, 'lat': 0}]},
+    {'type': 'relation', 'members': [{'role': 'outer', 'geometry': ring(0.0, 0.0, 2.0)}, {'role': 'inner', 'geometry': ring(0.5, 0.5)}]},
+    {'type': 'relation', 'members': [{'role': 'outer', 'geometry': ring(0.0, 0.0)}, {'role': 'outer', 'geometry': ring(2.0, 2.0)}]},
+    {'type': 'relation', 'members': []},
+]
+GEOMETRY_FIXTURE_NODES = {
+    1: {'lon': 0.0, 'lat': 0.0},
+    2: {'lon': 1.0, 'lat': 0.0},
+    3: {'lon': 0.0, 'lat': 1.0}
+}
+
+def make_synthetic_elements(count, seed=0):
+    """Build a random mix of nodes, open ways and closed ways."""
+    rng = random.Random(seed)
+    elements = []
+    for _ in range(count):
+        kind = rng.choice(['node', 'open', 'closed'])
+        if kind == 'node':
+            elements.append({'type': 'node', 'lon': rng.uniform(-105, -104), 'lat': rng.uniform(39, 40)})
+            continue
+        coords = [{'lon': rng.uniform(-105, -104), 'lat': rng.uniform(39, 40)} for _ in range(rng.randint(3, 12))]
+        if kind == 'closed':
+            coords.append(dict(coords[0]))
+        elements.append({'type': 'way', 'geometry': coords})
+    return elements
+
+def assert_same_geometries(result, expected):
+    assert len(result) == len(expected)
+    for geometry, expected_geometry in zip(result, expected):
+        if expected_geometry is None:
+            assert geometry is None
+        else:
+            assert geometry.geom_type == expected_geometry.geom_type
+            assert geometry.equals_exact(expected_geometry, 0)
+
+def test_create_geometries_matches_create_geometry_on_fixtures():
+    """Test that bulk construction gives the same geometries as create_geometry on the fixtures."""
+    # Act
+    result = create_geometries(GEOMETRY_FIXTURES, GEOMETRY_FIXTURE_NODES)
+
+    # Assert
+    expected = [create_geometry(element, GEOMETRY_FIXTURE_NODES) for element in GEOMETRY_FIXTURES]
+    assert_same_geometries(result, expected)
+
+def test_create_geometries_matches_create_geometry_on_synthetic_input():
+    """Test that bulk construction gives the same geometries as create_geometry on a large random input."""
+    # Arrange
+    elements = make_synthetic_elements(5000)
+
+    # Act
+    result = create_geometries(elements)
+
+    # Assert
+    assert_same_geometries(result, [create_geometry(element) for element in elements])
+
+def test_create_geometries_edge_cases():
+    """Test empty input and degenerate ways."""
+    # Act & Assert
+    assert create_geometries([]) == []
+    assert_same_geometries(create_geometries([{'type': 'way', 'geometry': ring(0.0, 0.0)}]), [Polygon(
+        [(0.0, 0.0), (1.0, 0.0), (1.0, 1.0), (0.0, 1.0), (0.0, 0.0)]
+    )])
+    degenerate = [{'type': 'way', 'geometry': [{'lon': 0, 'lat': 0}, {'lon': 1, 'lat': 1}, {'lon': 0, 'lat': 0}]}]
+    assert_same_geometries(create_geometries(degenerate), [create_geometry(degenerate[0])])
+
+# =============================================================================
+# Tests for split_into_tiles function
+# =============================================================================
+def area_km2(geometry, reference):
+    x_scale, y_scale = get_meter_scale(reference)
+    return geometry.area * x_scale * y_scale / 1e6
+
+def test_split_into_tiles_small_city_is_one_tile():
+    """Test that a city within the size limit is not split."""
+    # Arrange
+    city = box(-105.0, 39.7, -104.99, 39.71)  # About 1 km2
+
+    # Act
+    tiles = split_into_tiles(city, max_area_km2=10, buffer_meters=1200)
+
+    # Assert
+    assert tiles == [(city, city)]
+
+def test_split_into_tiles_partitions_large_city():
+    """Test that cores partition the city within the size limit and buffers extend them inside the city."""
+    # Arrange
+    city = Polygon([(-105.0, 39.6), (-104.8, 39.6), (-104.8, 39.75), (-104.9, 39.75), (-104.9, 39.8), (-105.0, 39.8)])
+
+    # Act
+    tiles = split_into_tiles(city, max_area_km2=50, buffer_meters=1200)
+
+    # Assert
+    cores = [core for core, _ in tiles]
+    assert len(tiles) > 1
+    assert all(area_km2(core, city) <= 50 for core in cores)
+    assert area_km2(unary_union(cores).symmetric_difference(city), city) < 1e-6
+    assert sum(core.area for core in cores) == pytest.approx(city.area)
+    for core, buffered in tiles:
+        assert buffered.buffer(1e-9).contains(core)
+        assert city.buffer(1e-9).contains(buffered)
+        # Walks up to the buffer width from the core stay inside the buffered geometry
+        x_scale, y_scale = get_meter_scale(city)
+        core_meters = scale(core, xfact=x_scale, yfact=y_scale, origin=(0, 0))
+        reachable = scale(core_meters.buffer(1100), xfact=1 / x_scale, yfact=1 / y_scale, origin=(0, 0)).intersection(city)
+        assert buffered.buffer(1e-9).contains(reachable)
+
 # =============================================================================
 # Tests for filter_properties function
 # =============================================================================
@@ -0,0 +1,387 @@
+import io
+import re
+import json
+import struct
+import pytest
+import shapely
+import numpy as np
+import geopandas as gpd
+from unittest.mock import MagicMock
+from seed.utils import loader
+from seed.utils.loader import (
+    CREATE_TABLES_SQL,
+    PGCOPY_HEADER,
+    PGCOPY_TRAILER,
+    IteratorReader,
+    copy_city,
+    get_city_files,
+    get_manifest_hashes,
+    iter_amenity_rows,
+    iter_copy_stream,
+    iter_network_graph_rows,
+    iter_network_nodes_rows,
+    load_city,
+    record_manifest,
+    update_city,
+)
+
+def decode_copy_stream(data):
+    """Decode a binary COPY stream into a list of tuples of raw field bytes (None for NULL)."""
+    assert data.startswith(PGCOPY_HEADER)
+    assert data.endswith(PGCOPY_TRAILER)
+    offset = len(PGCOPY_HEADER)
+    rows = []
+    while True:
+        (field_count,) = struct.unpack_from("!h", data, offset)
+        offset += 2
+        if field_count == -1:
+            break
+        fields = []
+        for _ in range(field_count):
+            (length,) = struct.unpack_from("!i", data, offset)
+            offset += 4
+            if length == -1:
+                fields.append(None)
+                continue
+            fields.append(data[offset:offset + length])
+            offset += length
+        rows.append(tuple(fields))
+    assert offset == len(data)
+    return rows
+
+@pytest.fixture
+def data_dir(tmp_path):
+    """Write a minimal set of seed files for one city."""
+    (tmp_path / "geojson").mkdir()
+    (tmp_path / "network_nodes").mkdir()
+    (tmp_path / "network_graphs").mkdir()
+    features = {
+        "type": "FeatureCollection",
+        "features": [
+            {"type": "Feature", "geometry": {"type": "Point", "coordinates": [-104.9, 39.7]}, "properties": {"id": 1, "name": "Joe's"}},
+            {"type": "Feature", "geometry": {"type": "Polygon", "coordinates": [[[0, 0], [1, 0], [1, 1], [0, 0]]]}, "properties": {"id": 2}},
+        ],
+    }
+    (tmp_path / "geojson" / "denver_park.geojson").write_text(json.dumps(features))
+    (tmp_path / "network_nodes" / "denver_park.json").write_text("[1, 2, 3]")
+    (tmp_path / "network_graphs" / "denver_graph.json").write_text('{"nodes": [], "links": []}')
+    return tmp_path
+
+# =============================================================================
+# Tests for binary COPY encoding
+# =============================================================================
+def test_iter_amenity_rows_encodes_features(data_dir):
+    """Test that features become (city_id, name, EWKB geometry, JSONB properties, feature hash, distances, network node) tuples."""
+    # Act
+    data = b"".join(iter_copy_stream(iter_amenity_rows(7, "park", str(data_dir / "geojson" / "denver_park.geojson"))))
+    rows = decode_copy_stream(data)
+
+    # Assert
+    assert len(rows) == 2
+    city_id, name, geom, properties, feature_hash, *distances, network_node = rows[0]
+    assert struct.unpack("!i", city_id)[0] == 7
+    assert name == b"park"
+    point = shapely.from_wkb(geom)
+    assert shapely.get_srid(point) == 4326
+    assert (point.x, point.y) == (-104.9, 39.7)
+    assert properties[:1] == b"\x01"
+    assert json.loads(properties[1:]) == {"id": 1, "name": "Joe's"}
+    assert len(feature_hash) == 32 and feature_hash != rows[1][4]
+    assert distances == [None, None, None]
+    assert network_node is None
+    assert shapely.from_wkb(rows[1][2]).geom_type == "Polygon"
+
+def test_iter_amenity_rows_moves_distances_to_columns(tmp_path):
+    """Test that apartment distances and the snapped network node become columns instead of properties."""
+    # Arrange
+    features = {"type": "FeatureCollection", "features": [{
+        "type": "Feature",
+        "geometry": {"type": "Point", "coordinates": [-104.9, 39.7]},
+        "properties": {"id": 1, "dist_park": 120.5, "dist_supermarket": None, "dist_cafe": 800.0, "network_node": 9876543210},
+    }]}
+    file_path = tmp_path / "denver_apartment.geojson"
+    file_path.write_text(json.dumps(features))
+
+    # Act
+    rows = decode_copy_stream(b"".join(iter_copy_stream(iter_amenity_rows(7, "apartment", str(file_path)))))
+
+    # Assert
+    properties, distances, network_node = rows[0][3], rows[0][5:8], rows[0][8]
+    assert json.loads(properties[1:]) == {"id": 1}
+    assert [None if value is None else struct.unpack("!f", value)[0] for value in distances] == [120.5, None, 800.0]
+    assert struct.unpack("!q", network_node)[0] == 9876543210
+
+def test_iter_network_graph_rows_streams_file(data_dir, monkeypatch):
+    """Test that the graph file is streamed in chunks and a missing landmark table is NULL."""
+    # Arrange
+    monkeypatch.setattr(loader, "COPY_CHUNK_SIZE", 4)
+    graph_path = data_dir / "network_graphs" / "denver_graph.json"
+
+    # Act
+    chunks = list(iter_network_graph_rows(7, graph_path, None))
+    rows = decode_copy_stream(b"".join(iter_copy_stream(chunks)))
+
+    # Assert
+    assert len(chunks) > 3
+    assert rows == [(struct.pack("!i", 7), b"\x01" + graph_path.read_bytes(), None)]
+
+def test_iter_network_nodes_rows_npy_matches_json(data_dir):
+    """Test that node sets saved as NumPy arrays load as the same JSONB as the JSON output."""
+    # Arrange
+    np.save(data_dir / "network_nodes" / "denver_cafe.npy", np.array([1, 2, 3], dtype=np.int64))
+
+    # Act
+    rows = list(iter_network_nodes_rows(7, {
+        "park": str(data_dir / "network_nodes" / "denver_park.json"),
+        "cafe": str(data_dir / "network_nodes" / "denver_cafe.npy"),
+    }))
+
+    # Assert
+    park, cafe = [decode_copy_stream(b"".join(iter_copy_stream([row])))[0] for row in rows]
+    assert json.loads(park[2][1:]) == json.loads(cafe[2][1:]) == [1, 2, 3]
+
+def test_iter_amenity_rows_geoparquet_matches_geojson(data_dir):
+    """Test that GeoParquet amenities load as the same rows as their GeoJSON output."""
+    # Arrange
+    pytest.importorskip("pyarrow")
+    geojson_path = str(data_dir / "geojson" / "denver_park.geojson")
+    parquet_path = str(data_dir / "denver_park.parquet")
+    gpd.read_file(geojson_path).to_parquet(parquet_path, index=False)
+
+    # Act
+    parquet_rows = decode_copy_stream(b"".join(iter_copy_stream(iter_amenity_rows(7, "park", parquet_path))))
+    geojson_rows = decode_copy_stream(b"".join(iter_copy_stream(iter_amenity_rows(7, "park", geojson_path))))
+
+    # Assert
+    assert len(parquet_rows) == len(geojson_rows) == 2
+    for parquet_row, geojson_row in zip(parquet_rows, geojson_rows):
+        assert parquet_row[:2] == geojson_row[:2]
+        assert shapely.from_wkb(parquet_row[2]).equals(shapely.from_wkb(geojson_row[2]))
+        assert {k: v for k, v in json.loads(parquet_row[3][1:]).items() if v is not None} == json.loads(geojson_row[3][1:])
+
+def test_iterator_reader_reads_across_chunks():
+    """Test that the reader returns the concatenated chunks whatever the read size."""
+    # Arrange
+    reader = io.BufferedReader(IteratorReader([b"abc", b"", b"defg", b"h"]), buffer_size=2)
+
+    # Act & Assert
+    assert reader.read(5) == b"abcde"
+    assert reader.read() == b"fgh"
+
+# =============================================================================
+# Tests for get_city_files and copy_city functions
+# =============================================================================
+def test_get_city_files_skips_missing_files(data_dir):
+    """Test that only generated files are returned."""
+    # Act
+    files = get_city_files(data_dir, "Denver")
+
+    # Assert
+    assert list(files["amenities"]) == ["park"]
+    assert list(files["network_nodes"]) == ["park"]
+    assert files["graph"].endswith("denver_graph.json")
+    assert files["landmarks"] is None
+
+def test_get_city_files_prefers_columnar_outputs(data_dir):
+    """Test that GeoParquet and NumPy outputs are loaded instead of GeoJSON and JSON when present."""
+    # Arrange
+    (data_dir / "geoparquet").mkdir()
+    (data_dir / "geoparquet" / "denver_park.parquet").write_bytes(b"")
+    np.save(data_dir / "network_nodes" / "denver_park.npy", np.array([1], dtype=np.int64))
+
+    # Act
+    files = get_city_files(data_dir, "denver")
+
+    # Assert
+    assert files["amenities"]["park"].endswith("denver_park.parquet")
+    assert files["network_nodes"]["park"].endswith("denver_park.npy")
+
+def test_copy_city_uses_binary_copy(data_dir):
+    """Test that every table is loaded with a binary COPY."""
+    # Arrange
+    cur = MagicMock()
+    cur.copy_expert.side_effect = lambda sql, stream, size: stream.read()
+
+    # Act
+    copy_city(cur, 7, get_city_files(data_dir, "denver"))
+
+    # Assert
+    statements = [call.args[0] for call in cur.copy_expert.call_args_list]
+    assert statements == [
+        "COPY amenities (city_id, name, geom, properties, feature_hash, dist_park, dist_supermarket, dist_cafe, network_node) FROM STDIN WITH (FORMAT binary)",
+        "COPY network_nodes (city_id, name, nodes) FROM STDIN WITH (FORMAT binary)",
+        "COPY network_graphs (city_id, graph, landmarks) FROM STDIN WITH (FORMAT binary)",
+    ]
+
+# =============================================================================
+# Tests for the table schema
+# =============================================================================
+def test_create_tables_upgrades_original_schema():
+    """Test that every column added since the original seed.sh schema is also added to existing tables."""
+    # Arrange
+    original_columns = {
+        "amenities": {"id", "city_id", "name", "geom", "properties"},
+        "network_graphs": {"id", "city_id", "graph"},
+        "network_nodes": {"id", "city_id", "name", "nodes"},
+    }
+
+    for table, columns in original_columns.items():
+        # Act
+        body = re.search(rf"CREATE TABLE IF NOT EXISTS {table} \((.*?)\n\);", CREATE_TABLES_SQL, re.S).group(1)
+        defined = {line.split()[0] for line in body.splitlines() if line.strip() and not line.strip().startswith("--")}
+        altered = set(re.findall(rf"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS (\w+)", CREATE_TABLES_SQL))
+
+        # Assert
+        assert defined - columns == altered
+
+# =============================================================================
+# Tests for update_city function
+# =============================================================================
+def test_update_city_skips_unchanged_artifacts(data_dir):
+    """Test that a city whose hashes match the manifest is left untouched."""
+    # Arrange
+    cur = MagicMock()
+    files = get_city_files(data_dir, "denver")
+    hashes = get_manifest_hashes(files)
+    cur.fetchall.return_value = list(hashes.items())
+
+    # Act
+    changed = update_city(cur, 7, files, hashes)
+
+    # Assert
+    assert changed == set()
+    assert cur.execute.call_count == 1  # Only the manifest lookup
+    cur.copy_expert.assert_not_called()
+
+def test_update_city_diffs_changed_amenities_through_staging(data_dir):
+    """Test that a changed amenity file is staged and diffed, while unchanged artifacts are skipped."""
+    # Arrange
+    cur = MagicMock()
+    cur.copy_expert.side_effect = lambda sql, stream, size: stream.read()
+    files = get_city_files(data_dir, "denver")
+    hashes = get_manifest_hashes(files)
+    cur.fetchall.return_value = list({**hashes, "amenities/park": "0" * 64}.items())
+
+    # Act
+    changed = update_city(cur, 7, files, hashes)
+
+    # Assert
+    assert changed == {"amenities/park"}
+    statements = [call.args[0] for call in cur.execute.call_args_list]
+    assert any("CREATE TEMP TABLE amenities_staging" in sql for sql in statements)
+    assert any(sql.strip().startswith("DELETE FROM amenities a") for sql in statements)
+    assert any(sql.strip().startswith("INSERT INTO amenities") for sql in statements)
+    assert not any("network_nodes" in sql or "network_graphs" in sql for sql in statements)
+    assert [call.args[0] for call in cur.copy_expert.call_args_list] == [
+        "COPY amenities_staging (city_id, name, geom, properties, feature_hash, dist_park, dist_supermarket, dist_cafe, network_node) FROM STDIN WITH (FORMAT binary)",
+    ]
+
+def test_update_city_replaces_changed_nodes_and_removed_artifacts(data_dir):
+    """Test that changed node sets are reloaded and artifacts no longer generated are deleted."""
+    # Arrange
+    cur = MagicMock()
+    cur.copy_expert.side_effect = lambda sql, stream, size: stream.read()
+    files = get_city_files(data_dir, "denver")
+    hashes = get_manifest_hashes(files)
+    cur.fetchall.return_value = list({**hashes, "network_nodes/park": "0" * 64, "amenities/cafe": "1" * 64}.items())
+
+    # Act
+    changed = update_city(cur, 7, files, hashes)
+
+    # Assert
+    assert changed == {"network_nodes/park", "amenities/cafe"}
+    assert cur.execute.call_args_list[-1].args == ("DELETE FROM network_nodes WHERE city_id = %s AND name = ANY(%s)", (7, ["park"]))
+    assert ("DELETE FROM amenities WHERE city_id = %s AND name = %s", (7, "cafe")) in [call.args for call in cur.execute.call_args_list]
+    assert [call.args[0] for call in cur.copy_expert.call_args_list] == [
+        "COPY network_nodes (city_id, name, nodes) FROM STDIN WITH (FORMAT binary)",
+    ]
+
+# =============================================================================
+# Tests for the seed manifest
+# =============================================================================
+def test_get_manifest_hashes_hashes_each_artifact(data_dir):
+    """Test that every generated artifact gets a content hash that changes with its content."""
+    # Arrange
+    files = get_city_files(data_dir, "denver")
+
+    # Act
+    before = get_manifest_hashes(files)
+    (data_dir / "network_nodes" / "denver_park.json").write_text("[1, 2, 4]")
+    after = get_manifest_hashes(files)
+
+    # Assert
+    assert sorted(before) == ["amenities/park", "graph", "network_nodes/park"]
+    assert all(len(content_hash) == 64 for content_hash in before.values())
+    assert {artifact for artifact in before if before[artifact] != after[artifact]} == {"network_nodes/park"}
+
+def test_record_manifest_upserts_hashes():
+    """Test that stale artifacts are removed and current hashes upserted for the city."""
+    # Arrange
+    cur = MagicMock()
+
+    # Act
+    record_manifest(cur, 7, {"graph": "a" * 64, "amenities/park": "b" * 64})
+
+    # Assert
+    assert cur.execute.call_args.args[1] == (7, ["graph", "amenities/park"])
+    sql, rows = cur.executemany.call_args.args
+    assert "ON CONFLICT (city_id, artifact)" in sql
+    assert rows == [(7, "graph", "a" * 64), (7, "amenities/park", "b" * 64)]
+
+# =============================================================================
+# Tests for load_city function
+# =============================================================================
+def test_load_city_retries_in_new_transaction(data_dir, mocker):
+    """Test that a failed city is retried on a new connection and succeeds."""
+    # Arrange
+    mocker.patch.object(loader.time, "sleep")
+    failing_conn, conn = MagicMock(), MagicMock()
+    failing_conn.cursor.return_value.__enter__.return_value.copy_expert.side_effect = Exception("connection lost")
+    connect = mocker.patch.object(loader.psycopg2, "connect", side_effect=[failing_conn, conn])
+
+    # Act
+    result = load_city("dsn", "denver", 7, data_dir)
+
+    # Assert
+    assert result is True
+    assert connect.call_count == 2
+    failing_conn.__exit__.assert_called_once()
+    assert failing_conn.__exit__.call_args.args[0] is Exception
+    failing_conn.close.assert_called_once()
+    conn.close.assert_called_once()
+    # The manifest is written in the same transaction as the data
+    conn.cursor.return_value.__enter__.return_value.executemany.assert_called_once()
+
+def test_load_city_retries_connection_errors(data_dir, mocker):
+    """Test that a failed connection is retried like any other error instead of escaping the retry loop."""
+    # Arrange
+    mocker.patch.object(loader.time, "sleep")
+    conn = MagicMock()
+    connect = mocker.patch.object(loader.psycopg2, "connect", side_effect=[Exception("could not connect to server"), conn])
+
+    # Act
+    result = load_city("dsn", "denver", 7, data_dir)
+
+    # Assert
+    assert result is True
+    assert connect.call_count == 2
+    conn.close.assert_called_once()
+
+def test_load_city_gives_up_after_retries(data_dir, mocker):
+    """Test that a city failing every attempt is reported as not loaded."""
+    # Arrange
+    mocker.patch.object(loader.time, "sleep")
+    conn = MagicMock()
+    conn.cursor.return_value.__enter__.return_value.copy_expert.side_effect = Exception("connection lost")
+    mocker.patch.object(loader.psycopg2, "connect", return_value=conn)
+
+    # Act
+    result = load_city("dsn", "denver", 7, data_dir, retries=2)
+
+    # Assert
+    assert result is False
+    assert conn.close.call_count == 2
+
+    # A server that never accepts connections is reported the same way
+    mocker.patch.object(loader.psycopg2, "connect", side_effect=Exception("could not connect to server"))
+    assert load_city("dsn", "denver", 7, data_dir, retries=2) is False
@@ -1,9 +1,17 @@
 import pytest
 import networkx as nx
+import osmnx as ox
 import geopandas as gpd
 from shapely.geometry import Point, LineString, Polygon, MultiLineString
 from unittest.mock import patch
 import json
+import sys
+from unittest.mock import MagicMock
+
+# Mock the utils.cache module so downloads always go through the patched fetchers
+cache_mock = MagicMock()
+cache_mock.cached_call.side_effect = lambda namespace, key_text, fetch, serializer="json": fetch()
+sys.modules['utils.cache'] = cache_mock
 
 from seed.utils.network import (
     create_network_graph,
@@ -12,7 +20,14 @@ from seed.utils.network import (
     reduce_graph_size,
     reduce_coordinate_precision,
     prune_graph,
-    convert_gdf_to_network_nodes
+    convert_gdf_to_network_nodes,
+    build_node_index,
+    get_boundary_coords,
+    contract_network_graph,
+    convert_to_undirected_graph,
+    index_network_graph,
+    build_landmark_table,
+    compute_nearest_distances
 )
 
 # =============================================================================
@@ -47,6 +62,8 @@ def test_create_network_graph():
     assert G.graph['crs'] == 'EPSG:4326'
     assert len(G.nodes) == 2
     assert len(G.edges) == 1
+    assert cache_mock.cached_call.call_args[0][0] == "graphs"
+    assert polygon.wkb_hex in cache_mock.cached_call.call_args[0][1]
 
 # =============================================================================
 # Tests for convert_graph_to_json function
@@ -309,15 +326,12 @@ def test_convert_gdf_to_network_nodes_with_centroids():
     gdf['centroid'] = gdf['geometry']
     
     # Act
-    with patch('osmnx.distance.nearest_nodes') as mock_nearest_nodes:
-        mock_nearest_nodes.side_effect = [1, 2]
-        result = convert_gdf_to_network_nodes(G, gdf, use_centroid=True)
+    result = convert_gdf_to_network_nodes(G, gdf, use_centroid=True)
         
     # Assert
     assert len(result) == 2
     assert 1 in result
     assert 2 in result
-    assert mock_nearest_nodes.call_count == 2
 
 def test_convert_gdf_to_network_nodes_with_boundaries():
     """Test convert_gdf_to_network_nodes with boundary-based node finding."""
@@ -331,9 +345,7 @@ def test_convert_gdf_to_network_nodes_with_boundaries():
     gdf = gpd.GeoDataFrame({'boundary': [ls1, ls2]})
     
     # Act
-    with patch('osmnx.distance.nearest_nodes') as mock_nearest_nodes:
-        mock_nearest_nodes.side_effect = [1, 2, 1, 2, 1, 2]
-        result = convert_gdf_to_network_nodes(G, gdf, use_centroid=False)
+    result = convert_gdf_to_network_nodes(G, gdf, use_centroid=False)
         
     # Assert
     assert len(result) == 2
@@ -353,15 +365,88 @@ def test_convert_gdf_to_network_nodes_with_multilinestring():
     gdf = gpd.GeoDataFrame({'boundary': [mls]})
     
     # Act
-    with patch('osmnx.distance.nearest_nodes') as mock_nearest_nodes:
-        mock_nearest_nodes.side_effect = [1, 2, 1, 2, 1, 2, 1, 2, 1, 2]
-        result = convert_gdf_to_network_nodes(G, gdf, use_centroid=False)
+    result = convert_gdf_to_network_nodes(G, gdf, use_centroid=False)
         
     # Assert
     assert len(result) == 2
     assert 1 in result
     assert 2 in result
 
+def test_convert_gdf_to_network_nodes_matches_osmnx():
+    """Test that bulk KD-tree snapping picks the same nodes as osmnx nearest_nodes."""
+    # Arrange
+    G = nx.MultiDiGraph(crs="EPSG:4326")
+    for i in range(10):
+        for j in range(10):
+            G.add_node(i * 10 + j, x=-105.0 + j * 0.001, y=39.7 + i * 0.0012)
+    points = [Point(-105.0 + 0.00013 * k, 39.7 + 0.00011 * k) for k in range(60)]
+    gdf = gpd.GeoDataFrame({'geometry': points})
+    gdf['centroid'] = gdf['geometry']
+
+    # Act
+    result = convert_gdf_to_network_nodes(G, gdf, use_centroid=True)
+
+    # Assert
+    expected = ox.distance.nearest_nodes(G, [p.x for p in points], [p.y for p in points])
+    assert sorted(result) == sorted(set(int(node) for node in expected))
+
+def test_convert_gdf_to_network_nodes_reuses_node_index():
+    """Test that a prebuilt node index is used instead of building a new one."""
+    # Arrange
+    G = nx.MultiDiGraph()
+    G.add_node(1, x=0.0, y=0.0)
+    G.add_node(2, x=1.0, y=1.0)
+    node_index = build_node_index(G)
+    gdf = gpd.GeoDataFrame({'boundary': [LineString([(0.0, 0.0), (0.2, 0.2)])]})
+
+    # Act
+    with patch('seed.utils.network.build_node_index') as mock_build:
+        result = convert_gdf_to_network_nodes(G, gdf, use_centroid=False, node_index=node_index)
+
+    # Assert
+    mock_build.assert_not_called()
+    assert result == [1]
+
+def test_get_boundary_coords_resamples_by_spacing():
+    """Test that boundary spacing densifies long edges and thins dense vertices."""
+    # Arrange
+    long_edge = LineString([(0.0, 0.0), (0.001, 0.0)])  # ~111 m
+    dense_line = LineString([(0.00001 * k, 0.0) for k in range(101)])  # ~111 m with 101 vertices
+
+    # Act
+    densified = get_boundary_coords(long_edge, spacing=10)
+    thinned = get_boundary_coords(dense_line, spacing=50)
+
+    # Assert
+    assert len(get_boundary_coords(long_edge)) == 2
+    assert len(densified) == 13
+    assert len(thinned) == 4
+    assert densified[0] == (0.0, 0.0) and densified[-1] == (0.001, 0.0)
+
+def test_get_boundary_coords_spacing_is_scaled_by_latitude():
+    """Test that east-west spacing is measured in ground meters, using the same scale as the node index."""
+    # Arrange
+    east_west = LineString([(0.0, 60.0), (0.002, 60.0)])  # ~111 m at 60 degrees latitude
+    north_south = LineString([(0.0, 60.0), (0.0, 60.001)])  # ~111 m
+
+    # Act
+    east_west_coords = get_boundary_coords(east_west, spacing=10)
+    north_south_coords = get_boundary_coords(north_south, spacing=10)
+
+    # Assert
+    assert len(east_west_coords) == len(north_south_coords) == 13
+    assert east_west_coords[-1] == pytest.approx((0.002, 60.0))
+    assert east_west_coords[1][0] == pytest.approx(2 * 10 / 111320, rel=1e-3)
+
+def test_convert_gdf_to_network_nodes_empty_gdf():
+    """Test that an empty GeoDataFrame snaps to no nodes."""
+    # Arrange
+    G = nx.MultiDiGraph()
+    gdf = gpd.GeoDataFrame({'centroid': []})
+
+    # Act & Assert
+    assert convert_gdf_to_network_nodes(G, gdf, use_centroid=True) == []
+
 def test_convert_gdf_to_network_nodes_invalid_geometry():
     """Test convert_gdf_to_network_nodes raises an error with invalid geometry."""
     # Arrange
@@ -375,3 +460,191 @@ def test_convert_gdf_to_network_nodes_invalid_geometry():
     # Act & Assert
     with pytest.raises(TypeError, match="Unsupported geometry type"):
         convert_gdf_to_network_nodes(G, gdf, use_centroid=False) 
+
+# =============================================================================
+# Tests for contract_network_graph function
+# =============================================================================
+
+def make_walk_graph(edges):
+    """Build a MultiDiGraph with both directions of each (u, v, length) edge."""
+    G = nx.MultiDiGraph()
+    for u, v, length in edges:
+        G.add_edge(u, v, length=length)
+        G.add_edge(v, u, length=length)
+    return G
+
+def test_contract_network_graph_merges_chain():
+    """Test that a degree-2 chain is merged into a single weighted edge in each direction."""
+    # Arrange
+    G = make_walk_graph([(1, 2, 10.0), (2, 3, 20.0), (3, 4, 5.0), (4, 5, 7.0), (4, 6, 8.0)])
+
+    # Act
+    result = contract_network_graph(G, keep_nodes={1})
+
+    # Assert
+    assert set(result.nodes) == {1, 4, 5, 6}
+    assert result[1][4][0]['length'] == 35.0
+    assert result[4][1][0]['length'] == 35.0
+
+def test_contract_network_graph_preserves_distances():
+    """Test that shortest path distances between remaining nodes are unchanged."""
+    # Arrange
+    G = make_walk_graph([
+        (1, 2, 10.0), (2, 3, 10.0), (3, 4, 10.0), (4, 1, 45.0),
+        (4, 5, 3.0), (5, 6, 4.0), (6, 7, 5.0), (7, 1, 6.0), (2, 8, 2.0),
+    ])
+    G.add_edge(3, 9, length=1.0)  # One-way spur
+    G.add_edge(9, 4, length=1.0)
+    expected = dict(nx.all_pairs_dijkstra_path_length(G, weight="length"))
+
+    # Act
+    result = contract_network_graph(G.copy(), keep_nodes={6})
+
+    # Assert
+    assert G.number_of_nodes() > result.number_of_nodes()
+    for source, lengths in nx.all_pairs_dijkstra_path_length(result, weight="length"):
+        assert lengths == {node: expected[source][node] for node in lengths}
+        assert set(lengths) == set(result.nodes)
+
+def test_contract_network_graph_keeps_protected_nodes():
+    """Test that protected nodes are never contracted."""
+    # Arrange
+    G = make_walk_graph([(1, 2, 10.0), (2, 3, 20.0), (3, 4, 5.0)])
+
+    # Act
+    result = contract_network_graph(G, keep_nodes={2, 3})
+
+    # Assert
+    assert set(result.nodes) == {1, 2, 3, 4}
+
+# =============================================================================
+# Tests for convert_to_undirected_graph function
+# =============================================================================
+
+def test_convert_to_undirected_graph_keeps_shortest_edge():
+    """Test that both directions and parallel edges collapse to the shortest single edge."""
+    # Arrange
+    G = make_walk_graph([(1, 2, 10.0), (1, 2, 4.0), (2, 3, 20.0)])
+    G.add_edge(3, 3, length=1.0)
+    G.graph['crs'] = "epsg:4326"
+    G.nodes[1]['x'] = -105.0
+
+    # Act
+    result = convert_to_undirected_graph(G)
+
+    # Assert
+    assert not result.is_directed() and not result.is_multigraph()
+    assert result.number_of_edges() == 2
+    assert result[2][1]['length'] == 4.0
+    assert result.graph['crs'] == "epsg:4326"
+    assert result.nodes[1]['x'] == -105.0
+
+def test_convert_to_undirected_graph_preserves_distances():
+    """Test that shortest path distances are unchanged on a two-way walk graph."""
+    # Arrange
+    G = make_walk_graph([(1, 2, 10.0), (2, 3, 10.0), (1, 3, 25.0), (1, 3, 18.0), (3, 4, 2.0)])
+
+    # Act
+    result = convert_to_undirected_graph(G)
+
+    # Assert
+    assert dict(nx.all_pairs_dijkstra_path_length(result, weight="length")) == dict(nx.all_pairs_dijkstra_path_length(G, weight="length"))
+
+# =============================================================================
+# Tests for index_network_graph function
+# =============================================================================
+
+def test_index_network_graph_relabels_to_contiguous_indices():
+    """Test that nodes are relabeled to 0..N-1 and the OSM ids are kept by index."""
+    # Arrange
+    G = make_walk_graph([(9001, 42, 10.0), (42, 7, 20.0)])
+
+    # Act
+    result, index = index_network_graph(G)
+
+    # Assert
+    assert list(result.nodes) == [0, 1, 2]
+    assert result.graph['osm_ids'] == [9001, 42, 7]
+    assert index == {9001: 0, 42: 1, 7: 2}
+    assert result[index[42]][index[7]][0]['length'] == 20.0
+
+# =============================================================================
+# Tests for build_landmark_table function
+# =============================================================================
+
+def test_build_landmark_table_distances_match_dijkstra():
+    """Test that landmark distances match shortest path lengths to every node."""
+    # Arrange
+    G = nx.MultiDiGraph()
+    for u, v, length in [(1, 2, 10.0), (2, 3, 20.0), (3, 4, 5.0), (1, 4, 50.0)]:
+        G.add_edge(u, v, length=length)
+        G.add_edge(v, u, length=length)
+
+    # Act
+    result = build_landmark_table(G, num_landmarks=2)
+
+    # Assert
+    assert result["nodes"] == [1, 2, 3, 4]
+    assert len(result["landmarks"]) == 2
+    assert result["landmarks"][0] != result["landmarks"][1]
+    for landmark, distances in zip(result["landmarks"], result["distances"]):
+        expected = nx.single_source_dijkstra_path_length(G, landmark, weight="length")
+        assert distances == [expected[node] for node in result["nodes"]]
+
+def test_build_landmark_table_unreachable_nodes():
+    """Test that nodes outside the largest component have no landmark distance."""
+    # Arrange
+    G = nx.MultiDiGraph()
+    G.add_edge(1, 2, length=10.0)
+    G.add_edge(2, 3, length=10.0)
+    G.add_edge(4, 5, length=10.0)
+
+    # Act
+    result = build_landmark_table(G, num_landmarks=1)
+
+    # Assert
+    assert result["landmarks"] in ([1], [3])
+    assert result["distances"][0][3:] == [None, None]
+
+def test_build_landmark_table_empty_graph():
+    """Test build_landmark_table with an empty graph."""
+    # Act
+    result = build_landmark_table(nx.MultiDiGraph())
+
+    # Assert
+    assert result == {"nodes": [], "landmarks": [], "distances": []}
+
+# =============================================================================
+# Tests for compute_nearest_distances function
+# =============================================================================
+
+def test_compute_nearest_distances_matches_dijkstra():
+    """Test that distances to the nearest source match multi-source shortest paths over the shortest parallel edges."""
+    # Arrange
+    G = nx.MultiDiGraph()
+    for u, v, length in [(1, 2, 10.0), (2, 3, 20.0), (3, 4, 5.0), (1, 4, 50.0), (2, 3, 12.0)]:
+        G.add_edge(u, v, length=length)
+    targets = [1, 2, 3, 4, 1]
+
+    # Act
+    result = compute_nearest_distances(G, targets, {"park": [4], "cafe": [1, 4]}, cutoff=100)
+
+    # Assert
+    U = G.to_undirected()
+    for amenity, sources in {"park": [4], "cafe": [1, 4]}.items():
+        expected = nx.multi_source_dijkstra_path_length(U, set(sources), weight="length")
+        assert result[amenity] == [expected[node] for node in targets]
+
+def test_compute_nearest_distances_beyond_cutoff_or_without_sources():
+    """Test that unreachable or too distant targets, and amenities without nodes, have no distance."""
+    # Arrange
+    G = nx.MultiDiGraph()
+    G.add_edge(1, 2, length=10.0)
+    G.add_edge(2, 3, length=500.0)
+    G.add_node(4)
+
+    # Act
+    result = compute_nearest_distances(G, [1, 2, 3, 4], {"park": [1], "cafe": []}, cutoff=100)
+
+    # Assert
+    assert result == {"park": [0.0, 10.0, None, None], "cafe": [None, None, None, None]}
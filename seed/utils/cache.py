@@ -0,0 +1,84 @@
+import os
+import json
+import pickle
+import hashlib
+import tempfile
+from contextlib import contextmanager
+
+# Set by generate_seed_data.py; environment variables so process pool workers inherit them
+CACHE_DIR_ENV = "SEED_CACHE_DIR"
+OFFLINE_ENV = "SEED_OFFLINE"
+
+SERIALIZERS = {
+    "json": (".json", "", json.load, json.dump),
+    "pickle": (".pkl", "b", pickle.load, pickle.dump),
+}
+
+class OfflineCacheMiss(Exception):
+    """Raised in offline mode when a download is not in the local cache."""
+
+def get_cache_path(cache_dir, namespace, key_text, suffix):
+    """Return the content-addressed path of a cache entry, keyed by the SHA-256 of its key text."""
+    digest = hashlib.sha256(key_text.encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, namespace, digest[:2], f"{digest}{suffix}")
+
+def cached_call(namespace, key_text, fetch, serializer="json"):
+    """Return the cached result for the key, calling fetch and caching its result on a miss."""
+    cache_dir = os.getenv(CACHE_DIR_ENV)
+    offline = os.getenv(OFFLINE_ENV) == "1"
+    if not cache_dir:
+        if offline:
+            raise OfflineCacheMiss("Offline mode requires a cache directory")
+        return fetch()
+
+    suffix, mode, load, dump = SERIALIZERS[serializer]
+    file_path = get_cache_path(cache_dir, namespace, key_text, suffix)
+    if os.path.exists(file_path):
+        with open(file_path, f"r{mode}") as f:
+            return load(f)
+    if offline:
+        raise OfflineCacheMiss(f"No cached {namespace} entry at {file_path}")
+
+    result = fetch()
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    # Write then rename so concurrent or interrupted runs never read a partial entry
+    temp_path = f"{file_path}.{os.getpid()}.tmp"
+    with open(temp_path, f"w{mode}") as f:
+        dump(result, f)
+    os.replace(temp_path, file_path)
+    return result
+
+@contextmanager
+def cached_file(namespace, key_text, download, suffix=".json"):
+    """Yield the path of a cached download, calling download(path) to write the file on a miss.
+
+    Without a cache directory the download goes to a temporary file that is removed afterwards.
+    """
+    cache_dir = os.getenv(CACHE_DIR_ENV)
+    offline = os.getenv(OFFLINE_ENV) == "1"
+    if not cache_dir:
+        if offline:
+            raise OfflineCacheMiss("Offline mode requires a cache directory")
+        fd, temp_path = tempfile.mkstemp(suffix=suffix)
+        os.close(fd)
+        try:
+            download(temp_path)
+            yield temp_path
+        finally:
+            os.remove(temp_path)
+        return
+
+    file_path = get_cache_path(cache_dir, namespace, key_text, suffix)
+    if not os.path.exists(file_path):
+        if offline:
+            raise OfflineCacheMiss(f"No cached {namespace} entry at {file_path}")
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        temp_path = f"{file_path}.{os.getpid()}.tmp"
+        try:
+            download(temp_path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        os.replace(temp_path, file_path)
+    yield file_path
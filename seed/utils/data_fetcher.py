@@ -1,45 +1,153 @@
+import json
 import requests
+import pandas as pd
 import geopandas as gpd
-from utils.geometry import create_geometry, filter_properties
+from utils.cache import cached_file
+from utils.geometry import create_geometries, filter_properties
 
-def generate_query(poly_string, key_value_pairs):
+READ_CHUNK_SIZE = 1 << 16  # Characters of JSON read at a time while streaming a response
+GDF_CHUNK_SIZE = 10000  # Features converted into a GeoDataFrame at a time
+NUMBER_CHARS = "0123456789.eE+-"
+
+def generate_query(poly_string, key_value_pairs, timeout=25):
     """Generates an Overpass API query for the given poly_string and key-value pairs."""
-    query = f"[out:json][timeout:25];\n(\n"
+    query = f"[out:json][timeout:{timeout}];\n(\n"
     for key, value in key_value_pairs:
         query += f'  nwr["{key}"="{value}"](poly:"{poly_string}");\n'
-    query += ");\nout geom;\n>;\nout skel qt;\n"
+    # Ways and relations carry their own coordinates, so member nodes are not recursed into
+    query += ");\nout geom;\n"
     return query
 
 def fetch_data_from_overpass(query):
-    """Fetch data from the Overpass API."""
+    """Stream OSM elements for the query, downloading the response to the local cache first."""
+    with cached_file("overpass", query, lambda file_path: request_overpass(query, file_path)) as file_path:
+        with open(file_path, "r", encoding="utf-8") as f:
+            yield from iter_json_array(iter(lambda: f.read(READ_CHUNK_SIZE), ""), "elements")
+
+def request_overpass(query, file_path):
+    """Send the query to the Overpass API and stream the response to a file."""
     overpass_url = "http://overpass-api.de/api/interpreter"
     payload = {"data": query}
 
     try:
-        response = requests.post(overpass_url, data=payload)
-        response.raise_for_status()
-        return response.json()
+        with requests.post(overpass_url, data=payload, stream=True) as response:
+            response.raise_for_status()
+            # Error pages are HTML; check before anything is written to the cache
+            content_type = response.headers.get("Content-Type", "")
+            if "json" not in content_type:
+                raise requests.exceptions.ContentDecodingError(f"Unexpected response content type: {content_type}")
+            with open(file_path, "wb") as f:
+                for chunk in response.iter_content(chunk_size=READ_CHUNK_SIZE):
+                    f.write(chunk)
     except requests.exceptions.RequestException as e:
         print(f"Error fetching data from Overpass API: {e}")
         raise
 
-def create_gdf(data):
-    """Create a GeoDataFrame from the OSM data."""
-    elements = data['elements']
-    nodes = {element['id']: element for element in elements if element['type'] == 'node'}
+def iter_json_array(chunks, key):
+    """Incrementally yield the items of an array member of a top-level JSON object from text chunks."""
+    decoder = json.JSONDecoder()
+    chunks = iter(chunks)
+    buffer = ""
+    pos = 0
+
+    def read():
+        nonlocal buffer, pos
+        chunk = next(chunks, None)
+        if chunk is None:
+            return False
+        # Drop the consumed text so the buffer only holds the value being decoded
+        buffer = buffer[pos:] + chunk
+        pos = 0
+        return True
+
+    def read_more():
+        """Read until the unconsumed text has at least doubled, so a value spanning k chunks is re-decoded O(log k) times."""
+        target = 2 * (len(buffer) - pos)
+        if not read():
+            return False
+        while len(buffer) - pos < target and read():
+            pass
+        return True
+
+    def skip(separators=""):
+        """Advance past whitespace and separators and return the next character (None at the end)."""
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and (buffer[pos].isspace() or buffer[pos] in separators):
+                pos += 1
+            if pos < len(buffer):
+                return buffer[pos]
+            if not read():
+                return None
+
+    def decode():
+        """Decode the next value, reading more text until it is complete."""
+        nonlocal pos
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Decoding restarts from the value's start, so grow the buffer geometrically rather than by one chunk
+                if read_more():
+                    continue
+                raise
+            # A number cut off by the end of the buffer (e.g. "0." or "1e") continues in the next chunk
+            if isinstance(value, (int, float)) and not isinstance(value, bool) and (
+                end == len(buffer) or buffer[end] in NUMBER_CHARS
+            ) and read():
+                continue
+            pos = end
+            return value
+
+    if skip() != "{":
+        raise ValueError("Expected a JSON object")
+    pos += 1
+    while skip(",") not in ("}", None):
+        name = decode()
+        skip(":")
+        if name != key:
+            decode()
+            continue
+        if skip() != "[":
+            raise ValueError(f"Expected '{key}' to be a JSON array")
+        pos += 1
+        while (char := skip(",")) != "]":
+            if char is None:
+                raise ValueError(f"Unterminated '{key}' array")
+            yield decode()
+        pos += 1
 
-    geometry = []
+def create_gdf(data, chunk_size=GDF_CHUNK_SIZE):
+    """Create a GeoDataFrame from OSM elements (a response dict or a stream), converting them in chunks.
+
+    Chunking bounds the parsed JSON and the intermediate geometries, but the chunks are concatenated
+    into one GeoDataFrame per city, so peak memory still grows with the city's feature count.
+    """
+    elements = data['elements'] if isinstance(data, dict) else data
+    chunks = []
+    chunk_elements = []
     properties = []
 
+    def flush():
+        # Build the chunk's geometries in bulk and keep the features that have one
+        geometries = create_geometries(chunk_elements)
+        features = [(props, geom) for props, geom in zip(properties, geometries) if geom]
+        chunks.append(gpd.GeoDataFrame([props for props, _ in features], geometry=[geom for _, geom in features]))
+
     for element in elements:
-        geom = create_geometry(element, nodes)
         filtered_props = filter_properties(element)
-        if geom and filtered_props:
-            geometry.append(geom)
+        if filtered_props:
             filtered_props["id"] = element["id"]
+            chunk_elements.append(element)
             properties.append(filtered_props)
-    
-    gdf = gpd.GeoDataFrame(properties, geometry=geometry)
+        if len(chunk_elements) >= chunk_size:
+            flush()
+            chunk_elements = []
+            properties = []
+
+    if chunk_elements or not chunks:
+        flush()
+    gdf = pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
 
     if gdf.crs is None:
         gdf.set_crs("EPSG:4326", inplace=True)
@@ -52,3 +160,22 @@ def fetch_and_normalize_data(query):
     gdf = create_gdf(data)
     
     return gdf
+
+def split_gdf_by_tags(gdf, tag_groups):
+    """Split a GeoDataFrame into one GeoDataFrame per group of (key, value) tag pairs."""
+    gdfs = {}
+    for name, key_value_pairs in tag_groups.items():
+        mask = pd.Series(False, index=gdf.index)
+        for key, value in key_value_pairs:
+            if key in gdf.columns:
+                mask |= gdf[key] == value
+        group_gdf = gdf[mask]
+        # Drop tag columns only other groups use, matching the columns of a per-group query
+        unused_columns = [column for column in group_gdf.columns if column != "geometry" and group_gdf[column].isna().all()]
+        gdfs[name] = group_gdf.drop(columns=unused_columns).reset_index(drop=True)
+    return gdfs
+
+def fetch_and_split_data(query, tag_groups):
+    """Fetch data with a single Overpass query and split it locally into GeoDataFrames by tag group."""
+    gdf = fetch_and_normalize_data(query)
+    return split_gdf_by_tags(gdf, tag_groups)
@@ -1,11 +1,23 @@
+import os
 import time
 import json
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 import pandas as pd
-from shapely.geometry import shape
-from utils.file import save_gdf_to_geojson, save_network_graph_to_json, save_network_nodes_to_json
-from utils.data_fetcher import fetch_and_normalize_data, generate_query
-from utils.geometry import add_boundary, add_centroid, get_geometry_by_objectid, generate_poly_string
-from utils.network import compress_network_graph, convert_gdf_to_network_nodes, create_network_graph
+import shapely
+from shapely.geometry import mapping, shape
+from utils.file import save_amenities, save_landmarks_to_json, save_network_graph_to_json, save_network_nodes
+from utils.data_fetcher import fetch_and_split_data, generate_query
+from utils.geometry import add_boundary, add_centroid, get_geometry_by_objectid, generate_poly_string, split_into_tiles
+from utils.network import build_landmark_table, build_node_index, compress_network_graph, compute_nearest_distances, contract_network_graph, convert_gdf_to_network_nodes, convert_to_undirected_graph, create_network_graph, index_network_graph, snap_to_nearest_nodes
+
+COMBINED_QUERY_TIMEOUT = 90  # Seconds; one query returns every amenity layer of the city
+MAX_WALK_METERS = 1200  # Longest walk the frontend offers (15 minutes)
+TILE_MAX_AREA_KM2 = 0  # Opt-in; tiles get their own citydict entries and ids, so 0 keeps every city whole
+TILE_ID_MULTIPLIER = 1000  # Tile ids are the city OBJECTID * 1000 + tile number
+DISTANCE_AMENITIES = ["park", "supermarket", "cafe"]  # Stored per apartment as dist_<amenity> for SQL-only analysis
+# Set by generate_seed_data.py; an environment variable so process pool workers inherit it
+BOUNDARY_SPACING_ENV = "SEED_BOUNDARY_SPACING"
 
 def load_data(csv_path, geojson_path):
     """Load CSV and GeoJSON data."""
@@ -18,31 +30,130 @@ def load_data(csv_path, geojson_path):
         print(f"Error loading data: {e}")
         return None, None
     
-def process_data(csv_data, geojson_data, output_file_path):
-    """Process data for each city and save the city dictionary."""
+def process_data(csv_data, geojson_data, output_file_path, num_landmarks=0, workers=1, checkpoint_dir=None,
+                 max_tile_area_km2=None, tile_buffer_meters=MAX_WALK_METERS):
+    """Process data for each city or city tile, in parallel when workers > 1, skipping checkpointed ones, and save the city dictionary."""
     if csv_data.empty or not geojson_data:
         print("One or both of the datasets are empty.")
         return
     
-    citydict = {}  # Dictionary to store processed city data
+    cities = []  # Every city or tile in CSV order
+    processed = {}  # (id, geometry) of each processed or checkpointed city
+    pending = []
     for _, row in csv_data.iterrows():
-        city = row['NAME']
-        objectid = row['OBJECTID']
-        geometry = get_geometry_by_objectid(geojson_data, objectid)
-        print(f"\nExecution start for {city}")
-        start_time = time.time()
+        geometry = get_geometry_by_objectid(geojson_data, row['OBJECTID'])
+        for city, objectid, core_geometry, buffer_geometry, claimed_geometry in get_city_tiles(
+            row['NAME'], row['OBJECTID'], geometry, max_tile_area_km2, tile_buffer_meters
+        ):
+            cities.append(city)
+            checkpoint = load_checkpoint(checkpoint_dir, city)
+            if checkpoint:
+                print(f"Skipping {city}: already processed")
+                processed[city] = (checkpoint['id'], checkpoint['geometry'])
+                continue
+            pending.append((city, objectid, core_geometry, buffer_geometry, claimed_geometry))
 
-        try:
-            process_city_data(city, geometry)
-            add_city_data_to_dict(citydict, city, objectid, geometry)
-        except Exception as e:
-            print(f"Error processing {city}: {e}")
+    summary = {}  # Seconds per stage for each city processed in this run
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(run_city, city, objectid, geometry, num_landmarks, checkpoint_dir, buffer_geometry, claimed_geometry)
+                for city, objectid, geometry, buffer_geometry, claimed_geometry in pending
+            ]
+            results = [future.result() for future in futures]
+    else:
+        results = [
+            run_city(city, objectid, geometry, num_landmarks, checkpoint_dir, buffer_geometry, claimed_geometry)
+            for city, objectid, geometry, buffer_geometry, claimed_geometry in pending
+        ]
 
-        end_time = time.time()
-        print(f"Execution time for {city}: {end_time - start_time} seconds\n")
+    for city, objectid, geometry, timings in results:
+        if timings is not None:
+            processed[city] = (objectid, geometry)
+            summary[city] = timings
+
+    # Keep the CSV order so every run writes the same citydict.json for the same data
+    citydict = {}  # Dictionary to store processed city data
+    for city in cities:
+        if city in processed:
+            add_city_data_to_dict(citydict, city, *processed[city])
 
     # Save the processed city dictionary to a JSON file
     save_city_dict_to_json(citydict, output_file_path)
+    print_timing_summary(summary)
+
+def get_city_tiles(city, objectid, geometry, max_tile_area_km2=None, buffer_meters=MAX_WALK_METERS):
+    """Return (name, id, core, buffered, claimed geometry) per tile of a city, or the city itself when it needs no tiling.
+
+    The claimed geometry is the union of the earlier tiles' cores. An amenity centered on an edge
+    shared by two cores belongs to the first of them, so each amenity is saved by exactly one tile.
+    """
+    if not max_tile_area_km2:
+        return [(city, objectid, geometry, None, None)]
+    tiles = split_into_tiles(shape(geometry), max_tile_area_km2, buffer_meters)
+    if len(tiles) == 1:
+        return [(city, objectid, geometry, None, None)]
+    cores = [core for core, _ in tiles]
+    return [
+        (
+            f"{city} {number}",
+            int(objectid) * TILE_ID_MULTIPLIER + number,
+            mapping(core),
+            mapping(buffered),
+            mapping(shapely.union_all(cores[:number - 1])) if number > 1 else None,
+        )
+        for number, (core, buffered) in enumerate(tiles, start=1)
+    ]
+
+def run_city(city, objectid, geometry, num_landmarks=0, checkpoint_dir=None, buffer_geometry=None, claimed_geometry=None):
+    """Process one city and checkpoint it on success, returning its timings per stage (None on failure)."""
+    print(f"\nExecution start for {city}")
+    start_time = time.time()
+
+    try:
+        timings = process_city_data(city, geometry, num_landmarks, buffer_geometry, claimed_geometry)
+        save_checkpoint(checkpoint_dir, city, objectid, geometry, timings)
+    except Exception as e:
+        print(f"Error processing {city}: {e}")
+        timings = None
+
+    end_time = time.time()
+    print(f"Execution time for {city}: {end_time - start_time} seconds\n")
+    return city, objectid, geometry, timings
+
+def get_checkpoint_path(checkpoint_dir, city):
+    """Return the checkpoint file path of a city."""
+    return os.path.join(checkpoint_dir, f"{city.lower()}.json")
+
+def load_checkpoint(checkpoint_dir, city):
+    """Load the checkpoint of a completed city, or None when there is none."""
+    if not checkpoint_dir:
+        return None
+    try:
+        with open(get_checkpoint_path(checkpoint_dir, city), 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def save_checkpoint(checkpoint_dir, city, objectid, geometry, timings):
+    """Mark a city as completed so reruns skip it."""
+    if not checkpoint_dir:
+        return
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    file_path = get_checkpoint_path(checkpoint_dir, city)
+    # Write then rename so an interrupted run never leaves a partial checkpoint
+    with open(f"{file_path}.tmp", 'w') as f:
+        json.dump({"id": int(objectid), "geometry": geometry, "timings": timings}, f)
+    os.replace(f"{file_path}.tmp", file_path)
+
+def print_timing_summary(summary):
+    """Print the seconds spent per stage for each processed city."""
+    if not summary:
+        return
+    print("\nExecution time summary (seconds):")
+    for city, timings in summary.items():
+        stages = ", ".join(f"{stage} {seconds:.1f}" for stage, seconds in timings.items())
+        print(f"{city}: {stages}, total {sum(timings.values()):.1f}")
 
 def add_city_data_to_dict(citydict, city, objectid, geometry):
     """Add processed city data to the city dictionary."""
@@ -59,36 +170,133 @@ def save_city_dict_to_json(citydict, output_file_path):
     except Exception as e:
         print(f"Error saving citydict.json: {e}")
 
-def process_city_data(city, geometry):
-    """Processes data for a city by generating the network graph, GeoJSON and network nodes."""
-    G = generate_network_graph(geometry, city)
-    generate_geojson_and_network_nodes(G, geometry, city)
+def process_city_data(city, geometry, num_landmarks=0, buffer_geometry=None, claimed_geometry=None):
+    """Processes data for a city by generating the network graph, GeoJSON and network nodes, returning seconds per stage.
+
+    For a tile, the graph and the amenities it can walk to cover buffer_geometry, while the
+    amenities assigned to the tile are those of its core geometry outside claimed_geometry.
+    """
+    timings = {}
+    with record_time(timings, "graph"):
+        G = generate_network_graph(buffer_geometry or geometry, city)
+    with record_time(timings, "amenities"):
+        network_nodes = generate_geojson_and_network_nodes(
+            G, buffer_geometry or geometry, city, geometry if buffer_geometry else None, claimed_geometry
+        )
+    with record_time(timings, "export"):
+        G = save_network_graph_and_nodes(G, city, network_nodes)
+    if num_landmarks:
+        with record_time(timings, "landmarks"):
+            generate_landmarks(G, city, num_landmarks)
+    return timings
+
+@contextmanager
+def record_time(timings, stage):
+    """Record the seconds spent in a stage."""
+    start_time = time.time()
+    yield
+    timings[stage] = time.time() - start_time
 
 def generate_network_graph(geometry, city):
     """Process and compress the network graph."""
     G = create_network_graph(shape(geometry))
-    save_network_graph_to_json(compress_network_graph(G), city)
+    return compress_network_graph(G)
+
+def save_network_graph_and_nodes(G, city, network_nodes):
+    """Contract, simplify and index the network graph, then save it with the amenity network nodes as node indices."""
+    num_nodes, num_edges = G.number_of_nodes(), G.number_of_edges()
+    # Keep every snapped node so the saved network nodes stay on the graph
+    G = contract_network_graph(G, set().union(*network_nodes.values()))
+    # Walk edges are two-way, so one undirected edge per node pair is enough
+    G = convert_to_undirected_graph(G)
+    print(f"Contracted network graph for {city}: {num_nodes} -> {G.number_of_nodes()} nodes, {num_edges} -> {G.number_of_edges()} edges")
+
+    G, index = index_network_graph(G)
+    save_network_graph_to_json(G, city)
+    for amenity, nnodes in network_nodes.items():
+        save_network_nodes(sorted(index[node] for node in nnodes), city, amenity)
     return G
 
-def generate_geojson_and_network_nodes(G, geometry, city):
-    """Processes geojsons and network nodes for amenities."""
+def generate_landmarks(G, city, num_landmarks):
+    """Precompute landmark distances for fast point-to-point queries in the backend."""
+    save_landmarks_to_json(build_landmark_table(G, num_landmarks), city)
+
+def generate_geojson_and_network_nodes(G, geometry, city, core_geometry=None, claimed_geometry=None):
+    """Processes geojsons and snaps amenities to network nodes, returning the nodes by amenity.
+
+    With a core geometry, only amenities centered in the core (and not in claimed_geometry, which
+    earlier tiles own) are saved and used as apartments, while every amenity within geometry stays
+    a walk destination.
+    """
     poly_string = generate_poly_string(geometry)
+    network_nodes = {}
     amenities = {
         "apartment": [("building", "apartments"), ("building", "residential")],
         "park": [("leisure", "park"), ("leisure", "dog_park")],
         "supermarket": [("shop", "supermarket"), ("shop", "grocery")],
         "cafe": [("amenity", "cafe")]
     }
-    for amenity, query_params in amenities.items():
-        query = generate_query(poly_string, query_params)
-        gdf = fetch_and_normalize_data(query)
-        # Save GeoJSON
-        save_gdf_to_geojson(gdf, city, amenity)
+    # Fetch every amenity type with one query and split the result locally by tag
+    query = generate_query(poly_string, [pair for query_params in amenities.values() for pair in query_params], timeout=COMBINED_QUERY_TIMEOUT)
+    gdfs = fetch_and_split_data(query, amenities)
+    # Build the spatial index once and snap every amenity type against it
+    node_index = build_node_index(G)
+    core = shape(core_geometry) if core_geometry else None
+    claimed = shape(claimed_geometry) if claimed_geometry else None
+    apartment_gdf = None
+
+    for amenity, gdf in gdfs.items():
+        core_gdf = gdf if core is None else gdf[in_tile_core(gdf, core, claimed)].reset_index(drop=True)
+        if amenity == "apartment":
+            gdf = core_gdf
+        else:
+            # Save GeoJSON (or GeoParquet)
+            save_amenities(core_gdf, city, amenity)
 
         if amenity == "park":
             gdf = add_boundary(gdf)
         else:
             gdf = add_centroid(gdf)
-        nnodes = convert_gdf_to_network_nodes(G, gdf, use_centroid=amenity != "park")
-        # Save network nodes
-        save_network_nodes_to_json(nnodes, city, amenity)
+        network_nodes[amenity] = convert_gdf_to_network_nodes(
+            G, gdf, use_centroid=amenity != "park", node_index=node_index, boundary_spacing=get_boundary_spacing()
+        )
+        if amenity == "apartment":
+            apartment_gdf = gdf
+
+    # Apartments are saved last, once the nodes of every amenity they walk to are known
+    if apartment_gdf is not None:
+        save_amenities(add_amenity_distances(G, apartment_gdf, network_nodes, node_index), city, "apartment")
+
+    return network_nodes
+
+def get_boundary_spacing():
+    """Return the meters between resampled park boundary points, or None to snap the boundary vertices as is."""
+    return float(os.getenv(BOUNDARY_SPACING_ENV) or 0) or None
+
+def in_tile_core(gdf, core, claimed=None):
+    """Return a mask of the features centered in a tile core, leaving centroids on an edge shared with claimed to its owner."""
+    centroids = shapely.centroid(gdf.geometry.to_numpy())
+    mask = shapely.intersects(core, centroids)
+    if claimed is not None:
+        # Cores only share edges, so a centroid of the core that touches claimed lies on such an edge
+        mask &= ~shapely.intersects(claimed, centroids)
+    return mask
+
+def add_amenity_distances(G, apartment_gdf, network_nodes, node_index):
+    """Add each apartment's walking distance to the nearest park, supermarket and cafe as dist_<amenity> columns.
+
+    The node each apartment snapped to is kept as network_node, so the backend matches apartments
+    on exactly the nodes in the apartment network nodes instead of snapping them again.
+    """
+    coords = [(point.x, point.y) for point in apartment_gdf['centroid']]
+    # Snap like the backend does, from each apartment's centroid to its nearest node
+    targets = snap_to_nearest_nodes(node_index, coords) if coords else []
+    distances = compute_nearest_distances(
+        G,
+        targets,
+        {amenity: network_nodes.get(amenity, []) for amenity in DISTANCE_AMENITIES},
+        MAX_WALK_METERS,
+    )
+    return apartment_gdf.drop(columns=['centroid']).assign(network_node=targets, **{
+        f"dist_{amenity}": distances[amenity] for amenity in DISTANCE_AMENITIES
+    })
@@ -1,15 +1,59 @@
 import os
 import json
+import numpy as np
 from utils.network import convert_graph_to_json
 
 data_dir = "seed/data"
 
+# Set by generate_seed_data.py; an environment variable so process pool workers inherit it
+OUTPUT_FORMAT_ENV = "SEED_OUTPUT_FORMAT"
+OUTPUT_FORMATS = ["geojson", "parquet"]
+
+def is_columnar_output():
+    """Return whether amenities and network nodes are written in the columnar (GeoParquet/NumPy) format."""
+    return os.getenv(OUTPUT_FORMAT_ENV) == "parquet"
+
+def remove_stale_output(file_path):
+    """Remove the other format's output so the loader never picks up a file from an earlier run."""
+    if os.path.exists(file_path):
+        os.remove(file_path)
+
+def save_amenities(gdf, city, data_type):
+    """Save amenities as GeoParquet in columnar output mode, GeoJSON otherwise."""
+    if is_columnar_output():
+        save_gdf_to_geoparquet(gdf, city, data_type)
+        remove_stale_output(f"{data_dir}/geojson/{city.lower()}_{data_type}.geojson")
+    else:
+        save_gdf_to_geojson(gdf, city, data_type)
+        remove_stale_output(f"{data_dir}/geoparquet/{city.lower()}_{data_type}.parquet")
+
+def save_network_nodes(nodes, city, data_type):
+    """Save network node indices as a NumPy array in columnar output mode, JSON otherwise."""
+    if is_columnar_output():
+        save_network_nodes_to_npy(nodes, city, data_type)
+        remove_stale_output(f"{data_dir}/network_nodes/{city.lower()}_{data_type}.json")
+    else:
+        save_network_nodes_to_json(nodes, city, data_type)
+        remove_stale_output(f"{data_dir}/network_nodes/{city.lower()}_{data_type}.npy")
+
 def save_gdf_to_geojson(gdf, city, data_type):
     """Save a GeoDataFrame to a GeoJSON file."""
     file_path = f"{data_dir}/geojson/{city.lower()}_{data_type}.geojson"
     os.makedirs(os.path.dirname(file_path), exist_ok=True)
     gdf.to_file(file_path, driver='GeoJSON')
 
+def save_gdf_to_geoparquet(gdf, city, data_type):
+    """Save a GeoDataFrame to a GeoParquet file (requires pyarrow)."""
+    file_path = f"{data_dir}/geoparquet/{city.lower()}_{data_type}.parquet"
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    gdf.to_parquet(file_path, index=False)
+
+def save_network_nodes_to_npy(nodes, city, data_type):
+    """Save the network nodes(in list) to a NumPy .npy file."""
+    file_path = f"{data_dir}/network_nodes/{city.lower()}_{data_type}.npy"
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    np.save(file_path, np.asarray(nodes, dtype=np.int32))  # Node indices of the indexed graph
+
 def save_network_nodes_to_json(nodes, city, data_type):
     """Save the network nodes(in list) to a JSON file."""
     file_path = f"{data_dir}/network_nodes/{city.lower()}_{data_type}.json"
@@ -26,3 +70,11 @@ def save_network_graph_to_json(G, city):
     
     with open(file_path, 'w') as f:
         f.write(graph_json_str)
+
+def save_landmarks_to_json(landmarks, city):
+    """Save the landmark distance table to a JSON file."""
+    file_path = f"{data_dir}/landmarks/{city.lower()}_landmarks.json"
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+    with open(file_path, 'w') as f:
+        json.dump(landmarks, f, separators=(',', ':'))
@@ -1,4 +1,10 @@
-from shapely.geometry import shape, Polygon, Point, LineString, MultiPolygon, MultiLineString
+import math
+import numpy as np
+import shapely
+from shapely.affinity import scale
+from shapely.geometry import box, shape, Polygon, Point, LineString, MultiPolygon, MultiLineString
+
+METERS_PER_DEGREE = 111320
 
 def get_geometry_by_objectid(geojson_data, objectid):
     """Retrieve geometry from GeoJSON data by OBJECTID."""
@@ -76,13 +82,15 @@ def add_boundary(gdf):
     gdf['boundary'] = gdf['geometry'].apply(get_boundary)
     return gdf
 
-def create_geometry(element, nodes):
-    """Create geometry from OSM element and nodes."""
+def create_geometry(element, nodes=None):
+    """Create geometry from OSM element, using the inline `out geom` coordinates of ways when present."""
     if element['type'] == 'node':
         return Point(element['lon'], element['lat'])
     elif element['type'] == 'way':
-        way_nodes = element['nodes']
-        way_geometry = [Point(nodes[node_id]['lon'], nodes[node_id]['lat']) for node_id in way_nodes]
+        if 'geometry' in element:
+            way_geometry = [Point(coord['lon'], coord['lat']) for coord in element['geometry']]
+        else:
+            way_geometry = [Point(nodes[node_id]['lon'], nodes[node_id]['lat']) for node_id in element['nodes']]
         if way_geometry[0] == way_geometry[-1]:
             return Polygon(way_geometry)
         else:
@@ -103,6 +111,59 @@ def create_geometry(element, nodes):
                 return MultiPolygon([Polygon(o, inners) for o in outer if len(o) >= 4])
     return None
 
+def get_way_coords(element, nodes=None):
+    """Return the (lon, lat) coordinates of a way from its inline geometry or the node lookup."""
+    if 'geometry' in element:
+        return [(coord['lon'], coord['lat']) for coord in element['geometry']]
+    return [(nodes[node_id]['lon'], nodes[node_id]['lat']) for node_id in element['nodes']]
+
+def create_geometries(elements, nodes=None):
+    """Create geometries for many OSM elements at once, identical to calling create_geometry on each.
+
+    Node and way coordinates are collected into flat arrays and built in bulk with the shapely 2 array
+    constructors; relations and degenerate ways fall back to create_geometry.
+    """
+    geometries = [None] * len(elements)
+    point_indexes, point_coords = [], []
+    way_indexes, way_coords, way_offsets = [], [], [0]
+
+    for index, element in enumerate(elements):
+        if element['type'] == 'node':
+            point_indexes.append(index)
+            point_coords.append((element['lon'], element['lat']))
+        elif element['type'] == 'way':
+            coords = get_way_coords(element, nodes)
+            # Too few coordinates for a LineString or a closed ring: keep create_geometry's behavior
+            if len(coords) < 2 or (coords[0] == coords[-1] and len(coords) < 4):
+                geometries[index] = create_geometry(element, nodes)
+                continue
+            way_indexes.append(index)
+            way_coords.extend(coords)
+            way_offsets.append(len(way_coords))
+        else:
+            geometries[index] = create_geometry(element, nodes)
+
+    if point_indexes:
+        for index, point in zip(point_indexes, shapely.points(np.array(point_coords, dtype=float))):
+            geometries[index] = point
+
+    if way_indexes:
+        coords = np.array(way_coords, dtype=float)
+        offsets = np.array(way_offsets)
+        counts = np.diff(offsets)
+        # Closed ways become polygons, open ways linestrings
+        closed = np.all(coords[offsets[:-1]] == coords[offsets[1:] - 1], axis=1)
+        coord_closed = np.repeat(closed, counts)
+        rings = shapely.linearrings(coords[coord_closed], indices=np.repeat(np.arange(closed.sum()), counts[closed]))
+        lines = shapely.linestrings(coords[~coord_closed], indices=np.repeat(np.arange((~closed).sum()), counts[~closed]))
+        way_geometries = np.empty(len(way_indexes), dtype=object)
+        way_geometries[closed] = shapely.polygons(rings)
+        way_geometries[~closed] = lines
+        for index, geometry in zip(way_indexes, way_geometries):
+            geometries[index] = geometry
+
+    return geometries
+
 def filter_properties(element, allowed_tags=None):
     """Filter specific properties."""
     props = element.get('tags', {})
@@ -110,3 +171,54 @@ def filter_properties(element, allowed_tags=None):
     used_allowed_props = allowed_tags if allowed_tags is not None else default_allowed_props
     
     return {k: v for k, v in props.items() if k in used_allowed_props}
+
+def get_meter_scale(geometry):
+    """Return (x, y) meters per degree around the geometry, for local equirectangular projection."""
+    latitude = (geometry.bounds[1] + geometry.bounds[3]) / 2
+    return METERS_PER_DEGREE * math.cos(math.radians(latitude)), METERS_PER_DEGREE
+
+def get_polygonal_part(geometry):
+    """Keep only the polygons of an overlay result, dropping the lines and points shared at edges."""
+    polygons = [part for part in shapely.get_parts(geometry) if isinstance(part, Polygon) and not part.is_empty]
+    if not polygons:
+        return None
+    return polygons[0] if len(polygons) == 1 else MultiPolygon(polygons)
+
+def split_into_tiles(geometry, max_area_km2, buffer_meters):
+    """Split a city geometry into a grid of core tiles of at most max_area_km2, each with a buffered geometry.
+
+    Returns a list of (core, buffered) pairs. Cores partition the city; buffered geometries extend their
+    core by buffer_meters within the city so walks up to that distance from the core are never cut off.
+    A city within the size limit is returned as a single tile.
+    """
+    x_scale, y_scale = get_meter_scale(geometry)
+    to_meters = lambda g: scale(g, xfact=x_scale, yfact=y_scale, origin=(0, 0))
+    to_degrees = lambda g: scale(g, xfact=1 / x_scale, yfact=1 / y_scale, origin=(0, 0))
+    max_area = max_area_km2 * 1e6
+
+    if to_meters(geometry).area <= max_area:
+        return [(geometry, geometry)]
+
+    minx, miny, maxx, maxy = geometry.bounds
+    aspect = (maxx - minx) * x_scale / ((maxy - miny) * y_scale)
+    num_tiles = math.ceil(to_meters(geometry).area / max_area)
+    while True:
+        # Grid cells roughly square in meters; grow the grid until every core fits the limit
+        cols = max(1, round(math.sqrt(num_tiles * aspect)))
+        rows = math.ceil(num_tiles / cols)
+        width, height = (maxx - minx) / cols, (maxy - miny) / rows
+        cores = []
+        for row in range(rows):
+            for col in range(cols):
+                cell = box(minx + col * width, miny + row * height, minx + (col + 1) * width, miny + (row + 1) * height)
+                core = get_polygonal_part(geometry.intersection(cell))
+                if core is not None:
+                    cores.append(core)
+        if all(to_meters(core).area <= max_area for core in cores):
+            break
+        num_tiles += 1
+
+    return [
+        (core, get_polygonal_part(to_degrees(to_meters(core).buffer(buffer_meters)).intersection(geometry)))
+        for core in cores
+    ]
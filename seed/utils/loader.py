@@ -0,0 +1,436 @@
+import io
+import os
+import hashlib
+import json
+import time
+import struct
+import psycopg2
+import shapely
+import numpy as np
+import geopandas as gpd
+from shapely.geometry import shape
+
+AMENITIES = ["apartment", "park", "supermarket", "cafe"]
+# Per-apartment walking distances, moved from the generated properties into indexed columns
+DISTANCE_COLUMNS = ["dist_park", "dist_supermarket", "dist_cafe"]
+# OSM id of the graph node an apartment was snapped to by the seed, moved into a column likewise
+NETWORK_NODE_COLUMN = "network_node"
+COPY_CHUNK_SIZE = 1 << 20  # Bytes read at a time when streaming large files into COPY
+SRID = 4326
+
+# PostgreSQL binary COPY framing
+PGCOPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+PGCOPY_TRAILER = struct.pack("!h", -1)
+NULL_FIELD = struct.pack("!i", -1)
+JSONB_VERSION = b"\x01"
+
+# Dropped only by a full reload; an incremental update keeps serving the existing rows
+DROP_TABLES_SQL = """
+DROP TABLE IF EXISTS amenities;
+DROP TABLE IF EXISTS network_graphs;
+DROP TABLE IF EXISTS network_nodes;
+"""
+
+CREATE_TABLES_SQL = """
+CREATE TABLE IF NOT EXISTS amenities (
+    id SERIAL PRIMARY KEY,
+    city_id INTEGER NOT NULL,
+    name VARCHAR(50) CHECK (name IN ('park', 'supermarket', 'cafe', 'apartment')) NOT NULL,
+    geom GEOMETRY,
+    properties JSONB,
+    feature_hash TEXT, -- Hash of the geometry and tags, used to diff incremental updates
+    -- Walking meters from an apartment to its nearest park, supermarket and cafe (NULL beyond the longest walk)
+    dist_park REAL,
+    dist_supermarket REAL,
+    dist_cafe REAL,
+    network_node BIGINT, -- OSM id of the graph node the apartment snapped to
+    -- Derived columns computed once at insert time instead of on every request
+    centroid GEOMETRY GENERATED ALWAYS AS (ST_Centroid(geom)) STORED,
+    geojson TEXT GENERATED ALWAYS AS (ST_AsGeoJSON(geom, 5)) STORED,
+    centroid_geojson TEXT GENERATED ALWAYS AS (ST_AsGeoJSON(ST_Centroid(geom), 5)) STORED,
+    osm_id BIGINT GENERATED ALWAYS AS ((properties->>'id')::bigint) STORED
+);
+-- Upgrade tables created by an older seed (down to the original seed.sh schema) to every column above.
+-- Rows loaded before feature hashes existed have none and are replaced on the first incremental update.
+ALTER TABLE amenities ADD COLUMN IF NOT EXISTS feature_hash TEXT;
+ALTER TABLE amenities ADD COLUMN IF NOT EXISTS dist_park REAL;
+ALTER TABLE amenities ADD COLUMN IF NOT EXISTS dist_supermarket REAL;
+ALTER TABLE amenities ADD COLUMN IF NOT EXISTS dist_cafe REAL;
+ALTER TABLE amenities ADD COLUMN IF NOT EXISTS network_node BIGINT;
+ALTER TABLE amenities ADD COLUMN IF NOT EXISTS centroid GEOMETRY GENERATED ALWAYS AS (ST_Centroid(geom)) STORED;
+ALTER TABLE amenities ADD COLUMN IF NOT EXISTS geojson TEXT GENERATED ALWAYS AS (ST_AsGeoJSON(geom, 5)) STORED;
+ALTER TABLE amenities ADD COLUMN IF NOT EXISTS centroid_geojson TEXT GENERATED ALWAYS AS (ST_AsGeoJSON(ST_Centroid(geom), 5)) STORED;
+ALTER TABLE amenities ADD COLUMN IF NOT EXISTS osm_id BIGINT GENERATED ALWAYS AS ((properties->>'id')::bigint) STORED;
+
+CREATE TABLE IF NOT EXISTS network_graphs (
+    id SERIAL PRIMARY KEY,
+    city_id INTEGER NOT NULL,
+    graph JSONB NOT NULL,
+    landmarks JSONB -- Optional ALT landmark distance table
+);
+ALTER TABLE network_graphs ADD COLUMN IF NOT EXISTS landmarks JSONB;
+
+CREATE TABLE IF NOT EXISTS network_nodes (
+    id SERIAL PRIMARY KEY,
+    city_id INTEGER NOT NULL,
+    name VARCHAR(50) CHECK (name IN ('park', 'supermarket', 'cafe', 'apartment')) NOT NULL,
+    nodes JSONB NOT NULL
+);
+
+-- Kept across reloads so the backend can tell which cities' data actually changed
+CREATE TABLE IF NOT EXISTS seed_manifest (
+    city_id INTEGER NOT NULL,
+    artifact VARCHAR(100) NOT NULL,
+    content_hash CHAR(64) NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (city_id, artifact)
+);
+"""
+
+UPSERT_MANIFEST_SQL = """
+INSERT INTO seed_manifest (city_id, artifact, content_hash)
+VALUES (%s, %s, %s)
+ON CONFLICT (city_id, artifact) DO UPDATE
+SET content_hash = EXCLUDED.content_hash, updated_at = now()
+WHERE seed_manifest.content_hash <> EXCLUDED.content_hash
+"""
+
+# Removes cities that are no longer seeded (or failed a full reload) so their versions change too
+PRUNE_CITIES_SQL = """
+DELETE FROM amenities WHERE NOT (city_id = ANY(%(city_ids)s));
+DELETE FROM network_graphs WHERE NOT (city_id = ANY(%(city_ids)s));
+DELETE FROM network_nodes WHERE NOT (city_id = ANY(%(city_ids)s));
+DELETE FROM seed_manifest WHERE NOT (city_id = ANY(%(city_ids)s));
+"""
+
+AMENITY_COLUMNS = ["city_id", "name", "geom", "properties", "feature_hash", *DISTANCE_COLUMNS, NETWORK_NODE_COLUMN]
+
+CREATE_AMENITIES_STAGING_SQL = """
+CREATE TEMP TABLE amenities_staging (
+    city_id INTEGER NOT NULL,
+    name VARCHAR(50) NOT NULL,
+    geom GEOMETRY,
+    properties JSONB,
+    feature_hash TEXT NOT NULL,
+    dist_park REAL,
+    dist_supermarket REAL,
+    dist_cafe REAL,
+    network_node BIGINT
+) ON COMMIT DROP
+"""
+
+# Rows whose geometry and tags are unchanged match on their hash and are left alone
+DELETE_CHANGED_AMENITIES_SQL = """
+DELETE FROM amenities a
+WHERE a.city_id = %(city_id)s AND a.name = %(name)s
+AND NOT EXISTS (SELECT 1 FROM amenities_staging s WHERE s.feature_hash = a.feature_hash)
+"""
+
+INSERT_CHANGED_AMENITIES_SQL = """
+INSERT INTO amenities (city_id, name, geom, properties, feature_hash, dist_park, dist_supermarket, dist_cafe, network_node)
+SELECT s.city_id, s.name, s.geom, s.properties, s.feature_hash, s.dist_park, s.dist_supermarket, s.dist_cafe, s.network_node
+FROM amenities_staging s
+WHERE NOT EXISTS (
+    SELECT 1 FROM amenities a
+    WHERE a.city_id = %(city_id)s AND a.name = %(name)s AND a.feature_hash = s.feature_hash
+)
+"""
+
+# Built once after every city is loaded, which is much faster than maintaining them row by row
+CREATE_INDEXES_SQL = """
+CREATE INDEX IF NOT EXISTS idx_amenities_geom ON amenities USING GIST (geom);
+CREATE INDEX IF NOT EXISTS idx_amenities_city_id_name ON amenities (city_id, name);
+CREATE INDEX IF NOT EXISTS idx_amenities_osm_id ON amenities (osm_id);
+CREATE INDEX IF NOT EXISTS idx_amenities_feature_hash ON amenities (city_id, name, feature_hash);
+CREATE INDEX IF NOT EXISTS idx_amenities_apartment_distances ON amenities (city_id, dist_park, dist_supermarket, dist_cafe) WHERE name = 'apartment';
+CREATE INDEX IF NOT EXISTS idx_network_graphs_city_id ON network_graphs (city_id);
+CREATE INDEX IF NOT EXISTS idx_network_nodes_city_id_name ON network_nodes (city_id, name);
+ANALYZE amenities;
+ANALYZE network_graphs;
+ANALYZE network_nodes;
+"""
+
+def get_dsn():
+    """Build the database connection string from the environment."""
+    return (
+        f"postgresql://{os.getenv('DB_USERNAME')}:{os.getenv('DB_PASSWORD')}"
+        f"@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
+    )
+
+class IteratorReader(io.RawIOBase):
+    """Read-only file object over an iterator of byte chunks, so COPY can stream generated data."""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.buffer = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self.buffer:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                return 0
+            self.buffer = chunk
+        size = min(len(b), len(self.buffer))
+        b[:size] = self.buffer[:size]
+        self.buffer = self.buffer[size:]
+        return size
+
+def encode_int4(value):
+    """Encode an INTEGER field for binary COPY."""
+    return struct.pack("!ii", 4, value)
+
+def encode_int8(value):
+    """Encode a BIGINT field for binary COPY, with None as NULL."""
+    if value is None:
+        return NULL_FIELD
+    return struct.pack("!iq", 8, value)
+
+def encode_float4(value):
+    """Encode a REAL field for binary COPY, with None as NULL."""
+    if value is None:
+        return NULL_FIELD
+    return struct.pack("!if", 4, value)
+
+def encode_bytes(value):
+    """Encode a raw field (text, EWKB geometry) for binary COPY."""
+    if value is None:
+        return NULL_FIELD
+    return struct.pack("!i", len(value)) + value
+
+def encode_jsonb(text):
+    """Encode a JSONB field from its JSON text for binary COPY."""
+    if text is None:
+        return NULL_FIELD
+    return encode_bytes(JSONB_VERSION + text.encode("utf-8"))
+
+def encode_row(*fields):
+    """Frame already encoded fields as one binary COPY tuple."""
+    return struct.pack("!h", len(fields)) + b"".join(fields)
+
+def encode_geometry(geometry):
+    """Convert a GeoJSON geometry to EWKB with the SRID that ST_GeomFromGeoJSON would assign."""
+    if not geometry:
+        return None
+    return shapely.to_wkb(shapely.set_srid(shape(geometry), SRID), include_srid=True)
+
+def read_geojson_features(file_path):
+    """Yield (EWKB geometry, properties) for every feature of a GeoJSON file."""
+    with open(file_path, "r") as f:
+        features = json.load(f).get("features", [])
+    for feature in features:
+        yield encode_geometry(feature.get("geometry")), feature.get("properties")
+
+def read_geoparquet_features(file_path):
+    """Yield (EWKB geometry, properties) for every row of a GeoParquet file, encoding geometries in bulk."""
+    gdf = gpd.read_parquet(file_path)
+    geometries = shapely.to_wkb(shapely.set_srid(gdf.geometry.to_numpy(), SRID), include_srid=True)
+    properties = gdf.drop(columns=gdf.geometry.name)
+    # Missing tags become JSON nulls, as in the GeoJSON output
+    records = properties.astype(object).where(properties.notna(), None).to_dict("records")
+    yield from zip(geometries, records)
+
+def hash_feature(*parts):
+    """Hash a feature's encoded fields (EWKB geometry, properties JSON with its OSM id, distances, network node)."""
+    return hashlib.md5(b"".join(part or b"" for part in parts)).hexdigest()
+
+def iter_amenity_rows(city_id, name, file_path):
+    """Yield binary COPY tuples for every feature of an amenity GeoJSON or GeoParquet file."""
+    read_features = read_geoparquet_features if file_path.endswith(".parquet") else read_geojson_features
+    for geometry, properties in read_features(file_path):
+        distances = [encode_float4(properties.pop(column, None) if properties else None) for column in DISTANCE_COLUMNS]
+        network_node = encode_int8(properties.pop(NETWORK_NODE_COLUMN, None) if properties else None)
+        properties_json = json.dumps(properties, separators=(",", ":"))
+        yield encode_row(
+            encode_int4(city_id),
+            encode_bytes(name.encode("utf-8")),
+            encode_bytes(geometry),
+            encode_jsonb(properties_json),
+            encode_bytes(hash_feature(geometry, properties_json.encode("utf-8"), *distances, network_node).encode("ascii")),
+            *distances,
+            network_node,
+        )
+
+def iter_jsonb_file_field(file_path):
+    """Yield a JSONB field streamed from a JSON file without reading it into memory at once."""
+    yield struct.pack("!i", len(JSONB_VERSION) + os.path.getsize(file_path)) + JSONB_VERSION
+    with open(file_path, "rb") as f:
+        while chunk := f.read(COPY_CHUNK_SIZE):
+            yield chunk
+
+def iter_copy_stream(rows):
+    """Wrap binary COPY tuples with the binary format header and trailer."""
+    yield PGCOPY_HEADER
+    yield from rows
+    yield PGCOPY_TRAILER
+
+def copy_rows(cur, table, columns, rows):
+    """Stream binary COPY tuples into a table."""
+    stream = io.BufferedReader(IteratorReader(iter_copy_stream(rows)), buffer_size=COPY_CHUNK_SIZE)
+    cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT binary)", stream, size=COPY_CHUNK_SIZE)
+
+def find_file(*candidates):
+    """Return the first existing file of the candidates, or None."""
+    return next((path for path in candidates if os.path.isfile(path)), None)
+
+def get_city_files(data_dir, city):
+    """Return the seed files of a city, preferring columnar outputs and skipping the ones that were not generated."""
+    city = city.lower()
+    files = {
+        "amenities": {
+            name: find_file(
+                os.path.join(data_dir, "geoparquet", f"{city}_{name}.parquet"),
+                os.path.join(data_dir, "geojson", f"{city}_{name}.geojson"),
+            )
+            for name in AMENITIES
+        },
+        "network_nodes": {
+            name: find_file(
+                os.path.join(data_dir, "network_nodes", f"{city}_{name}.npy"),
+                os.path.join(data_dir, "network_nodes", f"{city}_{name}.json"),
+            )
+            for name in AMENITIES
+        },
+        "graph": find_file(os.path.join(data_dir, "network_graphs", f"{city}_graph.json")),
+        "landmarks": find_file(os.path.join(data_dir, "landmarks", f"{city}_landmarks.json")),
+    }
+    for key in ("amenities", "network_nodes"):
+        files[key] = {name: path for name, path in files[key].items() if path}
+    return files
+
+def iter_network_graph_rows(city_id, graph_path, landmarks_path):
+    """Yield the binary COPY tuple of a city's network graph, streaming the graph file."""
+    yield struct.pack("!h", 3) + encode_int4(city_id)
+    yield from iter_jsonb_file_field(graph_path)
+    if landmarks_path:
+        yield from iter_jsonb_file_field(landmarks_path)
+    else:
+        yield NULL_FIELD
+
+def iter_network_nodes_rows(city_id, nodes_paths):
+    """Yield binary COPY tuples for each amenity's network nodes."""
+    for name, file_path in nodes_paths.items():
+        if file_path.endswith(".npy"):
+            nodes = json.dumps(np.load(file_path).tolist(), separators=(",", ":"))
+        else:
+            with open(file_path, "r") as f:
+                nodes = f.read()
+        yield encode_row(encode_int4(city_id), encode_bytes(name.encode("utf-8")), encode_jsonb(nodes))
+
+def copy_city(cur, city_id, files):
+    """COPY every table's rows for one city."""
+    for name, file_path in files["amenities"].items():
+        copy_rows(cur, "amenities", AMENITY_COLUMNS, iter_amenity_rows(city_id, name, file_path))
+    if files["network_nodes"]:
+        copy_rows(cur, "network_nodes", ["city_id", "name", "nodes"], iter_network_nodes_rows(city_id, files["network_nodes"]))
+    if files["graph"]:
+        copy_rows(cur, "network_graphs", ["city_id", "graph", "landmarks"], iter_network_graph_rows(city_id, files["graph"], files["landmarks"]))
+
+def update_amenities(cur, city_id, name, file_path):
+    """Diff an amenity file against the stored rows, deleting and inserting only the changed features."""
+    cur.execute("TRUNCATE amenities_staging")
+    copy_rows(cur, "amenities_staging", AMENITY_COLUMNS, iter_amenity_rows(city_id, name, file_path))
+    cur.execute("ANALYZE amenities_staging")
+    params = {"city_id": city_id, "name": name}
+    cur.execute(DELETE_CHANGED_AMENITIES_SQL, params)
+    deleted = cur.rowcount
+    cur.execute(INSERT_CHANGED_AMENITIES_SQL, params)
+    return deleted, cur.rowcount
+
+def fetch_manifest_hashes(cur, city_id):
+    """Fetch the stored artifact hashes of a city from the seed manifest."""
+    cur.execute("SELECT artifact, content_hash FROM seed_manifest WHERE city_id = %s", (city_id,))
+    return dict(cur.fetchall())
+
+def update_city(cur, city_id, files, hashes):
+    """Apply only the artifacts whose hash differs from the manifest, keeping every other row in place."""
+    stored = fetch_manifest_hashes(cur, city_id)
+    changed = {artifact for artifact in hashes.keys() | stored.keys() if hashes.get(artifact) != stored.get(artifact)}
+
+    changed_amenities = [name for name in AMENITIES if f"amenities/{name}" in changed]
+    if changed_amenities:
+        cur.execute(CREATE_AMENITIES_STAGING_SQL)
+    for name in changed_amenities:
+        if name in files["amenities"]:
+            deleted, inserted = update_amenities(cur, city_id, name, files["amenities"][name])
+            print(f"Updated {name} (city ID: {city_id}): {deleted} removed, {inserted} added")
+        else:
+            cur.execute("DELETE FROM amenities WHERE city_id = %s AND name = %s", (city_id, name))
+
+    # Node sets and graphs are replaced whole, but only for the artifacts that changed
+    changed_nodes = [name for name in AMENITIES if f"network_nodes/{name}" in changed]
+    if changed_nodes:
+        cur.execute("DELETE FROM network_nodes WHERE city_id = %s AND name = ANY(%s)", (city_id, changed_nodes))
+        nodes_paths = {name: files["network_nodes"][name] for name in changed_nodes if name in files["network_nodes"]}
+        if nodes_paths:
+            copy_rows(cur, "network_nodes", ["city_id", "name", "nodes"], iter_network_nodes_rows(city_id, nodes_paths))
+
+    if changed & {"graph", "landmarks"}:
+        cur.execute("DELETE FROM network_graphs WHERE city_id = %s", (city_id,))
+        if files["graph"]:
+            copy_rows(cur, "network_graphs", ["city_id", "graph", "landmarks"], iter_network_graph_rows(city_id, files["graph"], files["landmarks"]))
+    return changed
+
+def hash_file(file_path):
+    """Return the SHA-256 hex digest of a file, reading it in chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(COPY_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def get_manifest_hashes(files):
+    """Return the content hash of each of a city's seed artifacts, keyed by artifact name."""
+    artifacts = {f"amenities/{name}": path for name, path in files["amenities"].items()}
+    artifacts.update({f"network_nodes/{name}": path for name, path in files["network_nodes"].items()})
+    artifacts.update({key: files[key] for key in ("graph", "landmarks") if files[key]})
+    return {artifact: hash_file(path) for artifact, path in artifacts.items()}
+
+def record_manifest(cur, city_id, hashes):
+    """Upsert a city's artifact hashes into the seed manifest, removing artifacts that are no longer generated."""
+    cur.execute(
+        "DELETE FROM seed_manifest WHERE city_id = %s AND NOT (artifact = ANY(%s))",
+        (city_id, list(hashes)),
+    )
+    cur.executemany(UPSERT_MANIFEST_SQL, [(city_id, artifact, content_hash) for artifact, content_hash in hashes.items()])
+
+def load_city(dsn, city, city_id, data_dir, retries=5, incremental=False):
+    """Load (or incrementally update) one city and its manifest entries in a single transaction, retrying the whole city on failure."""
+    files = get_city_files(data_dir, city)
+    hashes = get_manifest_hashes(files)
+    for attempt in range(1, retries + 1):
+        start_time = time.time()
+        conn = None
+        try:
+            # Connecting is retried too, since a dropped server is the usual transient failure
+            conn = psycopg2.connect(dsn)
+            with conn:  # Commits on success, rolls back on error
+                with conn.cursor() as cur:
+                    if incremental:
+                        update_city(cur, city_id, files, hashes)
+                    else:
+                        copy_city(cur, city_id, files)
+                    # Committed with the data, so the backend never sees a new version before its rows
+                    record_manifest(cur, city_id, hashes)
+            print(f"Loaded {city} (ID: {city_id}) in {time.time() - start_time:.1f} seconds")
+            return True
+        except Exception as e:
+            print(f"Error loading {city}: {e}. Retrying... ({attempt}/{retries})")
+            time.sleep(2)
+        finally:
+            if conn is not None:
+                conn.close()
+    print(f"Failed to load {city} after {retries} retries.")
+    return False
+
+def run_sql(dsn, sql, params=None):
+    """Run SQL statements in one transaction."""
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute(sql, params)
+    finally:
+        conn.close()
@@ -1,11 +1,21 @@
 import json
+import numpy as np
 import osmnx as ox
 import networkx as nx
+import shapely
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from scipy.spatial import cKDTree
 from shapely.geometry import Point, LineString, MultiLineString
+from utils.cache import cached_call
+
+METERS_PER_DEGREE = 111320  # Approximate length of one degree of latitude
 
 def create_network_graph(geometry):
-    """Create a network graph from a given geometry (Polygon or MultiPolygon)."""
-    return ox.graph_from_polygon(geometry, network_type='walk')
+    """Create a network graph from a given geometry (Polygon or MultiPolygon), reusing the local download cache."""
+    # Key by polygon and osmnx version, since the downloaded graph depends on both
+    key_text = f"graph_from_polygon|walk|osmnx {ox.__version__}|{geometry.wkb_hex}"
+    return cached_call("graphs", key_text, lambda: ox.graph_from_polygon(geometry, network_type='walk'), serializer="pickle")
 
 def compress_network_graph(G: nx.MultiDiGraph) -> str:
     """Compresses a network graph by reducing size, reducing precision and pruning."""
@@ -47,35 +57,170 @@ def prune_graph(G: nx.MultiDiGraph, min_edge_length: float = 5.0) -> nx.MultiDiG
 
     return G
 
+def contract_network_graph(G: nx.MultiDiGraph, keep_nodes=()) -> nx.MultiDiGraph:
+    """Merges chains of degree-2 nodes into single weighted edges, keeping the given nodes."""
+    keep_nodes = set(keep_nodes)
+
+    for node in list(G.nodes):
+        if node in keep_nodes:
+            continue
+        predecessors, successors = set(G.predecessors(node)), set(G.successors(node))
+        neighbors = predecessors | successors
+        if len(neighbors) != 2 or node in neighbors:
+            continue
+        u, w = neighbors
+        # Every way into the node must continue to the other side, so no shortest path is lost
+        passes = [(a, b) for a, b in ((u, w), (w, u)) if a in predecessors and b in successors]
+        if {a for a, _ in passes} != predecessors or {b for _, b in passes} != successors:
+            continue
+
+        for a, b in passes:
+            length = min(d.get('length', 0) for d in G[a][node].values()) + min(d.get('length', 0) for d in G[node][b].values())
+            G.add_edge(a, b, length=length)
+        G.remove_node(node)
+
+    return G
+
+def convert_to_undirected_graph(G: nx.MultiDiGraph) -> nx.Graph:
+    """Converts a walk graph to an undirected simple graph, keeping the shortest edge between each node pair."""
+    H = nx.Graph()
+    H.graph.update(G.graph)
+    H.add_nodes_from(G.nodes(data=True))
+    for u, v, edge_data in G.edges(data=True):
+        # Self-loops never shorten a path
+        if u == v:
+            continue
+        if not H.has_edge(u, v) or edge_data.get('length', 0) < H[u][v].get('length', 0):
+            H.add_edge(u, v, **edge_data)
+    return H
+
+def index_network_graph(G: nx.Graph):
+    """Relabels nodes to contiguous indices, storing the OSM ids by index in the graph attributes."""
+    index = {node: i for i, node in enumerate(G.nodes)}
+    G = nx.relabel_nodes(G, index)
+    G.graph['osm_ids'] = list(index)
+    return G, index
+
 def convert_graph_to_json(G: nx.MultiDiGraph) -> str:
     """Converts a network graph to a JSON string."""
     return json.dumps(nx.node_link_data(G))
 
-def convert_gdf_to_network_nodes(G, gdf, use_centroid=True):
-    """Convert GeoDataFrame geometries to network nodes."""    
-    def add_nearest_nodes(geometry, nodes):
-        if geometry is None:
-            return
-        if isinstance(geometry, Point):
-            nodes.add(ox.distance.nearest_nodes(G, geometry.x, geometry.y))
-        elif isinstance(geometry, LineString):
-            all_points = list(geometry.coords)
-            for point in all_points:
-                nodes.add(ox.distance.nearest_nodes(G, point[0], point[1]))
-        elif isinstance(geometry, MultiLineString):
-            for part in geometry.geoms:
-                add_nearest_nodes(part, nodes)
-        else:
-            raise TypeError(f"Unsupported geometry type: {type(geometry)}")
-
+def build_node_index(G):
+    """Builds a KD-tree over the graph's node coordinates for bulk nearest-node snapping."""
+    node_ids = np.array(list(G.nodes))
+    coords = np.array([(G.nodes[node]['x'], G.nodes[node]['y']) for node in node_ids], dtype=float).reshape(-1, 2)
+    # Scale longitudes so Euclidean distances approximate ground distances at the city's latitude
+    lon_scale = np.cos(np.radians(coords[:, 1].mean())) if len(coords) else 1.0
+    tree = cKDTree(np.column_stack((coords[:, 0] * lon_scale, coords[:, 1])))
+    return tree, node_ids, lon_scale
+
+def snap_to_nearest_nodes(node_index, coords):
+    """Snaps (x, y) coordinates to their nearest graph nodes in one vectorized query."""
+    tree, node_ids, lon_scale = node_index
+    coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+    _, positions = tree.query(np.column_stack((coords[:, 0] * lon_scale, coords[:, 1])))
+    return node_ids[positions].tolist()
+
+def build_distance_matrix(G):
+    """Builds a CSR matrix of the shortest edge length between adjacent nodes, in both directions, and a node-to-position lookup."""
+    positions = {node: position for position, node in enumerate(G.nodes)}
+    size = len(positions)
+    edges = [(positions[u], positions[v], length) for u, v, length in G.edges(data="length", default=0.0)]
+    if not edges:
+        return csr_matrix((size, size)), positions
+    rows, cols, lengths = (np.array(values) for values in zip(*edges))
+    # Walk edges are two-way; keep the shortest of any parallel edges per node pair
+    keys = np.concatenate((rows * size + cols, cols * size + rows)).astype(np.int64)
+    lengths = np.concatenate((lengths, lengths)).astype(float)
+    order = np.lexsort((lengths, keys))
+    keys, lengths = keys[order], lengths[order]
+    first = np.concatenate(([True], keys[1:] != keys[:-1]))
+    matrix = csr_matrix((lengths[first], (keys[first] // size, keys[first] % size)), shape=(size, size))
+    return matrix, positions
+
+def compute_nearest_distances(G, targets, sources_by_amenity, cutoff, decimals=1):
+    """Returns, per amenity, the walking distance from each target node to its nearest source node, or None beyond the cutoff."""
+    matrix, positions = build_distance_matrix(G)
+    target_positions = [positions[node] for node in targets]
+    distances_by_amenity = {}
+    for amenity, sources in sources_by_amenity.items():
+        if not sources or not target_positions:
+            distances_by_amenity[amenity] = [None] * len(target_positions)
+            continue
+        # One multi-source search finds the nearest source of every node at once
+        distances = dijkstra(matrix, indices=sorted({positions[node] for node in sources}), min_only=True, limit=float(cutoff))
+        distances_by_amenity[amenity] = [
+            round(float(distance), decimals) if np.isfinite(distance) else None
+            for distance in distances[target_positions]
+        ]
+    return distances_by_amenity
+
+def get_boundary_coords(geometry, spacing=None, lon_scale=None):
+    """Returns the (x, y) points of a boundary, resampled about every `spacing` meters when given.
+
+    Longitudes are scaled by lon_scale (cos of the latitude, as in build_node_index) so the spacing
+    is the same east-west as north-south; it defaults to the boundary's own mean latitude.
+    """
+    if geometry is None:
+        return []
+    if isinstance(geometry, Point):
+        return [(geometry.x, geometry.y)]
+    if isinstance(geometry, LineString):
+        if not spacing or geometry.is_empty:
+            return list(geometry.coords)
+        if lon_scale is None:
+            lon_scale = np.cos(np.radians(np.mean(geometry.xy[1])))
+        # Densify long edges or thin dense vertices by sampling at a fixed interval in scaled degrees, keeping both ends
+        scaled = shapely.transform(geometry, lambda coords: coords * [lon_scale, 1.0])
+        distances = np.append(np.arange(0, scaled.length, spacing / METERS_PER_DEGREE), scaled.length)
+        coords = shapely.get_coordinates(shapely.line_interpolate_point(scaled, distances))
+        return [(x / lon_scale, y) for x, y in coords.tolist()]
+    if isinstance(geometry, MultiLineString):
+        return [coord for part in geometry.geoms for coord in get_boundary_coords(part, spacing, lon_scale)]
+    raise TypeError(f"Unsupported geometry type: {type(geometry)}")
+
+def convert_gdf_to_network_nodes(G, gdf, use_centroid=True, node_index=None, boundary_spacing=None):
+    """Convert GeoDataFrame geometries to network nodes, snapping every point in one batch."""
     if use_centroid:
-        points = gdf['centroid']
-        nodes = {ox.distance.nearest_nodes(G, point.x, point.y) for point in points}
+        coords = [(point.x, point.y) for point in gdf['centroid']]
     else:
-        nodes = set()
-        for geometry in gdf['boundary']:
-            add_nearest_nodes(geometry, nodes)
-
-    return list(nodes)  
-
-
+        if boundary_spacing and node_index is None:
+            node_index = build_node_index(G)
+        # Resample with the snapping index's longitude scale so spacing matches ground distance both ways
+        lon_scale = node_index[2] if boundary_spacing else None
+        coords = [coord for geometry in gdf['boundary'] for coord in get_boundary_coords(geometry, boundary_spacing, lon_scale)]
+
+    if not coords:
+        return []
+    if node_index is None:
+        node_index = build_node_index(G)
+    return list(set(snap_to_nearest_nodes(node_index, coords)))
+
+def build_landmark_table(G, num_landmarks=8, decimals=1):
+    """Select landmarks by farthest-point sampling and compute their distances to every node (ALT preprocessing)."""
+    # Walk edges are two-way, so distances are computed on the undirected graph
+    U = G.to_undirected(as_view=True)
+    nodes = list(U.nodes)
+    if not nodes or not num_landmarks:
+        return {"nodes": nodes, "landmarks": [], "distances": []}
+
+    # Start from the node farthest from an arbitrary node of the largest component
+    component = max(nx.connected_components(U), key=len)
+    lengths = nx.single_source_dijkstra_path_length(U, next(iter(component)), weight="length")
+    candidate = max(lengths, key=lengths.get)
+
+    landmarks, distances = [], []
+    # Distance from each reachable node to its closest landmark so far
+    closest = dict.fromkeys(component, float('inf'))
+    for _ in range(min(num_landmarks, len(component))):
+        lengths = nx.single_source_dijkstra_path_length(U, candidate, weight="length")
+        landmarks.append(candidate)
+        # Nodes outside the landmark's component have no distance
+        distances.append([round(lengths[node], decimals) if node in lengths else None for node in nodes])
+        for node in component:
+            closest[node] = min(closest[node], lengths[node])
+        candidate = max(closest, key=closest.get)
+        if closest[candidate] == 0:
+            break
+
+    return {"nodes": nodes, "landmarks": landmarks, "distances": distances}